@@ -19,9 +19,9 @@ exec ../ws /bin/bash -c 'set -e ; set -u ; set -o pipefail
 
 	# isort
 	echo Sorting imports with isort...
-	isort -j "$JOBS" --apply -w 120 --recursive lint/jobs.py setup.py workspace
+	isort -j "$JOBS" --apply -w 120 --recursive lint/jobs.py lint/importtime.py lint/prefix_translator.py setup.py workspace
 
 	# yapf
 	echo Formatting code with yapf...
-	yapf --in-place --style=.style.yapf --recursive --parallel lint/jobs.py setup.py workspace
+	yapf --in-place --style=.style.yapf --recursive --parallel lint/jobs.py lint/importtime.py lint/prefix_translator.py setup.py workspace
 '
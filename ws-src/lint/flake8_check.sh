@@ -13,4 +13,4 @@ done
 DIR="$( cd -P "$(dirname "$SOURCE")" && pwd )"
 cd "$DIR"
 
-exec ../../ws bash -c 'exec flake8 --max-line-len 120 -j "$(ws-src/lint/jobs.py)" ws-src/lint/jobs.py ws-src/setup.py ws-src/workspace'
+exec ../../ws bash -c 'exec flake8 --max-line-len 120 -j "$(ws-src/lint/jobs.py)" ws-src/lint/jobs.py ws-src/lint/importtime.py ws-src/lint/prefix_translator.py ws-src/setup.py ws-src/workspace'
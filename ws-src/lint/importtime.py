@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# modules that no command may import just to start up, as they are either slow to import or only needed by some recipes
+FORBIDDEN = [
+    r"asyncio",
+    r"psutil",
+    r"urllib\.request",
+    r"workspace\.recipes\.(?!all_recipes$|irecipe$|recipe$)\w+",
+]
+
+# additional modules that are forbidden for all commands but the listed ones
+FORBIDDEN_UNLESS: Dict[str, List[str]] = {
+    r"pyfiglet": ["build", "setup"],
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def commands(src_path: Path) -> List[str]:
+    return sorted(path.stem for path in (src_path / "workspace" / "bin").glob("*.py") if path.stem != "__init__")
+
+
+def measure(src_path: Path, command: str) -> Tuple[int, List[str]]:
+    """Returns the cumulative import time (in microseconds) and all modules imported by `workspace.bin.<command>`"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(src_path), env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f'import workspace.bin.{command}'],
+                            cwd=src_path,
+                            env=env,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE,
+                            check=False)
+    if result.returncode != 0:
+        print(result.stderr.decode(errors="replace"), file=sys.stderr)
+        print(f'Importing workspace.bin.{command} failed.', file=sys.stderr)
+        sys.exit(1)
+
+    cumulative = 0
+    modules = []
+    for line in result.stderr.decode(errors="replace").splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        modules.append(match.group(4))
+        if match.group(4) == f'workspace.bin.{command}':
+            cumulative = int(match.group(2))
+    return (cumulative, modules)
+
+
+def forbidden_modules(command: str, modules: List[str]) -> List[str]:
+    patterns = FORBIDDEN + [pattern for (pattern, allowed) in FORBIDDEN_UNLESS.items() if command not in allowed]
+    return [module for module in modules if any(re.match(f'^{pattern}($|\\.)', module) for pattern in patterns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the commands do not import unnecessary modules before they do any work.")
+    parser.add_argument("--budget",
+                        metavar="MS",
+                        type=float,
+                        help="Also fail if importing any command takes longer than the given number of milliseconds")
+    args = parser.parse_args()
+
+    src_path = Path(__file__).resolve().parent.parent
+    failed = False
+    for command in commands(src_path):
+        (cumulative, modules) = measure(src_path, command)
+        milliseconds = cumulative / 1000
+        print(f'{command:>16}: {milliseconds:7.1f} ms')
+
+        forbidden = forbidden_modules(command, modules)
+        if forbidden:
+            print(f'{"":>16}  imports {", ".join(sorted(set(forbidden)))}', file=sys.stderr)
+            failed = True
+        if args.budget is not None and milliseconds > args.budget:
+            print(f'{"":>16}  exceeds the budget of {args.budget} ms', file=sys.stderr)
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
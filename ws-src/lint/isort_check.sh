@@ -13,4 +13,4 @@ done
 DIR="$( cd -P "$(dirname "$SOURCE")" && pwd )"
 cd "$DIR"
 
-exec ../../ws bash -c 'exec isort -j "$(ws-src/lint/jobs.py)" --check --diff -w 120 --recursive ws-src/lint/jobs.py ws-src/setup.py ws-src/workspace'
+exec ../../ws bash -c 'exec isort -j "$(ws-src/lint/jobs.py)" --check --diff -w 120 --recursive ws-src/lint/jobs.py ws-src/lint/importtime.py ws-src/lint/prefix_translator.py ws-src/setup.py ws-src/workspace'
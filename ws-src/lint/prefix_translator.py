@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from workspace.util import READ_SIZE, PrefixTranslator
+
+PREFIX = b"[prefix] "
+
+
+class ReferenceTranslator:  # pylint: disable=too-few-public-methods
+    """The per-byte translation that `PrefixTranslator` replaced, which it has to match exactly"""
+    def __init__(self, prefix: bytes):
+        self._prefix = prefix
+        self._start_of_line = True
+        self._owed_carriage_return = False
+
+    def translate(self, data: bytes) -> bytes:  # pylint: disable=too-many-branches
+        output = bytes()
+        if data:
+            if self._owed_carriage_return:
+                self._owed_carriage_return = False
+                if data[0] != 0x0A:
+                    output += b"\r"
+                    output += self._prefix
+            elif self._start_of_line:
+                self._start_of_line = False
+                output += self._prefix
+        else:  # EoF
+            if self._owed_carriage_return:
+                self._owed_carriage_return = False
+                output += b"\r"
+
+        j = 0
+        for i in range(len(data)):  # pylint: disable=consider-using-enumerate
+            if data[i] == 0x0A:  # \n
+                output += data[j:i + 1]
+                j = i + 1
+                if i + 1 < len(data):
+                    output += self._prefix
+                else:
+                    self._start_of_line = True
+            elif data[i] == 0x0D:  # \r
+                if i + 1 < len(data):
+                    if data[i + 1] == 0x0A:  # \r\n
+                        output += data[j:i]
+                        j = i + 1
+                    else:
+                        output += data[j:i + 1]
+                        output += self._prefix
+                        j = i + 1
+                else:
+                    self._owed_carriage_return = True
+                    output += data[j:i]
+                    j = i + 1
+        output += data[j:]
+        return output
+
+
+def split(data: bytes, rng: random.Random) -> List[bytes]:
+    """Splits `data` into randomly sized, non-empty blocks, like reads from a pty or pipe"""
+    blocks = []
+    i = 0
+    while i < len(data):
+        size = rng.randint(1, 8)
+        blocks.append(data[i:i + size])
+        i += size
+    return blocks
+
+
+def translate_all(translate: Callable[[bytes], bytes], blocks: List[bytes]) -> bytes:
+    return b"".join(translate(block) for block in blocks + [b""])
+
+
+def check(iterations: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    for iteration in range(iterations):
+        data = bytes(rng.choice(b"ab\r\n") for _ in range(rng.randint(0, 64)))
+        blocks = split(data, rng)
+        expected = translate_all(ReferenceTranslator(PREFIX).translate, blocks)
+        actual = translate_all(PrefixTranslator(PREFIX).translate, blocks)
+        if actual != expected:
+            print(f'Iteration {iteration}: the translation of {blocks!r} differs from the reference', file=sys.stderr)
+            print(f'  expected: {expected!r}', file=sys.stderr)
+            print(f'  actual:   {actual!r}', file=sys.stderr)
+            return False
+    return True
+
+
+def benchmark(megabytes: float) -> None:
+    line = b"[1234/5678] Building CXX object lib/Core/CMakeFiles/kleeCore.dir/Executor.cpp.o\r\n"
+    data = line * int(megabytes * 2**20 / len(line))
+    translations: List[Tuple[str, Callable[[bytes], bytes], int]] = [
+        ("per byte", ReferenceTranslator(PREFIX).translate, 1024),
+        ("block-wise", PrefixTranslator(PREFIX).translate, READ_SIZE),
+    ]
+    for (name, translate, size) in translations:
+        blocks = [data[i:i + size] for i in range(0, len(data), size)]
+        start = time.perf_counter()
+        translate_all(translate, blocks)
+        milliseconds = (time.perf_counter() - start) * 1000
+        print(f'{name:>10}: {milliseconds:7.1f} ms for {len(data) / 2**20:.1f} MiB in blocks of {size} bytes')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the block-wise prefix translation of run_with_prefix matches the per-byte translation "
+        "it replaced on randomly split random output, and optionally compare the speed of both.")
+    parser.add_argument("--iterations", type=int, default=20000, help="The number of random outputs to check")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the random outputs")
+    parser.add_argument("--benchmark",
+                        metavar="MIB",
+                        type=float,
+                        help="Also time both translations on the given amount of ninja-style output")
+    args = parser.parse_args()
+
+    if not check(args.iterations, args.seed):
+        sys.exit(1)
+    print(f'The translation matches the reference on {args.iterations} random outputs')
+    if args.benchmark is not None:
+        benchmark(args.benchmark)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,4 @@ done
 DIR="$( cd -P "$(dirname "$SOURCE")" && pwd )"
 cd "$DIR"
 
-exec ../../ws /bin/bash -c 'cd ws-src && exec yapf --diff --style=.style.yapf --recursive --parallel lint/jobs.py setup.py workspace'
+exec ../../ws /bin/bash -c 'cd ws-src && exec yapf --diff --style=.style.yapf --recursive --parallel lint/jobs.py lint/importtime.py lint/prefix_translator.py setup.py workspace'
@@ -18,6 +18,17 @@ setup(
             "run            = workspace.bin.run:main",
             "build-dir      = workspace.bin.build_dir:main",
             "list-options   = workspace.bin.list_options:main",
+            "logs           = workspace.bin.logs:main",
+            "build-report   = workspace.bin.build_report:main",
+            "graph          = workspace.bin.graph:main",
+            "watch          = workspace.bin.watch:main",
+            "run-tests      = workspace.bin.run_tests:main",
+            "bench          = workspace.bin.bench:main",
+            "bisect-perf    = workspace.bin.bisect_perf:main",
+            "batch          = workspace.bin.batch:main",
+            "compile-corpus = workspace.bin.compile_corpus:main",
+            "stats          = workspace.bin.stats:main",
+            "daemon         = workspace.bin.daemon:main",
             "clean          = workspace.bin.clean:main",
             "dist-clean     = workspace.bin.dist_clean:main",
             "_ws_nop        = workspace.bin.nop:main",
@@ -1,3 +1,14 @@
-from .workspace import Workspace
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .workspace import Workspace
 
 __all__ = ["Workspace"]
+
+
+def __getattr__(name: str) -> Any:
+    # importing the workspace (and with it the recipes) is deferred, so that e.g. `workspace.settings` is cheap to load
+    if name == "Workspace":
+        from .workspace import Workspace  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return Workspace
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, MutableMapping, Optional
+
+import workspace.fingerprints as fingerprints
+from workspace.util import env_prepend_path
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.shells import Shell
+
+_ORIGINAL = "\0ws-original-value\0"
+
+# names of the variables that record an activation by `activate-cfg`, so that `deactivate-cfg` can undo it
+ACTIVATED_VARIABLES = "_WS_ACTIVATED_VARIABLES"
+BACKUP_PREFIX = "_WS_OLD_"
+
+
+class _RecordingEnv(MutableMapping[str, str]):
+    """An environment in which every variable seems to be set, so that prepending can be told apart from setting"""
+    def __init__(self) -> None:
+        self.recorded: Dict[str, str] = {}
+
+    def __getitem__(self, key: str) -> str:
+        return self.recorded.get(key, _ORIGINAL)
+
+    def __setitem__(self, key: str, value: str) -> None:
+        self.recorded[key] = str(value)
+
+    def __delitem__(self, key: str) -> None:
+        raise Exception(f'Removing the environment variable {key} cannot be recorded')
+
+    def __contains__(self, key: object) -> bool:
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.recorded)
+
+    def __len__(self) -> int:
+        return len(self.recorded)
+
+
+class EnvDelta:
+    """The changes to the environment that make the builds of a configuration usable"""
+    def __init__(self, assignments: Mapping[str, str], prepends: Mapping[str, str]) -> None:
+        self.assignments = dict(assignments)
+        self.prepends = dict(prepends)  # path lists that are prepended to the current value
+
+    @staticmethod
+    def record(workspace: Workspace) -> EnvDelta:
+        from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+        env = _RecordingEnv()
+        workspace.add_base_to_env(env)
+        workspace.add_to_env(env)
+        env["WS_CONFIG"] = workspace.config_name
+        env["WS_CONFIGS"] = workspace.config_name
+        env["WS_HOME"] = str(settings.ws_path)
+
+        assignments: Dict[str, str] = {}
+        prepends: Dict[str, str] = {}
+        for (key, value) in env.recorded.items():
+            if value.endswith(f':{_ORIGINAL}') and _ORIGINAL not in value[:-len(_ORIGINAL) - 1]:
+                prepends[key] = value[:-len(_ORIGINAL) - 1]
+            elif _ORIGINAL in value:
+                raise Exception(f'The change of the environment variable {key} cannot be recorded')
+            else:
+                assignments[key] = value
+        return EnvDelta(assignments, prepends)
+
+    def apply(self, env: MutableMapping[str, str]) -> MutableMapping[str, str]:
+        for (key, value) in self.prepends.items():
+            env_prepend_path(env, key, value)
+        env.update(self.assignments)
+        return env
+
+    def activation_script(self, shell: Shell) -> str:
+        keys = sorted(set(self.assignments) | set(self.prepends))
+        lines = [shell.format_backup(key, f'{BACKUP_PREFIX}{key}') for key in keys]
+        lines += [shell.format_prepend_path(key, value) for (key, value) in self.prepends.items()]
+        lines += [shell.format_set(key, value) for (key, value) in self.assignments.items()]
+        lines.append(shell.format_set(ACTIVATED_VARIABLES, ":".join(keys)))
+        return "\n".join(lines) + "\n"
+
+
+def deactivation_script(shell: Shell, environ: Mapping[str, str]) -> Optional[str]:
+    """Undoes the activation recorded in `environ`, if any"""
+    if ACTIVATED_VARIABLES not in environ:
+        return None
+    lines: List[str] = []
+    for key in filter(None, environ[ACTIVATED_VARIABLES].split(":")):
+        backup_key = f'{BACKUP_PREFIX}{key}'
+        if backup_key in environ:
+            lines += [shell.format_set(key, environ[backup_key]), shell.format_unset(backup_key)]
+        else:
+            lines.append(shell.format_unset(key))
+    lines.append(shell.format_unset(ACTIVATED_VARIABLES))
+    return "\n".join(lines) + "\n"
+
+
+def cache_path(config_name: str) -> Path:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return settings.ws_path / ".build" / "env" / f'{config_name}.json'
+
+
+def _store(config_name: str, inputs: List[Any], delta: EnvDelta) -> None:
+    path = cache_path(config_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')  # other processes may write it concurrently
+    with open(temporary_path, "wt") as file:
+        json.dump(
+            {
+                "source": fingerprints.source_stamp(),
+                "inputs": inputs,
+                "assignments": delta.assignments,
+                "prepends": delta.prepends,
+            }, file)
+    os.replace(temporary_path, path)
+
+
+def _load(config_name: str) -> Optional[EnvDelta]:
+    try:
+        with open(cache_path(config_name), "rt") as file:
+            cached = json.load(file)
+        inputs = fingerprints.check(config_name, cached["source"], cached["inputs"])
+        delta = EnvDelta(cached["assignments"], cached["prepends"])
+    except (FileNotFoundError, KeyError, TypeError, ValueError):
+        return None  # missing or damaged
+
+    if inputs is None:
+        return None
+    if [list(fingerprint) for fingerprint in inputs] != cached["inputs"]:
+        _store(config_name, [list(fingerprint) for fingerprint in inputs], delta)
+    return delta
+
+
+def env_delta(config_name: str, workspace: Optional[Workspace] = None) -> EnvDelta:
+    """
+    Returns the changes to the environment for the given configuration. They are cached in `.build/env`, so the
+    workspace (which is created if not passed in) only needs to be set up if the configuration, the settings or the
+    workspace sources changed.
+    """
+    cacheable = fingerprints.cacheable()
+    if cacheable:
+        delta = _load(config_name)
+        if delta is not None:
+            return delta
+
+    if workspace is None:
+        from workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+        workspace = Workspace(config_name)
+    inputs = fingerprints.current(config_name)
+    delta = EnvDelta.record(workspace)
+    if cacheable:
+        _store(config_name, [list(fingerprint) for fingerprint in inputs], delta)
+    return delta
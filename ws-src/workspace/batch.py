@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import abc
+import errno
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import schema
+
+import workspace.klee_output as klee_output
+import workspace.measurement as measurement
+import workspace.memoization as memoization
+
+# A job list is a JSON Lines file with one job per line, e.g.:
+#
+#     {"name": "echo-1", "bitcode": "bitcode/echo.bc", "arguments": ["--posix-runtime"], "program-arguments": ["A"]}
+#
+# Only the bitcode (relative to the job list) is required. The name, which identifies the job in the results and names
+# its output directory, defaults to the name of the bitcode file followed by the line number.
+
+_JOB_SCHEMA = schema.Schema({
+    schema.Optional("name"): schema.And(str, lambda name: name and "/" not in name and name not in (".", "..")),
+    "bitcode": str,
+    schema.Optional("arguments"): [str],
+    schema.Optional("program-arguments"): [str],
+})
+
+OK = "ok"
+FAILED = "failed"
+CRASHED = "crashed"
+WALL_TIME_LIMIT = "wall-time limit"
+CPU_TIME_LIMIT = "cpu-time limit"
+
+# signals that are usually sent from outside (e.g., by the OOM killer or when a machine is drained), after which the job
+# may well succeed when run again
+_TRANSIENT_SIGNALS = {signal.SIGKILL, signal.SIGTERM, signal.SIGHUP}
+
+
+class Job:  # pylint: disable=too-few-public-methods
+    def __init__(self, name: str, bitcode: Path, arguments: Sequence[str], program_arguments: Sequence[str]) -> None:
+        self.name = name
+        self.bitcode = bitcode
+        self.arguments = list(arguments)
+        self.program_arguments = list(program_arguments)
+
+
+def load_jobs(path: Path) -> List[Job]:
+    jobs = []
+    names: Set[str] = set()
+    with open(path, "rt") as file:
+        for (number, line) in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = _JOB_SCHEMA.validate(json.loads(line))
+            except (ValueError, schema.SchemaError) as error:
+                raise Exception(f'{path}:{number}: Invalid job: {error}')
+            bitcode = (path.parent / entry["bitcode"]).resolve()
+            name = entry.get("name", f'{bitcode.stem}-{number}')
+            if name in names:
+                raise Exception(f'{path}:{number}: There is another job named "{name}"')
+            names.add(name)
+            jobs.append(Job(name, bitcode, entry.get("arguments", []), entry.get("program-arguments", [])))
+    return jobs
+
+
+class Limits:  # pylint: disable=too-few-public-methods
+    def __init__(self,
+                 wall_seconds: Optional[float] = None,
+                 cpu_seconds: Optional[float] = None,
+                 memory_bytes: Optional[int] = None) -> None:
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+
+
+class Retries:  # pylint: disable=too-few-public-methods
+    """How often jobs that failed transiently are run again"""
+    def __init__(self, count: int = 0, exit_codes: Iterable[int] = ()) -> None:
+        self.count = count
+        self.exit_codes = set(exit_codes)  # of jobs that failed transiently (next to the ones killed from outside)
+
+    def transient(self, status: str, result: measurement.Measurement) -> bool:
+        if status == CRASHED:
+            return -result.returncode in _TRANSIENT_SIGNALS
+        return status == FAILED and result.returncode in self.exit_codes
+
+
+class _Sessions:
+    """The sessions of the running jobs, which are killed once the batch is cancelled"""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._running: Set[int] = set()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            for session in self._running:
+                try:
+                    os.killpg(session, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def started(self, session: int) -> None:
+        with self._lock:
+            self._running.add(session)
+            if self.cancelled:
+                os.killpg(session, signal.SIGKILL)
+
+    def finished(self, session: Optional[int]) -> bool:
+        """Returns whether the batch was cancelled"""
+        with self._lock:
+            if session is not None:
+                self._running.discard(session)
+            return self.cancelled
+
+
+Memo = Tuple[memoization.ResultCache, str]  # a result cache, and the digest of the binary whose results are memoized
+_Attempt = Tuple[measurement.Measurement, int, float]  # (measurement, number of the attempt, start time)
+
+
+class Runner:
+    """Runs jobs (from any number of threads), each of which leaves its output in a directory of its own"""
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            command: Sequence[str],
+            env: Mapping[str, str],
+            output_dir: Path,
+            limits: Limits,
+            retries: Retries,
+            memo: Optional[Memo] = None) -> None:
+        """`command` is the binary followed by the arguments that are passed to it for every job"""
+        self.command = list(command)
+        self.env = env
+        self.output_dir = output_dir
+        self.limits = limits
+        self.retries = retries
+        self.memo = memo
+        self._sessions = _Sessions()
+
+    def cancel(self) -> None:
+        """Kills the running jobs, and keeps failed jobs from being retried"""
+        self._sessions.cancel()
+
+    def _status(self, result: measurement.Measurement) -> str:
+        if result.timed_out:
+            return WALL_TIME_LIMIT
+        cpu_limit = self.limits.cpu_seconds
+        if cpu_limit is not None:
+            # jobs that ignore SIGXCPU are killed once they reach the hard limit
+            if result.returncode == -signal.SIGXCPU or (result.returncode == -signal.SIGKILL
+                                                        and result.cpu_seconds >= cpu_limit):
+                return CPU_TIME_LIMIT
+        if result.returncode == 0:
+            return OK
+        return CRASHED if result.returncode < 0 else FAILED
+
+    def _key(self, binary: str, job: Job) -> str:
+        (arguments, _) = memoization.normalize(self.command[1:] + job.arguments + [str(job.bitcode)] +
+                                               job.program_arguments)
+        limits = {
+            "wall_seconds": self.limits.wall_seconds,
+            "cpu_seconds": self.limits.cpu_seconds,
+            "memory_bytes": self.limits.memory_bytes,
+        }
+        return memoization.run_key(binary, arguments, limits)
+
+    def run(self, job: Job) -> Dict[str, Any]:
+        """Runs `job` (again, if it failed transiently), unless its result is memoized, and returns its result"""
+        output_dir = self.output_dir / job.name
+        log_path = self.output_dir / f'{job.name}.log'
+        key = None
+        if self.memo is not None:
+            (cache, binary) = self.memo
+            key = self._key(binary, job)
+            memoized = cache.lookup(key)
+            if memoized is not None:
+                if output_dir.exists():
+                    shutil.rmtree(output_dir)
+                cache.restore(key, output_dir, log_path)
+                return dict(memoized, name=job.name, bitcode=str(job.bitcode), output_dir=str(output_dir), cached=True)
+
+        (attempt, transient) = self._attempts(job, output_dir, log_path)
+        outcome = self._outcome(job, output_dir, attempt)
+        if key is not None and not transient:  # the result of a cancelled job is not memoized either
+            assert self.memo is not None
+            self.memo[0].store(key, outcome, output_dir, log_path)
+        return outcome
+
+    def _attempts(self, job: Job, output_dir: Path, log_path: Path) -> Tuple[_Attempt, bool]:
+        """Runs `job` until it does not fail transiently or is out of retries. Returns whether the last attempt did"""
+        sessions: List[int] = []  # the session of the current attempt
+
+        def started(session: int) -> None:
+            sessions.append(session)
+            self._sessions.started(session)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            if output_dir.exists():
+                shutil.rmtree(output_dir)  # KLEE refuses to reuse an output directory
+            command = measurement.limited(
+                self.command + job.arguments + [f'--output-dir={output_dir}', str(job.bitcode)] +
+                job.program_arguments, self.limits.cpu_seconds, self.limits.memory_bytes)
+            started_at = time.time()
+            with open(log_path, "wb") as log:
+                try:
+                    result = measurement.run(command,
+                                             env=self.env,
+                                             timeout=self.limits.wall_seconds,
+                                             stdout=log,
+                                             stderr=log,
+                                             started=started)
+                except OSError as error:
+                    # the machine is (temporarily) out of processes or memory, which is not waited out once cancelled
+                    if (error.errno not in (errno.EAGAIN, errno.ENOMEM) or attempt > self.retries.count
+                            or self._sessions.cancelled):
+                        raise
+                    time.sleep(min(2**attempt, 60))
+                    continue
+            cancelled = self._sessions.finished(sessions.pop() if sessions else None)
+            transient = cancelled or self.retries.transient(self._status(result), result)
+            if cancelled or not transient or attempt > self.retries.count:
+                return ((result, attempt, started_at), transient)
+            time.sleep(min(2**attempt, 60))
+
+    def _outcome(self, job: Job, output_dir: Path, attempt: _Attempt) -> Dict[str, Any]:
+        (result, number, started_at) = attempt
+        done = klee_output.read_info(output_dir)
+        return {
+            "name": job.name,
+            "bitcode": str(job.bitcode),
+            "status": self._status(result),
+            "returncode": result.returncode,
+            "attempts": number,
+            "started": started_at,
+            "wall_seconds": result.wall_seconds,
+            "cpu_seconds": result.cpu_seconds,
+            "max_rss_mib": result.max_rss_bytes / 2**20,
+            "instructions": klee_output.instructions(done),
+            "paths": klee_output.explored_paths(done),
+            "output_dir": str(output_dir),
+            "cached": False,
+        }
+
+
+# the columns of the results, in the order in which they are stored
+COLUMNS = [
+    "name", "bitcode", "status", "returncode", "attempts", "started", "wall_seconds", "cpu_seconds", "max_rss_mib",
+    "instructions", "paths", "output_dir", "cached"
+]
+
+
+class Results(abc.ABC):
+    """A file that results are streamed into, one at a time, so that an interrupted batch can be resumed"""
+    @abc.abstractmethod
+    def finished(self) -> Set[str]:
+        """The names of the jobs whose results are already stored"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add(self, result: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> Results:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class JsonLinesResults(Results):
+    def __init__(self, path: Path) -> None:
+        self._finished: Set[str] = set()
+        if path.exists():
+            with open(path, "rt") as file:
+                for line in file:
+                    try:
+                        self._finished.add(json.loads(line)["name"])
+                    except (ValueError, KeyError):
+                        pass  # e.g., the last line of an interrupted batch
+        self._file = open(path, "at")
+        if self._file.tell() > 0:
+            with open(path, "rb") as last:
+                last.seek(-1, 2)
+                if last.read() != b"\n":
+                    self._file.write("\n")  # terminate the incomplete last line
+
+    def finished(self) -> Set[str]:
+        return self._finished
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self._file.write(json.dumps({column: result[column] for column in COLUMNS}) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SqliteResults(Results):
+    def __init__(self, path: Path) -> None:
+        self._connection = sqlite3.connect(str(path))
+        self._connection.execute(f'CREATE TABLE IF NOT EXISTS results ({", ".join(COLUMNS)}, PRIMARY KEY (name))')
+        existing = {row[1] for row in self._connection.execute("PRAGMA table_info(results)")}
+        for column in COLUMNS:
+            if column not in existing:
+                self._connection.execute(f'ALTER TABLE results ADD COLUMN {column}')  # written by an older version
+        self._connection.commit()
+
+    def finished(self) -> Set[str]:
+        return {row[0] for row in self._connection.execute("SELECT name FROM results")}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self._connection.execute(
+            f'INSERT OR REPLACE INTO results ({", ".join(COLUMNS)}) VALUES ({", ".join("?" for _ in COLUMNS)})',
+            [result[column] for column in COLUMNS])
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def open_results(path: Path) -> Results:
+    """Opens the results at `path`, which are stored in an SQLite database if its suffix is .sqlite or .db"""
+    if path.suffix in (".sqlite", ".db"):
+        return SqliteResults(path)
+    return JsonLinesResults(path)
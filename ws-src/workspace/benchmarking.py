@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+import shutil
+import statistics
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import schema
+import toml
+
+import workspace.klee_output as klee_output
+import workspace.measurement as measurement
+
+# A corpus is a TOML file that lists the programs to run KLEE (or PORSE) on, e.g.:
+#
+#     repetitions = 5                      # how often every program is run (default: 5)
+#     timeout = 600                        # seconds after which a run is killed (default: none)
+#     command = ["klee"]                   # the command that is run (default: klee)
+#     arguments = ["--max-time=60s"]       # arguments that are passed to the command for every program
+#
+#     [[program]]
+#     name = "echo"                        # defaults to the name of the bitcode file
+#     bitcode = "bitcode/echo.bc"          # relative to the corpus file
+#     arguments = ["--posix-runtime"]      # passed to the command after the common arguments
+#     program-arguments = ["--sym-arg", "4"]
+
+_SCHEMA = schema.Schema({
+    schema.Optional("repetitions"): schema.And(int, lambda value: value > 0),
+    schema.Optional("timeout"): schema.And(schema.Or(int, float), lambda value: value > 0),
+    schema.Optional("command"): [str],
+    schema.Optional("arguments"): [str],
+    "program": [{
+        schema.Optional("name"): str,
+        "bitcode": str,
+        schema.Optional("arguments"): [str],
+        schema.Optional("program-arguments"): [str],
+    }],
+})
+
+# (key, description, format specification) of the metrics that are recorded for every run
+METRICS: List[Tuple[str, str, str]] = [
+    ("wall_seconds", "wall time (s)", ".2f"),
+    ("max_rss_mib", "peak RSS (MiB)", ".1f"),
+    ("instructions", "instructions", ".0f"),
+    ("paths", "explored paths", ".0f"),
+]
+
+
+class Program:  # pylint: disable=too-few-public-methods
+    def __init__(self, name: str, bitcode: Path, arguments: Sequence[str], program_arguments: Sequence[str]) -> None:
+        self.name = name
+        self.bitcode = bitcode
+        self.arguments = list(arguments)
+        self.program_arguments = list(program_arguments)
+
+
+class Corpus:  # pylint: disable=too-few-public-methods
+    def __init__(self, path: Path) -> None:
+        with open(path, "rt") as file:
+            data = _SCHEMA.validate(toml.load(file))
+        self.path = path
+        self.repetitions: int = data.get("repetitions", 5)
+        self.timeout: Optional[float] = data.get("timeout")
+        self.command: List[str] = data.get("command", ["klee"])
+        self.arguments: List[str] = data.get("arguments", [])
+        self.programs: List[Program] = []
+        for entry in data["program"]:
+            bitcode = (path.parent / entry["bitcode"]).resolve()
+            self.programs.append(
+                Program(entry.get("name", bitcode.stem), bitcode, entry.get("arguments", []),
+                        entry.get("program-arguments", [])))
+        names = [program.name for program in self.programs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise Exception(f'The corpus "{path}" contains several programs named {", ".join(duplicates)}')
+
+    def run(self, program: Program, env: Mapping[str, str]) -> Dict[str, Any]:
+        """Runs the command on `program` once, and returns the measured metrics (which are `None` if unknown)"""
+        output_parent = Path(tempfile.mkdtemp(prefix="ws-bench-"))
+        try:
+            output_dir = output_parent / "klee-out"
+            command: List[Union[str, Path]] = [
+                *self.command, *self.arguments, *program.arguments, f'--output-dir={output_dir}', program.bitcode,
+                *program.program_arguments
+            ]
+            result = measurement.run(command, env=env, cwd=output_parent, timeout=self.timeout)
+            done = klee_output.read_info(output_dir)
+        finally:
+            shutil.rmtree(output_parent, ignore_errors=True)
+        return {
+            "returncode": result.returncode,
+            "timed_out": result.timed_out,
+            "wall_seconds": result.wall_seconds,
+            "max_rss_mib": result.max_rss_bytes / 2**20,
+            "instructions": klee_output.instructions(done),
+            "paths": klee_output.explored_paths(done),
+        }
+
+
+# two-sided 95% quantiles of Student's t-distribution for small degrees of freedom
+_T_975 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120,
+    2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+
+
+def _t_975(degrees_of_freedom: float) -> float:
+    if degrees_of_freedom < len(_T_975):
+        return _T_975[max(0, int(degrees_of_freedom) - 1)]  # rounding down is conservative
+    # Cornish-Fisher expansion around the normal quantile, which is accurate for larger degrees of freedom
+    normal_quantile = 1.959964
+    return (normal_quantile + (normal_quantile**3 + normal_quantile) / (4 * degrees_of_freedom) +
+            (5 * normal_quantile**5 + 16 * normal_quantile**3 + 3 * normal_quantile) / (96 * degrees_of_freedom**2))
+
+
+def mean_interval(values: Sequence[float]) -> Tuple[float, float]:
+    """Returns the mean of `values` and the half width of its 95% confidence interval"""
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return (mean, math.nan)
+    return (mean, _t_975(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values)))
+
+
+def relative_difference(baseline: Sequence[float], values: Sequence[float]) -> Tuple[float, float, float]:
+    """
+    Returns the difference between the means of `values` and `baseline` relative to the mean of `baseline`, together
+    with the bounds of its 95% confidence interval (by Welch's t-test, which does not assume equal variances).
+    """
+    (mean_a, mean_b) = (statistics.mean(baseline), statistics.mean(values))
+    if mean_a == 0:
+        return (math.nan, math.nan, math.nan)
+    delta = (mean_b - mean_a) / mean_a
+    if len(baseline) < 2 or len(values) < 2:
+        return (delta, math.nan, math.nan)
+    (var_a, var_b) = (statistics.variance(baseline) / len(baseline), statistics.variance(values) / len(values))
+    if var_a + var_b == 0:
+        return (delta, delta, delta)
+    degrees_of_freedom = (var_a + var_b)**2 / (var_a**2 / (len(baseline) - 1) + var_b**2 / (len(values) - 1))
+    half_width = _t_975(degrees_of_freedom) * math.sqrt(var_a + var_b) / abs(mean_a)
+    return (delta, delta - half_width, delta + half_width)
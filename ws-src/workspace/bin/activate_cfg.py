@@ -0,0 +1,31 @@
+import argparse
+import os
+import sys
+
+import workspace.activation as activation
+from workspace.settings import settings
+from workspace.shells import create_shell
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print shell commands that set up the environment for the given configuration, e.g., "
+        '`eval "$(activate-cfg debug)"` or `activate-cfg -s fish debug > debug.fish`. Undo with `deactivate-cfg`.')
+
+    settings.config.add_argument(parser)
+    settings.shell.add_kwargument(parser, help_message="The shell to print commands for")
+    settings.bind_args(parser)
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        print(file=sys.stderr)
+        parser.print_help(sys.stderr)
+        sys.exit(1)
+
+    if activation.ACTIVATED_VARIABLES in os.environ:
+        print("Error: A configuration is already activated, run `deactivate-cfg` first", file=sys.stderr)
+        sys.exit(1)
+
+    shell = create_shell(settings.shell.value)
+    print(activation.env_delta(config).activation_script(shell), end="")
@@ -0,0 +1,132 @@
+import argparse
+import collections
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import workspace.activation as activation
+import workspace.batch as batch
+import workspace.memoization as memoization
+import workspace.util as util
+from workspace import Workspace
+from workspace.settings import settings
+
+
+def _parse_args() -> Tuple[argparse.Namespace, List[str]]:
+    """Returns the arguments, and the arguments after -- that are passed to the command for every job"""
+    parser = argparse.ArgumentParser(
+        description="Run KLEE (or PORSE) on every job of a job list (a JSON Lines file with one job per line), with a "
+        "bounded number of jobs running in parallel in the environment of a configuration. Every job runs with the "
+        "given resource limits, is retried if it failed transiently, and has its result appended to a single results "
+        "file as soon as it is done. Jobs whose results are already in the results file are skipped, so an interrupted "
+        "batch continues where it stopped. Arguments after -- are passed to the command for every job, before the "
+        "arguments of the job.")
+
+    settings.config.add_kwargument(parser)
+    settings.jobs.add_kwargument(parser, help_message="The number of jobs to run in parallel")
+    parser.add_argument('job_list', metavar="JOB_LIST", help="The jobs to run")
+    parser.add_argument('--results',
+                        metavar="FILE",
+                        required=True,
+                        help="The file the results are appended to (an SQLite database if it ends in .sqlite or .db, "
+                        "JSON Lines otherwise)")
+    parser.add_argument('--output-dir',
+                        metavar="DIR",
+                        default="batch-out",
+                        help="The directory that receives the output directories and logs of all jobs "
+                        "(default: batch-out)")
+    parser.add_argument('--command', default="klee", help="The command to run (default: klee)")
+    parser.add_argument('--wall-time', type=float, metavar="SECONDS", help="Kill jobs that run longer than this")
+    parser.add_argument('--cpu-time', type=float, metavar="SECONDS", help="Limit the CPU time of every job")
+    parser.add_argument('--memory', type=int, metavar="MIB", help="Limit the address space of every job")
+    parser.add_argument('--retries',
+                        type=int,
+                        default=2,
+                        metavar="N",
+                        help="Run jobs that failed transiently (i.e., that were killed from outside, or exited with "
+                        "one of the --retry-exit-code codes) up to N more times (default: 2)")
+    parser.add_argument('--memoize',
+                        action="store_true",
+                        help="Take the results of jobs that ran before with the same binary, input, arguments and "
+                        "limits from the result cache in .build/results, and add the results of new jobs to it")
+    parser.add_argument('--retry-exit-code',
+                        type=int,
+                        action="append",
+                        default=[],
+                        metavar="CODE",
+                        help="Consider jobs that exit with CODE to have failed transiently")
+
+    # argparse cannot tell the arguments after -- from the job list, so they are split off before parsing
+    arguments: List[str] = []
+    if "--" in sys.argv:
+        separator = sys.argv.index("--")
+        (sys.argv, arguments) = (sys.argv[:separator], sys.argv[separator + 1:])
+    settings.bind_args(parser)
+    return (parser.parse_args(), arguments)
+
+
+def _runner(config: str, args: argparse.Namespace, arguments: List[str]) -> batch.Runner:
+    workspace = None
+    if args.memoize:
+        workspace = Workspace(config)
+        workspace.initialize_builds()
+    env = activation.env_delta(config, workspace).apply(os.environ.copy())
+    executable = shutil.which(args.command, path=env.get("PATH"))
+    if executable is None:
+        print(f'Error: The command {args.command} could not be found in the environment of {config}', file=sys.stderr)
+        sys.exit(1)
+    memo = None
+    if workspace is not None:
+        memo = (memoization.ResultCache(workspace.build_dir / "results"),
+                memoization.binary_digest(workspace, Path(executable)))
+    output_dir = Path(args.output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    limits = batch.Limits(args.wall_time, args.cpu_time, args.memory * 2**20 if args.memory is not None else None)
+    return batch.Runner([args.command] + arguments, env, output_dir, limits,
+                        batch.Retries(args.retries, args.retry_exit_code), memo)
+
+
+def _run(runner: batch.Runner, jobs: List[batch.Job], results_path: Path) -> Dict[str, int]:
+    """Runs the jobs that have no results yet, and returns how many jobs ended with which status"""
+    statuses: Dict[str, int] = collections.Counter()
+    with batch.open_results(results_path) as results:
+        finished = results.finished()
+        pending = [job for job in jobs if job.name not in finished]
+        print(f'Running {len(pending)} jobs with {settings.jobs.value} in parallel '
+              f'({len(jobs) - len(pending)} jobs that have results already are skipped)',
+              flush=True)
+
+        def record(_: batch.Job, result: Dict[str, Any]) -> None:
+            results.add(result)
+            statuses[result["status"]] += 1
+            if result["cached"]:
+                details = "memoized"
+            else:
+                details = f'{result["wall_seconds"]:.1f}s'
+                if result["attempts"] > 1:
+                    details += f', {result["attempts"]} attempts'
+            print(f'{result["status"]}: {result["name"]} ({details}) ({sum(statuses.values())} of {len(pending)})',
+                  flush=True)
+
+        # the jobs run in sessions of their own, which do not receive an interrupt, so the runner kills them
+        util.run_parallel(runner.run, pending, settings.jobs.value, record, runner.cancel)
+    return statuses
+
+
+def main():
+    (args, arguments) = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    jobs = batch.load_jobs(Path(args.job_list))
+    statuses = _run(_runner(config, args, arguments), jobs, Path(args.results))
+
+    print()
+    print(", ".join(f'{count} {status}' for (status, count) in sorted(statuses.items())) or "No jobs were run")
+    if any(status != batch.OK for status in statuses):
+        sys.exit(1)
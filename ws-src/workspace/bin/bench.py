@@ -0,0 +1,108 @@
+import argparse
+import json
+import math
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import workspace.activation as activation
+import workspace.benchmarking as benchmarking
+from workspace.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run KLEE (or PORSE) as built by several configurations on a corpus of programs, and compare the "
+        "wall time, peak memory, instructions and explored paths of every other configuration to the first one. "
+        "Runs are repeated and interleaved, and differences are reported with 95% confidence intervals.")
+
+    settings.configs.add_argument(parser,
+                                  help_message="The configurations to compare, the first one being the baseline")
+    parser.add_argument('--corpus', metavar="FILE", required=True, help="The corpus (a TOML file) to run")
+    parser.add_argument('-r',
+                        '--repetitions',
+                        type=int,
+                        metavar="N",
+                        help="Run every program N times per configuration (default: as given by the corpus)")
+    parser.add_argument('--results', metavar="FILE", help="Also write all measurements to FILE (as JSON)")
+    settings.bind_args(parser)
+    args = parser.parse_args()
+
+    configs = settings.configs.value
+    if not configs:
+        print(f'Error: Setting "{settings.configs.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    corpus = benchmarking.Corpus(Path(args.corpus))
+    repetitions = args.repetitions if args.repetitions is not None else corpus.repetitions
+    envs = {config: activation.env_delta(config).apply(os.environ.copy()) for config in configs}
+    for program in corpus.programs:
+        if not program.bitcode.is_file():
+            print(f'Error: The bitcode of {program.name} does not exist at "{program.bitcode}"', file=sys.stderr)
+            sys.exit(1)
+
+    # interleaving the configurations spreads changes of the machine's load evenly across them
+    samples: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+        program.name: {config: []
+                       for config in configs}
+        for program in corpus.programs
+    }
+    for repetition in range(1, repetitions + 1):
+        for program in corpus.programs:
+            for config in configs:
+                sample = corpus.run(program, envs[config])
+                samples[program.name][config].append(sample)
+                status = "timed out" if sample["timed_out"] else f'exit code {sample["returncode"]}'
+                print(f'[{repetition}/{repetitions}] {program.name} with {config}: {sample["wall_seconds"]:.2f}s, '
+                      f'{status}',
+                      flush=True)
+
+    if args.results is not None:
+        with open(args.results, "wt") as file:
+            json.dump({"configs": configs, "samples": samples}, file, indent=2)
+
+    from tabulate import tabulate  # pylint: disable=import-outside-toplevel
+
+    print()
+    print(tabulate(_report(samples, configs), headers=["program", "metric"] + configs, disable_numparse=True))
+
+
+def _report(samples: Dict[str, Dict[str, List[Dict[str, Any]]]], configs: List[str]) -> List[List[str]]:
+    rows = []
+    for (program, by_config) in samples.items():
+        # failed runs are left out, as they usually stopped early
+        succeeded = {
+            config: [sample for sample in by_config[config] if sample["returncode"] == 0 and not sample["timed_out"]]
+            for config in configs
+        }
+        for (key, description, spec) in benchmarking.METRICS:
+            values = {
+                config: [sample[key] for sample in succeeded[config] if sample[key] is not None]
+                for config in configs
+            }
+            if not any(values.values()):
+                continue
+            row = [program, description]
+            for config in configs:
+                row.append(_cell(values[configs[0]], values[config], spec, config == configs[0]))
+            rows.append(row)
+        failed = [len(by_config[config]) - len(succeeded[config]) for config in configs]
+        if any(failed):
+            rows.append([program, "failed runs"] + [str(count) for count in failed])
+    return rows
+
+
+def _cell(baseline: List[float], values: List[float], spec: str, is_baseline: bool) -> str:
+    if not values:
+        return "-"
+    (mean, half_width) = benchmarking.mean_interval(values)
+    text = f'{mean:{spec}}' if math.isnan(half_width) else f'{mean:{spec}} ± {half_width:{spec}}'
+    if is_baseline or not baseline:
+        return text
+    (delta, low, high) = benchmarking.relative_difference(baseline, values)
+    if math.isnan(delta):
+        return text
+    if math.isnan(low):
+        return f'{text} ({delta:+.1%})'
+    return f'{text} ({delta:+.1%} [{low:+.1%}, {high:+.1%}])'
@@ -0,0 +1,109 @@
+import argparse
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import workspace.benchmarking as benchmarking
+import workspace.bisecting as bisecting
+import workspace.locking as locking
+from workspace import Workspace
+from workspace.settings import settings
+
+if TYPE_CHECKING:
+    from workspace.recipes.porse import PORSE
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Find the PORSE commit that made a workload slower (or changed it otherwise) by running git bisect "
+        "over the PORSE sources, in a separate worktree unless --in-place is given. Only PORSE is rebuilt for every "
+        "tested commit; the builds it depends on are reused as they are.")
+
+    settings.config.add_argument(parser)
+    settings.jobs.add_kwargument(parser)
+    parser.add_argument('--good', metavar="REV", required=True, help="A commit with the expected performance")
+    parser.add_argument('--bad', metavar="REV", default="HEAD", help="A commit that performs worse (default: HEAD)")
+    parser.add_argument('--corpus', metavar="FILE", required=True, help="The corpus (a TOML file) to run as workload")
+    parser.add_argument('-r',
+                        '--repetitions',
+                        type=int,
+                        metavar="N",
+                        help="Run the workload N times per commit (default: as given by the corpus)")
+    parser.add_argument('--metric',
+                        choices=[key for (key, _, _) in benchmarking.METRICS],
+                        default="wall_seconds",
+                        help="The metric to compare (default: wall_seconds)")
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=10.0,
+                        metavar="PERCENT",
+                        help="Commits that differ from the good commit by more than this are bad (default: 10)")
+    parser.add_argument('--build', metavar="NAME", help="The PORSE build to bisect (default: the one of the config)")
+    parser.add_argument('--in-place',
+                        action="store_true",
+                        help="Bisect the source directory itself instead of a separate worktree")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def _select_build(workspace: Workspace, name: Optional[str]) -> "PORSE":
+    from workspace.recipes.porse import PORSE  # pylint: disable=import-outside-toplevel
+
+    if name is not None:
+        build = workspace.graph[name]
+    else:
+        candidates = [build for build in workspace.builds if isinstance(build, PORSE)]
+        if len(candidates) != 1:
+            print(f'Error: The configuration "{workspace.config_name}" contains {len(candidates)} PORSE builds, '
+                  'choose one with --build',
+                  file=sys.stderr)
+            sys.exit(1)
+        build = candidates[0]
+    if not isinstance(build, PORSE):
+        print(f'Error: The build "{build.name}" is not a PORSE build', file=sys.stderr)
+        sys.exit(1)
+    return build
+
+
+def _build_dependencies(workspace: Workspace, build: "PORSE") -> None:
+    """Builds the builds PORSE depends on once, after which they are left alone"""
+    if not build.paths["src_dir"].is_dir():
+        workspace.setup([build.name])
+    dependencies = [dependency.name for dependency in workspace.graph.plan([build.name]) if dependency is not build]
+    if dependencies:
+        print("Building", ", ".join(dependencies), flush=True)
+        workspace.build(dependencies)
+
+
+def _print_result(bisection: bisecting.Bisection, first_bad: Optional[str]) -> None:
+    print(f'\nTested commits ({bisection.workload.metric} relative to the good commit):')
+    for measured in bisection.measured.values():
+        print(f'  {measured.commit[:12]}  {measured.verdict:4}  {bisecting.describe(measured):28}  {measured.subject}')
+    print()
+    if first_bad is None:
+        print("The first bad commit could not be determined, as some commits could not be measured")
+        sys.exit(1)
+    print(f'The first bad commit is {first_bad} {bisection.measured[first_bad].subject}')
+
+
+def main():
+    args = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+    build = _select_build(workspace, args.build)
+    corpus = benchmarking.Corpus(Path(args.corpus))
+    repetitions = args.repetitions if args.repetitions is not None else corpus.repetitions
+    _build_dependencies(workspace, build)
+
+    workload = bisecting.Workload(corpus, repetitions, args.metric)
+    bisection = bisecting.Bisection(workspace, build, workload, args.threshold / 100, args.in_place)
+    with locking.locked(bisection.directories.src, f'the sources of {build.name}'):
+        bisection.prepare()
+        first_bad = bisection.run(args.good, args.bad)
+    _print_result(bisection, first_bad)
@@ -1,8 +1,11 @@
 import argparse
 import shutil
+import sys
 
 from pyfiglet import Figlet
 
+import workspace.daemon as daemon
+import workspace.tracing as tracing
 from workspace import Workspace
 from workspace.settings import settings
 
@@ -13,7 +16,12 @@ def main():
         "By default, builds all configurations, or only the configuration of the current environment if one is active.")
 
     settings.configs.add_argument(parser)
+    settings.color.add_kwargument(parser)
     settings.jobs.add_kwargument(parser)
+    settings.metrics_dir.add_kwargument(parser)
+    settings.only.add_kwargument(parser)
+    settings.rebuild_dependents.add_kwargument(parser)
+    settings.trace.add_kwargument(parser)
     settings.until.add_kwargument(parser)
 
     settings.bind_args(parser)
@@ -26,9 +34,28 @@ def main():
         print("Building", ", ".join(settings.configs.value[:-1]), "and", settings.configs.value[-1])
         print()
 
+    use_daemon = daemon.usable()
+    partial = settings.only.value is not None or bool(settings.rebuild_dependents.value)
+
     figlet = Figlet(font="doom", width=80)
-    for config in settings.configs.value:
-        figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
-        print(figlet.renderText(f'Building {config}'))
-        workspace = Workspace(config)
-        workspace.build()
+    with tracing.tracing(settings.trace.value):
+        for config in settings.configs.value:
+            figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
+            print(figlet.renderText(f'Building {config}'), flush=True)
+            workspace = None
+            only = None
+            if partial:
+                workspace = Workspace(config)
+                plan = workspace.graph.plan(settings.only.value, settings.rebuild_dependents.value)
+                only = [build.name for build in plan]
+                print("Building", ", ".join(only) if only else "nothing", flush=True)
+            # the daemon may have stopped since, in which case the configuration is built here
+            returncode = daemon.build(config, only) if use_daemon else None
+            if returncode is not None:
+                if returncode != 0:
+                    sys.exit(returncode)
+                continue
+            with tracing.span(f'build {config}', config=config):
+                if workspace is None:
+                    workspace = Workspace(config)
+                workspace.build(only)
@@ -1,7 +1,7 @@
 import argparse
 import sys
 
-from workspace import Workspace
+import workspace.path_index as path_index
 from workspace.settings import settings
 
 
@@ -31,9 +31,16 @@ def main():
         print("Cannot determine required setting: Configuration is not set", file=sys.stderr)
         sys.exit(1)
 
-    workspace = Workspace(settings.config.value)
-    workspace.initialize_builds()
-    build = [build.paths["build_dir"] for build in workspace.builds if build.name == settings.build_name.value]
+    build_dir = path_index.lookup(settings.config.value, settings.build_name.value)
+    if build_dir is not None:
+        build = [build_dir]
+    else:
+        # the index is missing or outdated, so the workspace has to be set up (which also writes a new index)
+        from workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+        workspace = Workspace(settings.config.value)
+        workspace.initialize_builds()
+        build = [build.paths["build_dir"] for build in workspace.builds if build.name == settings.build_name.value]
     assert len(build) <= 1
     if not build:
         print(
@@ -0,0 +1,83 @@
+import argparse
+import sys
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from workspace import Workspace
+from workspace.build_report import NinjaEdge, critical_path, idle_fraction, load_last_run, recipe_duration, wall_time
+from workspace.settings import settings
+
+if TYPE_CHECKING:
+    from workspace.recipes.recipe import Recipe
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report where the time of the last build of a configuration went: the slowest translation units "
+        "and links (taken from the ninja logs), how many cores were left idle, and the critical path through the "
+        "dependencies between the builds.")
+
+    settings.config.add_argument(parser)
+    settings.jobs.add_kwargument(parser, help_message="The number of cores to compute idle time against")
+    parser.add_argument('-n',
+                        '--top',
+                        type=int,
+                        default=10,
+                        metavar="N",
+                        help="The number of translation units and links to list (default: 10)")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def _print_builds(workspace: Workspace, jobs: int) -> Tuple[List[Tuple["Recipe", NinjaEdge]], Dict[str, float]]:
+    """Prints a line per build, and returns the ninja edges and the durations of all builds"""
+    edges: List[Tuple["Recipe", NinjaEdge]] = []
+    durations: Dict[str, float] = {}
+    print("Builds:")
+    for build in workspace.builds:
+        build_edges = load_last_run(workspace, build.paths["build_dir"])
+        duration = recipe_duration(workspace, build, build_edges)
+        if duration is not None:
+            durations[build.name] = duration
+
+        line = f'  {build.name} ({build.profile_name}): '
+        line += f'{duration:.1f}s' if duration is not None else "never built"
+        if build_edges:
+            line += (f', last ninja run: {len(build_edges)} edges in {wall_time(build_edges) / 1000:.1f}s, '
+                     f'{idle_fraction(build_edges, jobs):.0%} of {jobs} cores idle')
+            edges += [(build, edge) for edge in build_edges]
+        print(line)
+    return (edges, durations)
+
+
+def _print_slowest(edges: List[Tuple["Recipe", NinjaEdge]], top: int) -> None:
+    for (kind, title) in [("compile", "translation units"), ("link", "links")]:
+        slowest = sorted((item for item in edges if item[1].kind == kind),
+                         key=lambda item: item[1].duration,
+                         reverse=True)[:top]
+        if slowest:
+            print()
+            print(f'Slowest {title}:')
+            for (build, edge) in slowest:
+                print(f'  {edge.duration / 1000:8.1f}s  {build.output_prefix}{edge.outputs[0]}')
+
+
+def main():
+    args = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+
+    (edges, durations) = _print_builds(workspace, settings.jobs.value)
+    _print_slowest(edges, args.top)
+
+    (length, path) = critical_path(workspace, durations)
+    if path:
+        print()
+        print(f'Critical path: {length:.1f}s of {sum(durations.values()):.1f}s spent building in total')
+        for build in path:
+            print(f'  {durations.get(build.name, 0.0):8.1f}s  {build.name} ({build.profile_name})')
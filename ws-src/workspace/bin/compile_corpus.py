@@ -0,0 +1,124 @@
+import argparse
+import collections
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import workspace.activation as activation
+import workspace.bitcode as bitcode
+import workspace.memoization as memoization
+import workspace.util as util
+from workspace import Workspace
+from workspace.settings import settings
+
+if TYPE_CHECKING:
+    from workspace.recipes.llvm import LLVM
+
+
+def _parse_args() -> Tuple[argparse.Namespace, List[str]]:
+    """Returns the arguments, and the flags that are passed to clang"""
+    parser = argparse.ArgumentParser(
+        description="Compile all C and C++ sources below a directory to LLVM bitcode in parallel, using the clang "
+        "of a configuration in its environment (so that, e.g., the runtime headers of PORSE are found). The bitcode "
+        "is cached in .build/bitcode, so that only sources whose contents, included headers or flags changed, or "
+        "that were compiled with a different LLVM, are compiled again. Arguments after -- are passed to clang "
+        f'instead of the default flags ({" ".join(bitcode.DEFAULT_FLAGS)}).')
+
+    settings.config.add_kwargument(parser)
+    settings.jobs.add_kwargument(parser, help_message="The number of sources to compile in parallel")
+    parser.add_argument('source_dir', metavar="SOURCE_DIR", help="The directory that contains the sources")
+    parser.add_argument('-o',
+                        '--output-dir',
+                        metavar="DIR",
+                        required=True,
+                        help="The directory that receives the bitcode, with the same layout as the source directory")
+    parser.add_argument('--llvm',
+                        metavar="NAME",
+                        help="The LLVM build whose clang is used (default: the one used by PORSE, if any)")
+
+    # argparse cannot tell the flags after -- from the source directory, so they are split off before parsing
+    flags: List[str] = bitcode.DEFAULT_FLAGS
+    if "--" in sys.argv:
+        separator = sys.argv.index("--")
+        (sys.argv, flags) = (sys.argv[:separator], sys.argv[separator + 1:])
+    settings.bind_args(parser)
+    return (parser.parse_args(), flags)
+
+
+def _select_llvm(workspace: Workspace, name: Optional[str]) -> "LLVM":
+    """The LLVM build named `name`, or by default the one used by the last PORSE build (or else the last LLVM build)"""
+    # pylint: disable=import-outside-toplevel
+    from workspace.recipes.llvm import LLVM
+    from workspace.recipes.porse import PORSE
+
+    if name is not None:
+        llvm = workspace.graph[name]
+        if not isinstance(llvm, LLVM):
+            print(f'Error: The build "{llvm.name}" is not an LLVM build', file=sys.stderr)
+            sys.exit(1)
+        return llvm
+    porses = [build for build in workspace.builds if isinstance(build, PORSE)]
+    llvms = [build for build in workspace.builds if isinstance(build, LLVM)]
+    if porses:
+        return porses[-1].find_llvm(workspace)
+    if llvms:
+        return llvms[-1]
+    print(f'Error: The configuration "{workspace.config_name}" does not contain an LLVM build', file=sys.stderr)
+    sys.exit(1)
+
+
+def _outputs(source_dir: Path, output_dir: Path) -> Dict[Path, Path]:
+    """Returns the sources below `source_dir` by the bitcode files they are compiled to"""
+    outputs: Dict[Path, Path] = {}
+    for source in bitcode.sources(source_dir):
+        output = bitcode.output_path(source_dir, output_dir, source)
+        if output in outputs:
+            print(f'Error: Both "{outputs[output]}" and "{source}" would be compiled to "{output}"', file=sys.stderr)
+            sys.exit(1)
+        outputs[output] = source
+    return outputs
+
+
+def _compile(compiler: bitcode.Compiler, outputs: Dict[Path, Path], source_dir: Path) -> Dict[str, int]:
+    """Compiles the sources, and returns how many sources ended with which status"""
+    statuses: Dict[str, int] = collections.Counter()
+
+    def report(_: Path, outcome: bitcode.Outcome) -> None:
+        statuses[outcome.status] += 1
+        if outcome.status != bitcode.CACHED or outcome.output:
+            print(f'{outcome.status}: {outcome.source.relative_to(source_dir)}', flush=True)
+            print(outcome.output, end="", flush=True)
+
+    util.run_parallel(lambda output: compiler.compile(outputs[output], output), outputs, settings.jobs.value, report)
+    return statuses
+
+
+def main():
+    (args, flags) = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+    llvm = _select_llvm(workspace, args.llvm)
+    clang = llvm.paths["bin_dir"] / "clang"
+    if not clang.is_file():
+        print(f'Error: There is no clang at "{clang}", has {llvm.name} been built?', file=sys.stderr)
+        sys.exit(1)
+
+    source_dir = Path(args.source_dir).resolve()
+    outputs = _outputs(source_dir, Path(args.output_dir).resolve())
+
+    env = activation.env_delta(config, workspace).apply(os.environ.copy())
+    identity = f'{llvm.digest_str}:{memoization.file_digest(clang)}'
+    compiler = bitcode.Compiler(llvm.paths["bin_dir"], identity, flags, env, workspace.build_dir / "bitcode")
+    statuses = _compile(compiler, outputs, source_dir)
+
+    print(f'{statuses[bitcode.COMPILED]} compiled, {statuses[bitcode.CACHED]} taken from the cache, '
+          f'{statuses[bitcode.FAILED]} failed')
+    if statuses[bitcode.FAILED]:
+        sys.exit(1)
@@ -0,0 +1,37 @@
+import argparse
+import sys
+
+import workspace.daemon as daemon
+from workspace.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the daemon of this workspace in the foreground. While it runs, the build command (and "
+        "`run --build`) let the daemon do the building, so that concurrent requests for the same build of a recipe "
+        "only build it once.")
+
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action="store_true", help="Print the status of the running daemon and exit")
+    group.add_argument('--stop', action="store_true", help="Stop the running daemon (after its current builds)")
+    settings.bind_args(parser)
+    args = parser.parse_args()
+
+    if args.status:
+        status = daemon.status()
+        if status is None:
+            print("No daemon is running.")
+            sys.exit(1)
+        print(f'Daemon running with pid {status["pid"]}')
+        print(f'Loaded configurations: {", ".join(status["configs"]) or "none"}')
+        for (build_dir, requester) in sorted(status["builds"].items()):
+            print(f'Building {build_dir} for {requester}')
+    elif args.stop:
+        if not daemon.stop():
+            print("No daemon is running.")
+            sys.exit(1)
+    else:
+        try:
+            daemon.serve()
+        except KeyboardInterrupt:
+            pass
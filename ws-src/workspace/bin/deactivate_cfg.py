@@ -0,0 +1,21 @@
+import argparse
+import os
+import sys
+
+import workspace.activation as activation
+from workspace.settings import settings
+from workspace.shells import create_shell
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Print shell commands that undo `activate-cfg`, e.g., `eval "$(deactivate-cfg)"`.')
+
+    settings.shell.add_kwargument(parser, help_message="The shell to print commands for")
+    settings.bind_args(parser)
+
+    script = activation.deactivation_script(create_shell(settings.shell.value), os.environ)
+    if script is None:
+        print("Error: No configuration is activated", file=sys.stderr)
+        sys.exit(1)
+    print(script, end="")
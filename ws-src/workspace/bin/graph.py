@@ -0,0 +1,37 @@
+import argparse
+import sys
+
+from workspace import Workspace
+from workspace.settings import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the dependencies between the builds of a configuration as a Graphviz DOT graph. "
+        "With --only or --rebuild-dependents, the builds that the build command would build are highlighted.")
+
+    settings.config.add_argument(parser)
+    settings.only.add_kwargument(parser)
+    settings.rebuild_dependents.add_kwargument(parser)
+    parser.add_argument('-o', '--output', metavar="FILE", help="Write the graph to FILE instead of stdout")
+    settings.bind_args(parser)
+    args = parser.parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    highlight = []
+    if settings.only.value is not None or settings.rebuild_dependents.value:
+        highlight = [
+            build.name for build in workspace.graph.plan(settings.only.value, settings.rebuild_dependents.value)
+        ]
+    dot = workspace.graph.to_dot(highlight)
+
+    if args.output is None:
+        sys.stdout.write(dot)
+    else:
+        with open(args.output, "wt") as file:
+            file.write(dot)
@@ -0,0 +1,106 @@
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Pattern, Tuple
+
+from workspace import Workspace
+from workspace.build_logs import load_index, log_dir, read_lines
+from workspace.settings import settings
+
+if TYPE_CHECKING:
+    from workspace.recipes.recipe import Recipe
+
+_Log = Tuple["Recipe", Path, Dict[str, Any]]  # (build, log directory, index entry)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Inspect the build logs of a configuration. By default, lists the latest log of every build. "
+        "Warnings, errors and step boundaries are answered from the log index without decompressing any log.")
+
+    settings.config.add_argument(parser)
+    parser.add_argument('-b',
+                        '--build',
+                        action="append",
+                        dest="builds",
+                        default=[],
+                        metavar="BUILD_NAME",
+                        help="Restrict output to the given build (may be given multiple times)")
+    parser.add_argument('-a', '--all', action="store_true", help="Consider all retained logs, not just the latest")
+    kind = parser.add_mutually_exclusive_group()
+    kind.add_argument('--errors', action="store_const", dest="kind", const="error", help="Print indexed errors")
+    kind.add_argument('--warnings', action="store_const", dest="kind", const="warning", help="Print indexed warnings")
+    kind.add_argument('--steps', action="store_const", dest="kind", const="step", help="Print the commands that ran")
+    kind.add_argument('--first-error', action="store_true", help="Print the first error of the most recent failed log")
+    kind.add_argument('-g', '--grep', metavar="PATTERN", help="Search the selected logs for a regular expression")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def _select_logs(workspace: Workspace, builds: List[str], all_logs: bool) -> List[_Log]:
+    selected: List[_Log] = []
+    for build in workspace.builds:
+        if builds and build.name not in builds:
+            continue
+        directory = log_dir(workspace, build)
+        entries = load_index(directory)["logs"]
+        if not all_logs:
+            entries = entries[-1:]
+        selected += [(build, directory, entry) for entry in entries]
+    return selected
+
+
+def _print_first_error(selected: List[_Log]) -> None:
+    failed = [item for item in selected if item[2]["status"] != "ok"]
+    for (build, directory, entry) in sorted(failed, key=lambda item: item[2]["started"], reverse=True):
+        errors = [event for event in entry["events"] if event[1] == "error"]
+        if errors:
+            print(f'{build.output_prefix}{directory / entry["file"]}:{errors[0][0]}: {errors[0][2]}')
+            return
+    print("No failed build with recorded errors found.", file=sys.stderr)
+    sys.exit(1)
+
+
+def _print_matches(selected: List[_Log], pattern: Pattern[bytes]) -> None:
+    for (build, directory, entry) in selected:
+        for (number, line) in enumerate(read_lines(directory / entry["file"]), start=1):
+            if pattern.search(line):
+                print(f'{build.output_prefix}{entry["file"]}:{number}: {line.decode(errors="replace")}')
+
+
+def _print_summary(build: "Recipe", directory: Path, entry: Dict[str, Any]) -> None:
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["started"]))
+    duration = entry["finished"] - entry["started"]
+    counts = entry["counts"]
+    print(f'{build.output_prefix}{started} {entry["phase"]} {entry["status"]} ({duration:.0f}s, '
+          f'{counts.get("error", 0)} errors, {counts.get("warning", 0)} warnings): {directory / entry["file"]}')
+
+
+def main():
+    args = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+    selected = _select_logs(workspace, args.builds, args.all)
+
+    if args.first_error:
+        _print_first_error(selected)
+        return
+    if args.grep is not None:
+        _print_matches(selected, re.compile(args.grep.encode()))
+        return
+
+    for (build, directory, entry) in selected:
+        if args.kind is None:
+            _print_summary(build, directory, entry)
+            continue
+        for (number, kind, text) in entry["events"]:
+            if kind == args.kind:
+                print(f'{build.output_prefix}{entry["file"]}:{number}: {text}')
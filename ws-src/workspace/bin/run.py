@@ -1,15 +1,26 @@
 import argparse
 import os
 import shutil
+import signal
+import subprocess
 import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, List, Mapping, Optional, Tuple
 
-from pyfiglet import Figlet
-
-from workspace import Workspace
+import workspace.activation as activation
+import workspace.daemon as daemon
+import workspace.memoization as memoization
+import workspace.metrics as metrics
+import workspace.tracing as tracing
 from workspace.settings import settings
 
+if TYPE_CHECKING:
+    from workspace import Workspace
 
-def main():
+
+def _parse_args() -> Tuple[argparse.Namespace, List[str]]:
+    """Returns the arguments, and the command to run"""
     parser = argparse.ArgumentParser(
         description='Runs a command inside the workspace set up with a chosen configuration. In case the command'
         ' conflicts with an argument or configuration, use two dashes to separate the command to be run (e.g.,'
@@ -21,6 +32,14 @@ def main():
                         '--build',
                         action="store_true",
                         help=f'Build the configuration before running the command')
+    parser.add_argument('--memoize',
+                        action="store_true",
+                        help="Restore the output directory and exit code of an earlier run of the same binary with the "
+                        "same input and arguments from the result cache in .build/results instead of running KLEE, or "
+                        "add the outcome of this run to it (the command has to set an --output-dir)")
+    settings.metrics_dir.add_kwargument(parser)
+    settings.trace.add_kwargument(parser,
+                                  help_message="With --build, write a timeline of all recipe phases to the given file")
 
     argc = 1
     command = []
@@ -42,25 +61,112 @@ def main():
         settings.jobs.value = args.jobs
     else:
         args.jobs = settings.jobs.value
+    if args.metrics_dir is not None:
+        settings.metrics_dir.value = Path(args.metrics_dir)
+    if args.trace is not None:
+        settings.trace.value = Path(args.trace)
+    return (args, command)
 
-    workspace = Workspace(args.config)
 
-    if args.build:
-        figlet = Figlet(font="doom", width=80)
-        figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
-        print(figlet.renderText(f'Building {args.config}'))
-        workspace.build()
-        print(figlet.renderText(f'Running command'))
+def _build(config: str) -> Optional["Workspace"]:
+    """Builds the configuration, and returns the workspace if it was built by this process"""
+    # pylint: disable=import-outside-toplevel
+    from pyfiglet import Figlet
 
-    env = workspace.get_env()
-    workspace.add_to_env(env)
-    env["WS_CONFIG"] = args.config
-    env["WS_CONFIGS"] = args.config
-    env["WS_HOME"] = str(settings.ws_path)
-    env["WS_JOBS"] = str(settings.jobs.value)
+    from workspace import Workspace
+
+    workspace = None
+    figlet = Figlet(font="doom", width=80)
+    figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
+    print(figlet.renderText(f'Building {config}'), flush=True)
+    # the daemon may have stopped since, in which case the configuration is built here
+    returncode = daemon.build(config) if daemon.usable() else None
+    if returncode is not None and returncode != 0:
+        sys.exit(returncode)
+    if returncode is None:
+        workspace = Workspace(config)
+        with tracing.tracing(settings.trace.value), tracing.span(f'build {config}', config=config):
+            workspace.build()
+    print(figlet.renderText(f'Running command'))
+    return workspace
 
+
+def _restore(memoized: Tuple[memoization.ResultCache, str, Path]) -> None:
+    """Exits with the exit code of an identical earlier run, after restoring its output directory, if there is one"""
+    (cache, key, output_dir) = memoized
+    result = cache.lookup(key)
+    if result is None:
+        return
+    if output_dir.exists():
+        print(f'The output directory {output_dir} already exists.', file=sys.stderr)
+        sys.exit(1)
+    cache.restore(key, output_dir)
+    print(f'Restored the output of an identical earlier run to {output_dir}.', file=sys.stderr)
+    sys.exit(result["returncode"])
+
+
+def _measure(command: List[str], env: Mapping[str, str]) -> Tuple[int, float, Any]:
+    """Runs `command` as a child process, and returns its exit code (negative if killed), duration and resource usage"""
+    started = time.monotonic()
     try:
-        os.execvpe(command[0], command, env)
+        process = subprocess.Popen(command, env=env)
     except FileNotFoundError:
         print(f'The command {command[0]} could not be found.', file=sys.stderr)
         sys.exit(2)
+    # like a shell, leave the handling of interrupts to the child
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGQUIT, signal.SIG_IGN)
+    (_, status, usage) = os.wait4(process.pid, 0)
+    duration = time.monotonic() - started
+    return (-os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status), duration, usage)
+
+
+def main():
+    (args, command) = _parse_args()
+
+    workspace = _build(args.config) if args.build else None
+
+    # without --build, the workspace is only set up if the cached environment is outdated
+    env = activation.env_delta(args.config, workspace).apply(os.environ.copy())
+    env["WS_JOBS"] = str(settings.jobs.value)
+
+    if settings.metrics_dir.value is None and not args.memoize:
+        try:
+            os.execvpe(command[0], command, env)
+        except FileNotFoundError:
+            print(f'The command {command[0]} could not be found.', file=sys.stderr)
+            sys.exit(2)
+
+    memoized = None
+    if args.memoize:
+        memoized = _memoized(args.config, workspace, env, command)
+        _restore(memoized)
+
+    # to measure or memoize the command, it has to be run as a child process instead of replacing this process
+    (returncode, duration, usage) = _measure(command, env)
+    if memoized is not None and returncode >= 0:  # runs that were interrupted are not memoized
+        (cache, key, output_dir) = memoized
+        cache.store(key, {"returncode": returncode, "wall_seconds": duration}, output_dir)
+    if settings.metrics_dir.value is not None:
+        metrics.write_run_metrics(args.config, os.path.basename(command[0]), duration, returncode, usage)
+    sys.exit(returncode if returncode >= 0 else 128 - returncode)
+
+
+def _memoized(config: str, workspace: Optional["Workspace"], env: Mapping[str, str],
+              command: List[str]) -> Tuple[memoization.ResultCache, str, Path]:
+    """Returns the result cache, the key of `command` and its output directory"""
+    if workspace is None:
+        from workspace import Workspace  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        workspace = Workspace(config)
+        workspace.initialize_builds()
+    executable = shutil.which(command[0], path=env.get("PATH"))
+    if executable is None:
+        print(f'The command {command[0]} could not be found.', file=sys.stderr)
+        sys.exit(2)
+    (arguments, output_dir) = memoization.normalize(command[1:])
+    if output_dir is None:
+        print("To memoize its results, the command has to set an --output-dir.", file=sys.stderr)
+        sys.exit(2)
+    key = memoization.run_key(memoization.binary_digest(workspace, Path(executable)), arguments)
+    return (memoization.ResultCache(workspace.build_dir / "results"), key, output_dir)
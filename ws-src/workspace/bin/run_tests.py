@@ -0,0 +1,130 @@
+import argparse
+import os
+import re
+import sys
+from typing import TYPE_CHECKING, Dict, List, Mapping, Tuple
+
+import workspace.activation as activation
+import workspace.testing as testing
+import workspace.util as util
+from workspace import Workspace
+from workspace.settings import settings
+
+if TYPE_CHECKING:
+    from workspace.recipes.recipe import Recipe
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the lit system and unit tests of the builds of a configuration in parallel. Tests that failed "
+        "last time run first, followed by the slowest ones. Tests that passed last time are skipped if neither the "
+        "build nor the test changed since.")
+
+    settings.config.add_argument(parser)
+    settings.jobs.add_kwargument(parser, help_message="The number of tests to run in parallel")
+    settings.only.add_kwargument(parser, help_message="Run only the tests of the given builds")
+    parser.add_argument('-b', '--build', action="store_true", help="Build the tested builds first")
+    parser.add_argument('-a', '--all', action="store_true", help="Also run the tests that passed with the same inputs")
+    parser.add_argument('--filter', metavar="REGEX", help="Run only the tests whose names match a regular expression")
+    parser.add_argument('--num-shards',
+                        type=int,
+                        default=1,
+                        metavar="N",
+                        help="Split the tests into N shards (e.g., to distribute them across machines)")
+    parser.add_argument('--run-shard',
+                        type=int,
+                        default=1,
+                        metavar="M",
+                        help="Run only the tests of shard M (from 1 to N)")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def _discover(workspace: Workspace, builds: List["Recipe"], env: Mapping[str, str],
+              jobs: int) -> Tuple[List[testing.Test], Dict[str, str]]:
+    """Returns the tests of the given builds, and the stamps of their suites by suite name"""
+    tests: List[testing.Test] = []
+    stamps: Dict[str, str] = {}
+    for suite in testing.discover(workspace, builds):
+        if suite.kind == "unit":
+            suite.build_unit_tests(workspace.get_env(), jobs)
+        stamps[suite.name] = suite.stamp()
+        tests += suite.tests(env)
+    return (tests, stamps)
+
+
+def _select(tests: List[testing.Test], stamps: Dict[str, str], histories: Dict[str, testing.History],
+            args: argparse.Namespace) -> Tuple[List[testing.Test], Dict[str, str], int]:
+    """Returns the tests to run, the digests of their inputs by test id, and the number of unchanged tests skipped"""
+    if args.filter is not None:
+        pattern = re.compile(args.filter)
+        tests = [test for test in tests if pattern.search(test.id)]
+    tests = testing.shard(tests, args.num_shards, args.run_shard)
+
+    inputs = {test.id: test.inputs_digest(stamps[test.suite.name]) for test in tests}
+    if args.all:
+        return (tests, inputs, 0)
+    pending = [test for test in tests if not histories[test.suite.build.name].unchanged(test, inputs[test.id])]
+    return (pending, inputs, len(tests) - len(pending))
+
+
+def _run(batches: List[testing.Batch], env: Mapping[str, str], histories: Dict[str, testing.History],
+         inputs: Dict[str, str], jobs: int) -> List[Tuple[testing.Test, testing.Result]]:
+    """Runs the batches, records the result of every test and returns the tests that failed"""
+    total = sum(len(batch.tests) for batch in batches)
+    results: List[Tuple[testing.Test, testing.Result]] = []
+
+    def record(_: testing.Batch, batch_results: List[Tuple[testing.Test, testing.Result]]) -> None:
+        for (test, result) in batch_results:
+            results.append((test, result))
+            histories[test.suite.build.name].record(test, inputs[test.id], result)
+            print(f'{result.status}: {test.id} ({result.seconds:.2f}s) ({len(results)} of {total})', flush=True)
+
+    try:
+        util.run_parallel(lambda batch: batch.run(env), batches, jobs, record)
+    finally:
+        for history in histories.values():
+            history.save()
+    return [(test, result) for (test, result) in results if not result.passed]
+
+
+def main():
+    args = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+    if not 1 <= args.run_shard <= args.num_shards:
+        print(f'Error: The shard must be between 1 and {args.num_shards}', file=sys.stderr)
+        sys.exit(1)
+
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+    builds = workspace.builds
+    if settings.only.value is not None:
+        builds = [workspace.graph[name] for name in settings.only.value]
+    if args.build:
+        workspace.build([build.name for build in workspace.graph.plan(settings.only.value)])
+
+    jobs = settings.jobs.value
+    env = activation.env_delta(config, workspace).apply(os.environ.copy())
+    (tests, stamps) = _discover(workspace, builds, env, jobs)
+    if not tests:
+        print("There are no tests, have the builds been built?", file=sys.stderr)
+        sys.exit(1)
+
+    histories = {build.name: testing.History(workspace, build) for build in builds}
+    (tests, inputs, skipped) = _select(tests, stamps, histories, args)
+    batches = testing.batch(testing.order(tests, histories), jobs)
+
+    print(f'Running {len(tests)} tests in {len(batches)} lit runs with {jobs} jobs '
+          f'({skipped} unchanged tests that passed before are skipped)',
+          flush=True)
+    failures = _run(batches, env, histories, inputs, jobs)
+
+    for (test, result) in failures:
+        print(f'\n{"*" * 20} {result.status}: {test.id}\n{result.output}', end="")
+    print(f'\n{len(tests) - len(failures)} passed, {len(failures)} failed, {skipped} skipped')
+    if failures:
+        sys.exit(1)
@@ -3,6 +3,7 @@ import shutil
 
 from pyfiglet import Figlet
 
+import workspace.tracing as tracing
 from workspace import Workspace
 from workspace.settings import settings
 
@@ -11,9 +12,11 @@ def main():
     parser = argparse.ArgumentParser(description="Setup (usually download sources) one or more configurations.")
 
     settings.configs.add_argument(parser)
+    settings.color.add_kwargument(parser)
     settings.default_linker.add_kwargument(parser)
     settings.jobs.add_kwargument(parser)
     settings.reference_repositories.add_kwargument(parser)
+    settings.trace.add_kwargument(parser)
     settings.until.add_kwargument(parser)
     settings.x_git_clone.add_kwargument(parser)
 
@@ -28,8 +31,10 @@ def main():
         print()
 
     figlet = Figlet(font="doom", width=80)
-    for config in settings.configs.value:
-        figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
-        print(figlet.renderText(f'Setting up {config}'))
-        workspace = Workspace(config)
-        workspace.setup()
+    with tracing.tracing(settings.trace.value):
+        for config in settings.configs.value:
+            figlet.width = shutil.get_terminal_size(fallback=(9999, 24))[0]
+            print(figlet.renderText(f'Setting up {config}'))
+            with tracing.span(f'setup {config}', config=config):
+                workspace = Workspace(config)
+                workspace.setup()
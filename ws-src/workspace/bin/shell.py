@@ -1,11 +1,10 @@
 import argparse
+import os
 import sys
 
-import shellingham
-
-from workspace import Workspace
+import workspace.activation as activation
 from workspace.settings import settings
-from workspace.shells import Bash, Fish, Zsh
+from workspace.shells import create_shell
 
 
 def main():
@@ -23,29 +22,9 @@ def main():
         parser.print_help(sys.stderr)
         sys.exit(1)
 
-    workspace = Workspace(settings.config.value)
-    env = workspace.get_env()
-    workspace.add_to_env(env)
-    env["WS_CONFIG"] = config
-    env["WS_CONFIGS"] = config
-    env["WS_HOME"] = settings.ws_path
-
-    shell = settings.shell.value
-    if shell == "auto":
-        try:
-            shell = shellingham.detect_shell()[0]
-        except shellingham.ShellDetectionFailure:
-            print("Error: Could not auto-detect shell. Please choose the shell explicitly.")
-            sys.exit(1)
-
-    if shell == "bash":
-        shell_obj = Bash()
-    elif shell == "fish":
-        shell_obj = Fish()
-    elif shell == "zsh":
-        shell_obj = Zsh()
-    else:
-        raise Exception(f'Unknown shell: "{shell}"')
+    env = activation.env_delta(config).apply(os.environ.copy())
+
+    shell_obj = create_shell(settings.shell.value)
 
     prompt_prefix = f"({settings.ws_path.name}: {settings.config.value}) "
     shell_obj.set_prompt_prefix(prompt_prefix)
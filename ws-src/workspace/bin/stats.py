@@ -0,0 +1,99 @@
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import workspace.output_stats as output_stats
+import workspace.util as util
+from workspace import Workspace
+from workspace.settings import settings
+
+
+def _campaign(argument: str) -> Tuple[str, Path]:
+    """Splits `LABEL=DIR` into its label and directory, with `DIR` labeling itself"""
+    (label, separator, directory) = argument.partition("=")
+    if not separator or not label or "/" in label:
+        return (argument, Path(argument))
+    return (label, Path(directory))
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Summarize the output directories of KLEE (or PORSE) runs: the wall and user time, instructions, "
+        "explored paths, solver queries, solver time and peak memory of all runs below each of the given directories "
+        "are aggregated and shown as a table or as CSV. The info and run.stats files of the output directories are "
+        "read in parallel, and the summary of every output directory is kept in .build/stats-index.json, so that "
+        "only new or changed output directories are read again.")
+
+    settings.jobs.add_kwargument(parser, help_message="The number of output directories to read in parallel")
+    parser.add_argument('campaigns',
+                        nargs="+",
+                        metavar="[LABEL=]DIR",
+                        help="A directory that contains output directories (or is one), whose runs are aggregated "
+                        "under LABEL (default: the directory), e.g., release=runs/release")
+    parser.add_argument('--per-dir', action="store_true", help="Show every output directory instead of aggregating")
+    parser.add_argument('--csv', action="store_true", help="Write CSV (with unformatted values) instead of a table")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def _summaries(output_dirs: List[Path]) -> Dict[Path, Dict[str, Any]]:
+    """Returns the summaries of the output directories, which are only read if they changed since the last time"""
+    index = output_stats.Index(Workspace.build_dir / "stats-index.json")
+    summaries: Dict[Path, Dict[str, Any]] = {}
+    read: List[Path] = []
+
+    def add(output_dir: Path, summary: Tuple[Dict[str, Any], bool]) -> None:
+        (summaries[output_dir], was_read) = summary
+        if was_read:
+            read.append(output_dir)
+
+    util.run_parallel(index.summary, output_dirs, settings.jobs.value, add)
+    index.save()
+    print(f'Read {len(read)} of {len(output_dirs)} output directories '
+          '(the others are unchanged since they were last read)',
+          file=sys.stderr)
+    return summaries
+
+
+def main():
+    args = _parse_args()
+
+    campaigns: Dict[str, List[Path]] = {}
+    for argument in args.campaigns:
+        (label, directory) = _campaign(argument)
+        if not directory.is_dir():
+            print(f'Error: "{directory}" is not a directory', file=sys.stderr)
+            sys.exit(1)
+        campaigns.setdefault(label, []).extend(output_stats.find_output_dirs(directory))
+    summaries = _summaries(sorted({output_dir for output_dirs in campaigns.values() for output_dir in output_dirs}))
+
+    if args.per_dir:
+        rows = [(str(output_dir), output_stats.aggregate([summaries[output_dir]]))
+                for output_dirs in campaigns.values() for output_dir in output_dirs]
+        first_header = "output directory"
+    else:
+        rows = [(label, output_stats.aggregate([summaries[output_dir] for output_dir in output_dirs]))
+                for (label, output_dirs) in campaigns.items()]
+        first_header = "campaign"
+
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow([first_header] + [key for (key, _, _) in output_stats.COLUMNS])
+        for (name, aggregated) in rows:
+            writer.writerow([name] + [aggregated[key] for (key, _, _) in output_stats.COLUMNS])
+        return
+
+    from tabulate import tabulate  # pylint: disable=import-outside-toplevel
+
+    table = [[name] + [_cell(aggregated[key], spec) for (key, _, spec) in output_stats.COLUMNS]
+             for (name, aggregated) in rows]
+    print(
+        tabulate(table,
+                 headers=[first_header] + [header for (_, header, _) in output_stats.COLUMNS],
+                 disable_numparse=True))
+
+
+def _cell(value: Any, spec: str) -> str:
+    return "-" if value is None else f'{value:{spec}}'
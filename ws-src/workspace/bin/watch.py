@@ -0,0 +1,117 @@
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import workspace.activation as activation
+import workspace.daemon as daemon
+import workspace.fingerprints as fingerprints
+from workspace import Workspace
+from workspace.fingerprints import Fingerprint
+from workspace.settings import settings
+from workspace.watcher import create_watcher, owners
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Watch the source directories of the builds of a configuration, and rebuild the builds whose "
+        "sources changed together with all builds that use them. Builds that were built before and do not depend on "
+        "a changed build are not touched.")
+
+    settings.config.add_argument(parser)
+    settings.color.add_kwargument(parser)
+    settings.jobs.add_kwargument(parser)
+    settings.only.add_kwargument(parser, help_message="Watch only the sources of the given builds")
+    parser.add_argument('--debounce',
+                        type=float,
+                        default=0.3,
+                        metavar="SECONDS",
+                        help="Wait until no file changed for this long before rebuilding (default: 0.3)")
+    parser.add_argument('--poll',
+                        type=float,
+                        metavar="SECONDS",
+                        help="Poll for changes in the given interval instead of using inotify")
+    parser.add_argument('--then',
+                        metavar="COMMAND",
+                        help="Run a shell command in the environment of the configuration after every successful "
+                        "rebuild (e.g., a test)")
+    settings.bind_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+
+    config = settings.config.value
+    if config is None:
+        print(f'Error: Setting "{settings.config.name}" is not set', file=sys.stderr)
+        sys.exit(1)
+
+    inputs = fingerprints.current(config)
+    workspace = Workspace(config)
+    workspace.initialize_builds()
+    watched = workspace.builds
+    if settings.only.value is not None:
+        watched = [workspace.graph[name] for name in settings.only.value]
+    roots = {build.name: build.paths["src_dir"] for build in watched if build.paths["src_dir"].is_dir()}
+    if not roots:
+        print("None of the watched builds has been set up yet, run the build command first", file=sys.stderr)
+        sys.exit(1)
+
+    # a build directory may be placed inside a source directory, but building must not trigger another build
+    excluded = {workspace.build_dir}
+    excluded.update(build.paths["build_dir"] for build in workspace.builds)
+
+    def ignored(path: Path) -> bool:
+        return path.name == ".git" or path in excluded
+
+    try:
+        with create_watcher(list(roots.values()), ignored, args.poll) as watcher:
+            print(f'Watching the sources of {", ".join(roots)} (press Ctrl+C to stop)', flush=True)
+            while True:
+                changed = owners(watcher.changes(args.debounce), roots)
+                if changed:
+                    (workspace, inputs) = _current_workspace(workspace, inputs)
+                    _rebuild(workspace, changed, args.then)
+    except KeyboardInterrupt:
+        pass
+
+
+def _current_workspace(workspace: Workspace, inputs: List[Fingerprint]) -> Tuple[Workspace, List[Fingerprint]]:
+    """Returns the workspace to build and its inputs, which are loaded again if the configuration or settings changed"""
+    current_inputs = fingerprints.check(workspace.config_name, fingerprints.source_stamp(), inputs)
+    if current_inputs is None:
+        # the watched directories are kept, though
+        current_inputs = fingerprints.current(workspace.config_name)
+        workspace = Workspace(workspace.config_name)
+    return (workspace, current_inputs)
+
+
+def _rebuild(workspace: Workspace, changed: List[str], then: Optional[str]) -> None:
+    """Rebuilds the builds whose sources changed and the builds that use them, and runs `then` if that succeeded"""
+    only = [build.name for build in workspace.graph.plan(rebuild_dependents=changed)]
+    print(f'\nThe sources of {", ".join(changed)} changed, building {", ".join(only)}', flush=True)
+    if not _build(workspace, only):
+        print("The build failed, waiting for further changes", flush=True)
+        return
+
+    if then is not None:
+        env = activation.env_delta(workspace.config_name, workspace).apply(os.environ.copy())
+        result = subprocess.run(then, shell=True, env=env, check=False)
+        print(f'`{then}` exited with code {result.returncode}', flush=True)
+    print("Waiting for changes", flush=True)
+
+
+def _build(workspace: Workspace, only: List[str]) -> bool:
+    # the daemon may have stopped since, in which case the configuration is built here
+    returncode = daemon.build(workspace.config_name, only) if daemon.usable() else None
+    if returncode is not None:
+        return returncode == 0
+    try:
+        workspace.build(only)
+    except Exception as error:  # pylint: disable=broad-except
+        print(f'{type(error).__name__}: {error}', file=sys.stderr)
+        return False
+    return True
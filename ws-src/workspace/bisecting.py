@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import math
+import shutil
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import workspace.benchmarking as benchmarking
+import workspace.build_logs as build_logs
+import workspace.tracing as tracing
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.porse import PORSE
+
+# A performance bisection runs `git bisect` over the sources of a PORSE build, either in place or (by default) in a
+# separate worktree below `.build/bisect`, so that the main checkout stays untouched. Every tested commit is built into
+# a build directory of its own below `.build/bisect` (which is reused between commits, so that only the changed
+# translation units are rebuilt), against the build directories of the builds PORSE depends on (e.g., LLVM, Z3 and
+# STP), which are neither changed nor rebuilt. The workload is a benchmark corpus, whose runs are summed up per
+# repetition. A commit is bad if its metric differs from the one of the good commit by more than the threshold, in the
+# same direction as the one of the bad commit.
+
+GOOD = "good"
+BAD = "bad"
+SKIP = "skip"
+
+_FIRST_BAD = " is the first bad commit"
+
+
+class Measured:  # pylint: disable=too-few-public-methods
+    def __init__(self, commit: str, subject: str, values: Optional[List[float]], reason: Optional[str] = None) -> None:
+        self.commit = commit
+        self.subject = subject
+        self.values = values  # the metric of the whole corpus per repetition, or `None` if it could not be measured
+        self.reason = reason  # why the commit could not be measured
+        self.verdict: Optional[str] = None
+        self.delta: Tuple[float, float, float] = (math.nan, math.nan, math.nan)
+
+
+class Directories:  # pylint: disable=too-few-public-methods
+    """Where the commits of a bisected build are checked out and built"""
+    def __init__(self, workspace: Workspace, build: PORSE, in_place: bool) -> None:
+        self.in_place = in_place
+        self.origin: Path = build.paths["src_dir"]  # where revisions are resolved, even when bisecting a worktree
+        name = build.paths["build_dir"].name
+        bisect_dir = workspace.build_dir / "bisect"
+        if in_place:
+            self.src: Path = build.paths["src_dir"]
+            self.build: Path = bisect_dir / f'{name}-in-place'
+        else:
+            self.src = bisect_dir / f'{name}-src'
+            self.build = bisect_dir / name
+
+
+class Workload:  # pylint: disable=too-few-public-methods
+    """The runs of a corpus that measure a commit, whose `metric` is summed up per repetition"""
+    def __init__(self, corpus: benchmarking.Corpus, repetitions: int, metric: str) -> None:
+        self.corpus = corpus
+        self.repetitions = repetitions
+        self.metric = metric
+
+
+class Bisection:
+    def __init__(  # pylint: disable=too-many-arguments
+            self, workspace: Workspace, build: PORSE, workload: Workload, threshold: float, in_place: bool) -> None:
+        self.workspace = workspace
+        self.build = build
+        self.workload = workload
+        self.threshold = threshold
+        self.directories = Directories(workspace, build, in_place)
+        self.measured: Dict[str, Measured] = {}
+        self._calibration: Optional[Tuple[Measured, int]] = None  # the good commit, and the sign of a bad difference
+
+    def _git(self, *args: str) -> str:
+        result = subprocess.run(["git", *args], cwd=self.directories.src, check=True, capture_output=True)
+        return result.stdout.decode()
+
+    def _bisect(self, *args: str) -> str:
+        """Runs a step of `git bisect`, which exits with 2 once only skipped commits are left to test"""
+        result = subprocess.run(["git", "bisect", *args], cwd=self.directories.src, check=False, capture_output=True)
+        if result.returncode not in (0, 2):
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        return result.stdout.decode()
+
+    def prepare(self) -> None:
+        """Creates the worktree (or makes sure that the source directory can be checked out), and redirects the build"""
+        directories = self.directories
+        if directories.in_place:
+            if self._git("status", "--porcelain", "--untracked-files=no").strip():
+                raise Exception(f'The sources of {self.build.name} at "{directories.src}" have uncommitted changes')
+        elif not directories.src.is_dir():
+            directories.src.parent.mkdir(parents=True, exist_ok=True)
+            subprocess.run(["git", "worktree", "add", "--detach", directories.src], cwd=directories.origin, check=True)
+
+        # the paths are only changed after the builds were initialized, so they are not recorded in the path index
+        self.build.paths["src_dir"] = directories.src
+        self.build.paths["include_dir"] = directories.src / "include"
+        self.build.paths["build_dir"] = directories.build
+
+    def rev_parse(self, rev: str) -> str:
+        result = subprocess.run(["git", "rev-parse", "--verify", "--quiet", f'{rev}^{{commit}}'],
+                                cwd=self.directories.origin,
+                                check=False,
+                                capture_output=True)
+        if result.returncode != 0:
+            raise Exception(f'"{rev}" is not a commit in "{self.directories.origin}"')
+        return result.stdout.decode().strip()
+
+    def measure(self) -> Measured:
+        """Builds and measures the checked-out commit"""
+        commit = self._git("rev-parse", "HEAD").strip()
+        if commit in self.measured:
+            return self.measured[commit]
+        subject = self._git("log", "-1", "--format=%s", commit).strip()
+        print(f'\nTesting {commit[:12]} {subject}', flush=True)
+
+        measured = None
+        try:
+            self._build_commit()
+        except Exception as error:  # pylint: disable=broad-except
+            measured = Measured(commit, subject, None, f'the build failed ({error})')
+        if measured is None:
+            measured = self._run_corpus(commit, subject)
+        self.measured[commit] = measured
+        return measured
+
+    def _build_commit(self) -> None:
+        with tracing.recipe_span(self.build, "bisect build"):
+            with build_logs.recording(self.workspace, self.build, "bisect"):
+                try:
+                    self.build.build(self.workspace)
+                except BaseException:
+                    if not (self.directories.build / "build.ninja").exists():
+                        shutil.rmtree(self.directories.build, ignore_errors=True)  # configure again for the next commit
+                    raise
+
+    def _run_corpus(self, commit: str, subject: str) -> Measured:
+        from workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+        # the environment of the configuration, with the bisected PORSE build in place of the regular one
+        env = Workspace.get_env()
+        for build in self.workspace.builds:
+            build.add_to_env(env, self.workspace)
+
+        workload = self.workload
+        values = []
+        for repetition in range(1, workload.repetitions + 1):
+            total = 0.0
+            for program in workload.corpus.programs:
+                sample = workload.corpus.run(program, env)
+                if sample["timed_out"] or sample["returncode"] != 0:
+                    status = "timed out" if sample["timed_out"] else f'failed with exit code {sample["returncode"]}'
+                    return Measured(commit, subject, None, f'{program.name} {status}')
+                if sample[workload.metric] is None:
+                    return Measured(commit, subject, None, f'{program.name} did not report its {workload.metric}')
+                total += sample[workload.metric]
+            print(f'[{repetition}/{workload.repetitions}] {total:.6g}', flush=True)
+            values.append(total)
+        return Measured(commit, subject, values)
+
+    def calibrate(self, good: Measured, bad: Measured) -> None:
+        """Checks that the bad commit is worse than the good one by more than the threshold"""
+        if good.values is None or bad.values is None:
+            unmeasured = good if good.values is None else bad
+            raise Exception(f'Cannot measure {unmeasured.commit[:12]}: {unmeasured.reason}')
+        good.delta = benchmarking.relative_difference(good.values, good.values)
+        good.verdict = GOOD
+        bad.delta = benchmarking.relative_difference(good.values, bad.values)
+        bad.verdict = BAD
+        if math.isnan(bad.delta[0]) or abs(bad.delta[0]) <= self.threshold:
+            raise Exception(f'The bad commit differs from the good one by {bad.delta[0]:+.1%}, which is within the '
+                            f'threshold of {self.threshold:.1%}')
+        self._calibration = (good, 1 if bad.delta[0] > 0 else -1)
+
+    def classify(self, measured: Measured) -> str:
+        assert self._calibration is not None
+        (good, direction) = self._calibration
+        assert good.values is not None
+        if measured.values is None:
+            measured.verdict = SKIP
+        else:
+            measured.delta = benchmarking.relative_difference(good.values, measured.values)
+            measured.verdict = BAD if direction * measured.delta[0] > self.threshold else GOOD
+        return measured.verdict
+
+    def run(self, good: str, bad: str) -> Optional[str]:
+        """Runs the bisection, and returns the first bad commit (or `None` if skipped commits left it ambiguous)"""
+        good = self.rev_parse(good)
+        bad = self.rev_parse(bad)
+
+        self._bisect("start")
+        try:
+            self._git("checkout", "--detach", good)
+            good_measured = self.measure()
+            self._git("checkout", "--detach", bad)
+            bad_measured = self.measure()
+            self.calibrate(good_measured, bad_measured)
+
+            self._bisect("bad", bad)
+            output = self._bisect("good", good)
+            while True:
+                for line in output.splitlines():
+                    if line.endswith(_FIRST_BAD):
+                        return line[:-len(_FIRST_BAD)]
+                if "only 'skip'ped commits left" in output:
+                    print(output, end="")
+                    return None
+                measured = self.measure()
+                verdict = self.classify(measured)
+                print(f'{measured.commit[:12]} is {verdict} ({describe(measured)})', flush=True)
+                output = self._bisect(verdict)
+        finally:
+            self._bisect("reset")
+
+
+def describe(measured: Measured) -> str:
+    if measured.values is None:
+        return str(measured.reason)
+    (delta, low, high) = measured.delta
+    if math.isnan(low):
+        return f'{delta:+.1%}'
+    return f'{delta:+.1%} [{low:+.1%}, {high:+.1%}]'
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Mapping, Sequence, Union
+
+import workspace.memoization as memoization
+
+# Compiles C and C++ sources to LLVM bitcode with the clang of an LLVM build, and caches the bitcode in the style of
+# ccache's direct mode: A source file is looked up by the identity of the compiler, the flags, the include paths from
+# the environment and the path and contents of the source. The entry found that way records the headers that the
+# compiler included (as reported by -MD) along with their content digests, and is only used while they are unchanged.
+# Thus, only the sources affected by an LLVM change, a flag tweak or a changed header are compiled again.
+
+C_SUFFIXES = [".c"]
+CXX_SUFFIXES = [".cc", ".cpp", ".cxx", ".C"]
+
+DEFAULT_FLAGS = ["-g", "-O0", "-Xclang", "-disable-O0-optnone"]  # as recommended for KLEE
+
+COMPILED = "compiled"
+CACHED = "cached"
+FAILED = "failed"
+
+_INCLUDE_VARIABLES = ["CPATH", "C_INCLUDE_PATH", "CPLUS_INCLUDE_PATH"]
+_DEPENDENCY_SEPARATOR = re.compile(r"(?<!\\)\s+")
+
+
+def sources(source_dir: Path) -> List[Path]:
+    return sorted(path for path in source_dir.rglob("*") if path.suffix in C_SUFFIXES + CXX_SUFFIXES and path.is_file())
+
+
+def _parse_dependencies(text: str) -> List[str]:
+    """The prerequisites of a make rule as written by -MD"""
+    text = text.replace("\\\n", " ")
+    (_, _, prerequisites) = text.partition(": ")
+    return [name.replace("\\ ", " ") for name in _DEPENDENCY_SEPARATOR.split(prerequisites.strip()) if name]
+
+
+class Outcome:  # pylint: disable=too-few-public-methods
+    def __init__(self, source: Path, status: str, output: str = "") -> None:
+        self.source = source
+        self.status = status
+        self.output = output  # what the compiler printed
+
+
+class Compiler:  # pylint: disable=too-few-public-methods
+    """Compiles sources (from any number of threads at once)"""
+    def __init__(  # pylint: disable=too-many-arguments
+            self, bin_dir: Path, identity: str, flags: Sequence[str], env: Mapping[str, str], cache_dir: Path) -> None:
+        """`identity` identifies the compiler in `bin_dir`, e.g., by the digest of its build and the digest of clang"""
+        self.bin_dir = bin_dir
+        self.identity = identity
+        self.flags = list(flags)
+        self.env = env
+        self.cache_dir = cache_dir
+        self.cwd = Path.cwd()  # where clang runs, so relative paths in the flags are relative to the invoking directory
+
+    def _clang(self, source: Path) -> Path:
+        return self.bin_dir / ("clang++" if source.suffix in CXX_SUFFIXES else "clang")
+
+    def _entry(self, source: Path) -> Path:
+        data = json.dumps(
+            {
+                "compiler": self.identity,
+                "clang": self._clang(source).name,
+                "flags": self.flags,
+                "cwd": str(self.cwd),
+                "include-paths": {variable: self.env.get(variable)
+                                  for variable in _INCLUDE_VARIABLES},
+                "source": str(source),
+                "contents": memoization.file_digest(source),
+            },
+            sort_keys=True)
+        key = hashlib.blake2s(data.encode()).hexdigest()
+        return self.cache_dir / key[:2] / key
+
+    @staticmethod
+    def _valid(entry: Path) -> bool:
+        try:
+            with open(entry / "dependencies.json", "rt") as file:
+                dependencies: Dict[str, str] = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return False
+        for (name, digest) in dependencies.items():
+            try:
+                if memoization.file_digest(Path(name)) != digest:
+                    return False
+            except FileNotFoundError:
+                return False
+        return (entry / "output.bc").is_file()
+
+    def compile(self, source: Path, output: Path) -> Outcome:
+        source = source.resolve()
+        entry = self._entry(source)
+        status = CACHED
+        compiler_output = ""
+        if not self._valid(entry):
+            status = COMPILED
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # the entry is assembled next to its final location, so that it appears all at once
+            temporary = Path(tempfile.mkdtemp(prefix=f'{entry.name}.', suffix=".tmp", dir=entry.parent))
+            try:
+                command: List[Union[str, Path]] = [self._clang(source), "-c", "-emit-llvm", *self.flags]
+                command += ["-MD", "-MF", temporary / "output.d", "-o", temporary / "output.bc", source]
+                result = subprocess.run(command,
+                                        cwd=self.cwd,
+                                        env=self.env,
+                                        stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        check=False)
+                compiler_output = result.stdout.decode(errors="replace")
+                if result.returncode != 0:
+                    return Outcome(source, FAILED, compiler_output)
+                with open(temporary / "output.d", "rt") as file:
+                    names = _parse_dependencies(file.read())
+                dependencies = {
+                    str((self.cwd / name).resolve()): memoization.file_digest(self.cwd / name)
+                    for name in names
+                }
+                with open(temporary / "dependencies.json", "wt") as file:
+                    json.dump(dependencies, file, indent=2)
+                (temporary / "output.d").unlink()
+                if entry.exists():
+                    shutil.rmtree(entry)  # outdated
+                try:
+                    os.rename(temporary, entry)
+                except OSError:
+                    pass  # stored by another process in the meantime
+            finally:
+                if temporary.exists():
+                    shutil.rmtree(temporary)
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temporary_output = output.with_name(f'{output.name}.{os.getpid()}.tmp')
+        try:
+            shutil.copyfile(entry / "output.bc", temporary_output)
+        except FileNotFoundError:
+            # another process replaced the entry in the meantime, which is only done when it was outdated
+            return Outcome(source, FAILED, f'{compiler_output}The cache entry {entry} was replaced concurrently\n')
+        os.replace(temporary_output, output)
+        return Outcome(source, status, compiler_output)
+
+
+def output_path(source_dir: Path, output_dir: Path, source: Path) -> Path:
+    return output_dir / source.relative_to(source_dir).with_suffix(".bc")
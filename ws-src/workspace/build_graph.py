@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Collection, Dict, Iterable, List, Optional, Set
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.recipe import Recipe
+
+# The builds of a configuration form a directed acyclic graph, as every build may only use builds that precede it in
+# the configuration. Sets of builds are therefore always returned in configuration order, which is a valid build order.
+
+
+def built_stamp_path(workspace: Workspace, recipe: Recipe) -> Path:
+    """Exists iff the build directory of `recipe` was last built successfully"""
+    return workspace.build_dir / "built" / recipe.paths["build_dir"].name
+
+
+class BuildGraph:
+    """The dependencies between the builds of a workspace, as reported by their `find_dependencies`"""
+    def __init__(self, workspace: Workspace) -> None:
+        self._workspace = workspace
+        self._builds: Dict[str, Recipe] = {build.name: build for build in workspace.builds}
+        self._dependencies: Dict[str, List[str]] = {}
+        self._dependents: Dict[str, List[str]] = {name: [] for name in self._builds}
+        for build in workspace.builds:
+            self._dependencies[build.name] = [dependency.name for dependency in build.find_dependencies(workspace)]
+            for dependency in self._dependencies[build.name]:
+                self._dependents[dependency].append(build.name)
+
+    def __getitem__(self, name: str) -> Recipe:
+        if name not in self._builds:
+            raise Exception(
+                f'The configuration "{self._workspace.config_name}" does not contain a build named "{name}"')
+        return self._builds[name]
+
+    def _ordered(self, names: Collection[str]) -> List[Recipe]:
+        return [build for build in self._workspace.builds if build.name in names]
+
+    def dependencies(self, build: Recipe) -> List[Recipe]:
+        """The builds that `build` uses directly"""
+        return [self._builds[name] for name in self._dependencies[build.name]]
+
+    def dependents(self, build: Recipe) -> List[Recipe]:
+        """The builds that use `build` directly"""
+        return [self._builds[name] for name in self._dependents[build.name]]
+
+    def _closure(self, names: Iterable[str], edges: Dict[str, List[str]]) -> Set[str]:
+        reached: Set[str] = set()
+        pending = [self[name].name for name in names]
+        while pending:
+            name = pending.pop()
+            if name not in reached:
+                reached.add(name)
+                pending += edges[name]
+        return reached
+
+    def upstream(self, names: Iterable[str]) -> List[Recipe]:
+        """The named builds together with all builds that they use, directly or indirectly"""
+        return self._ordered(self._closure(names, self._dependencies))
+
+    def downstream(self, names: Iterable[str]) -> List[Recipe]:
+        """The named builds together with all builds that use them, directly or indirectly"""
+        return self._ordered(self._closure(names, self._dependents))
+
+    def plan(self, only: Optional[Collection[str]] = None, rebuild_dependents: Collection[str] = ()) -> List[Recipe]:
+        """
+        Returns the builds that need to be built to build the builds named in `only` and the ones named in
+        `rebuild_dependents` together with everything downstream of them (or all builds if neither is given). Other
+        builds that these use are only included if they were not built successfully before, so that they are never
+        touched otherwise.
+        """
+        if only is None and not rebuild_dependents:
+            return list(self._workspace.builds)
+        requested = {build.name for build in self.downstream(rebuild_dependents)}
+        requested.update(self[name].name for name in only or ())
+
+        self._workspace.initialize_builds()
+        planned = set(requested)
+        for build in self.upstream(requested):
+            if build.name not in requested and not built_stamp_path(self._workspace, build).is_file():
+                planned.add(build.name)
+        return self._ordered(planned)
+
+    def to_dot(self, highlight: Collection[str] = ()) -> str:
+        """Renders the graph in the DOT language of Graphviz, with an edge from each build to every build using it"""
+        def quote(text: str) -> str:
+            return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+        lines = [f'digraph {quote(self._workspace.config_name)} {{', "    rankdir=LR;", "    node [shape=box];"]
+        for build in self._workspace.builds:
+            label = f'{build.name}\n{type(build).__name__} ({build.profile_name})'
+            attributes = [f'label={quote(label)}']
+            if build.name in highlight:
+                attributes.append("style=filled")
+            lines.append(f'    {quote(build.name)} [{", ".join(attributes)}];')
+        for build in self._workspace.builds:
+            for dependency in self._dependencies[build.name]:
+                lines.append(f'    {quote(dependency)} -> {quote(build.name)};')
+        lines.append("}")
+        return "\n".join(lines) + "\n"
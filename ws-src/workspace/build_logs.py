@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import contextlib
+import gzip
+import json
+import os
+import re
+import shlex
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+
+import workspace.locking as locking
+from workspace.util import EscapeSequenceStripper, PrefixTranslator
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.recipe import Recipe
+
+KEEP_LOGS = 10  # number of logs kept per build directory digest
+MAX_EVENTS = 1000  # maximum number of indexed events per kind and log
+
+_ERROR = re.compile(rb"\berror:|^FAILED: |^CMake Error|^make(?:\[\d+\])?: \*\*\*", re.IGNORECASE | re.MULTILINE)
+_WARNING = re.compile(rb"\bwarning:|^CMake Warning", re.IGNORECASE | re.MULTILINE)
+_MAX_EVENT_TEXT = 500
+
+_STATE = threading.local()  # the active log is tracked per thread
+
+
+def log_dir(workspace: Workspace, recipe: Recipe) -> Path:
+    return workspace.build_dir / "logs" / recipe.digest_str
+
+
+def load_index(directory: Path) -> Dict[str, Any]:
+    try:
+        with open(directory / "index.json", "rt") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"logs": []}
+
+
+def _store_index(directory: Path, index: Dict[str, Any]) -> None:
+    temporary_path = directory / "index.json.tmp"
+    with open(temporary_path, "wt") as file:
+        json.dump(index, file)
+    os.replace(temporary_path, directory / "index.json")
+
+
+class _EventIndex:
+    """The line count and the indexed events (step boundaries, warnings and errors) of a log"""
+    def __init__(self):
+        self.lines = 0
+        self.events: List[List[Any]] = []
+        self.counts: Dict[str, int] = {}
+        self._partial = b""
+
+    def add(self, line: int, kind: str, text: str) -> None:
+        count = self.counts.get(kind, 0)
+        if count < MAX_EVENTS:
+            self.events.append([line, kind, text[:_MAX_EVENT_TEXT]])
+        self.counts[kind] = count + 1
+
+    def _scan(self, data: bytes) -> None:
+        """Scans complete lines for warnings and errors. `data` must end with a newline (or be the final line)."""
+        if _ERROR.search(data) or _WARNING.search(data):
+            for (i, line) in enumerate(data.split(b"\n")):
+                if _ERROR.search(line):
+                    self.add(self.lines + i + 1, "error", line.decode(errors="replace"))
+                elif _WARNING.search(line):
+                    self.add(self.lines + i + 1, "warning", line.decode(errors="replace"))
+        self.lines += data.count(b"\n")
+
+    def feed(self, data: bytes) -> None:
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._partial += data
+        else:
+            self._scan(self._partial + data[:end + 1])
+            self._partial = data[end + 1:]
+
+    def finish_line(self) -> bool:
+        """Scans the partial last line (if any) as if it were complete, and returns whether there was one"""
+        if not self._partial:
+            return False
+        self._scan(self._partial + b"\n")
+        self._partial = b""
+        return True
+
+
+class _TerminalFilter:
+    """Reduces raw terminal output to plain text lines"""
+    def __init__(self):
+        self._translator = PrefixTranslator(b"")
+        self._stripper = EscapeSequenceStripper()
+
+    def filter(self, data: bytes) -> bytes:
+        return self._stripper.strip(self._translator.translate(data))
+
+    def flush(self) -> bytes:
+        """Returns any output held back, and starts over with a fresh terminal"""
+        tail = self._stripper.strip(self._translator.translate(b""), final=True)
+        self._translator = PrefixTranslator(b"")
+        self._stripper = EscapeSequenceStripper()
+        return tail
+
+
+class BuildLog:
+    """
+    A gzip-compressed log of all output produced by the child processes of one recipe phase, together with an index
+    entry that records step boundaries (the commands being run), warnings and errors by line number.
+    """
+    def __init__(self, directory: Path, recipe: Recipe, phase: str):
+        self.recipe = recipe
+        self.phase = phase
+        self.started = time.time()
+
+        self._filter = _TerminalFilter()
+        self._index = _EventIndex()
+
+        directory.mkdir(parents=True, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        attempt = 0
+        while True:
+            suffix = f'.{attempt}' if attempt else ""
+            self.path = directory / f'{timestamp}-{os.getpid()}-{phase}{suffix}.log.gz'
+            try:
+                self._file = gzip.open(self.path, "xb", compresslevel=3)
+                break
+            except FileExistsError:
+                attempt += 1
+
+    def step(self, command: Sequence[str]) -> None:
+        self.flush_partial_line()
+        self._index.add(self._index.lines + 1, "step", " ".join(shlex.quote(arg) for arg in command))
+
+    def write(self, data: bytes) -> None:
+        """Appends raw terminal output of a child process."""
+        data = self._filter.filter(data)
+        self._file.write(data)
+        self._index.feed(data)
+
+    def flush_partial_line(self) -> None:
+        tail = self._filter.flush()
+        if tail:
+            self._file.write(tail)
+            self._index.feed(tail)
+        if self._index.finish_line():
+            self._file.write(b"\n")
+
+    def command_failed(self, command: Sequence[str], status: int) -> None:
+        self.flush_partial_line()
+        self._index.add(self._index.lines, "error", f'Command {command[0]} failed with non-zero exit status {status}')
+
+    def close(self, status: str) -> None:
+        self.flush_partial_line()
+        self._file.close()
+
+        directory = self.path.parent
+        # other processes may finish a log of the same build directory at the same time
+        with locking.locked(directory / "index.json", "the build log index"):
+            index = load_index(directory)
+            index["recipe"] = self.recipe.name
+            index["profile"] = self.recipe.profile_name
+            index["logs"].append({
+                "file": self.path.name,
+                "phase": self.phase,
+                "started": self.started,
+                "finished": time.time(),
+                "status": status,
+                "lines": self._index.lines,
+                "counts": self._index.counts,
+                "events": self._index.events,
+            })
+
+            # rotate
+            for entry in index["logs"][:-KEEP_LOGS]:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(directory / entry["file"])
+            index["logs"] = index["logs"][-KEEP_LOGS:]
+
+            _store_index(directory, index)
+
+
+def active() -> Optional[BuildLog]:
+    """Returns the log that child process output should currently be written to (if any)."""
+    return getattr(_STATE, "log", None)
+
+
+@contextlib.contextmanager
+def recording(workspace: Workspace, recipe: Recipe, phase: str) -> Iterator[BuildLog]:
+    """Records the output of all child processes run via `run_with_prefix` during the `with` block."""
+    log = BuildLog(log_dir(workspace, recipe), recipe, phase)
+    previous, _STATE.log = active(), log
+    status = "failed"
+    try:
+        yield log
+        status = "ok"
+    finally:
+        _STATE.log = previous
+        log.close(status)
+
+
+def read_lines(path: Path) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as file:
+        for line in file:
+            yield line.rstrip(b"\n")
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import workspace.build_logs as build_logs
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.irecipe import IRecipe
+    from workspace.recipes.recipe import Recipe
+
+_LINK_SUFFIXES = {".a", ".so", ".dylib"}
+
+
+class NinjaEdge:
+    """A single edge of the last ninja run of a build directory, as recorded in its `.ninja_log`."""
+    def __init__(self, start: int, end: int, outputs: List[str]) -> None:
+        self.start = start  # ms since the start of the ninja run
+        self.end = end  # ms since the start of the ninja run
+        self.outputs = outputs
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    @property
+    def kind(self) -> str:
+        """One of "compile", "link" or "other", judging by the (first) output."""
+        output = Path(self.outputs[0])
+        if output.suffix in [".o", ".obj"]:
+            return "compile"
+        if output.suffix in _LINK_SUFFIXES or ".so." in output.name or output.parent.name == "bin":
+            return "link"
+        return "other"
+
+
+def _cache_path(workspace: Workspace, build_dir: Path) -> Path:
+    return workspace.build_dir / "reports" / f'{build_dir.name}.ninja_log.json'
+
+
+def _empty_cache() -> Dict[str, Any]:
+    return {"inode": None, "offset": 0, "entries": {}, "run": []}
+
+
+def _load_cache(cache_path: Path) -> Dict[str, Any]:
+    try:
+        with open(cache_path, "rt") as file:
+            cache = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return _empty_cache()
+    if not isinstance(cache, dict) or set(cache) != set(_empty_cache()):
+        return _empty_cache()  # written by an older version
+    return cache
+
+
+def _store_cache(cache_path: Path, cache: Dict[str, Any]) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = cache_path.with_name(f'{cache_path.name}.tmp')
+    with open(temporary_path, "wt") as file:
+        json.dump(cache, file)
+    os.replace(temporary_path, cache_path)
+
+
+def _parse_log(data: bytes) -> Iterator[Tuple[str, List[Any]]]:
+    """The output and entry ([start, end, mtime, command hash]) of every line of (complete lines of) a `.ninja_log`"""
+    for line in data.decode(errors="replace").splitlines():
+        if line.startswith("#"):
+            continue  # version header
+        fields = line.split("\t")
+        if len(fields) != 5:
+            continue
+        yield (fields[3], [int(fields[0]), int(fields[1]), int(fields[2]), fields[4]])
+
+
+def read_ninja_log(log_path: Path) -> Dict[str, List[Any]]:
+    """
+    The latest entry ([start, end, mtime, command hash]) of every output in the `.ninja_log` at `log_path`. This is all
+    that is left of earlier runs once ninja recompacts the log, so it can be compared across a recompaction.
+    """
+    with open(log_path, "rb") as file:
+        return dict(_parse_log(file.read()))
+
+
+def changed_entries(before: Dict[str, List[Any]], after: Dict[str, List[Any]]) -> List[List[Any]]:
+    """The entries of `after` (as [start, end, command hash, output]) that are not in `before`, ordered by end time"""
+    changed = [[entry[0], entry[1], entry[3], output]
+               for (output, entry) in after.items()
+               if before.get(output) != entry]
+    return sorted(changed, key=lambda entry: entry[1])
+
+
+def _append(cache: Dict[str, Any], data: bytes) -> None:
+    """
+    Adds the entries appended to the log since it was last parsed. A new run is detected when the end times start over
+    or when an output that was already built in the current run shows up again.
+    """
+    run: List[List[Any]] = cache["run"]
+    outputs = {output for (_, _, _, output) in run}
+    last_end = run[-1][1] if run else 0
+    for (output, entry) in _parse_log(data):
+        if entry[1] < last_end or output in outputs:
+            run, outputs = [], set()
+        run.append([entry[0], entry[1], entry[3], output])
+        outputs.add(output)
+        last_end = entry[1]
+        cache["entries"][output] = entry
+    cache["run"] = run
+
+
+def _update_cache(cache: Dict[str, Any], log_path: Path, stat: os.stat_result) -> Dict[str, Any]:
+    """Returns `cache` brought up to date with the log at `log_path`, whose current state is `stat`"""
+    previous = None
+    if cache["inode"] != stat.st_ino or cache["offset"] > stat.st_size:
+        # ninja recompacts the log by rewriting it with the latest entry of every output, in no particular order
+        previous = cache if cache["inode"] is not None else None
+        cache = _empty_cache()
+    cache["inode"] = stat.st_ino
+
+    with open(log_path, "rb") as file:
+        file.seek(cache["offset"])
+        data = file.read()
+    data = data[:data.rfind(b"\n") + 1]  # ninja might still be writing the last line
+    cache["offset"] += len(data)
+
+    if previous is None:
+        _append(cache, data)
+    else:
+        # the order of a rewritten log says nothing about runs, but the entries that changed since the log was last
+        # parsed must have been built since
+        cache["entries"] = dict(_parse_log(data))
+        cache["run"] = changed_entries(previous["entries"], cache["entries"]) or previous["run"]
+    return cache
+
+
+def load_last_run(workspace: Workspace, build_dir: Path) -> Optional[List[NinjaEdge]]:
+    """
+    Returns the edges of the last ninja run in `build_dir`, or `None` if there is no `.ninja_log`.
+
+    The log is append-only until ninja recompacts it, so the position up to which it was parsed is cached together with
+    the latest entry of every output and the edges of the last run. Later calls only parse what was appended since. A
+    recompacted log is parsed again, and the entries that differ from the cached ones are taken as the last run. (A
+    log that is already recompacted when it is first parsed can only be split into runs by the order of its lines.)
+    """
+    log_path = build_dir / ".ninja_log"
+    try:
+        stat = os.stat(log_path)
+    except FileNotFoundError:
+        return None
+
+    cache_path = _cache_path(workspace, build_dir)
+    cache = _load_cache(cache_path)
+    if (cache["inode"], cache["offset"]) != (stat.st_ino, stat.st_size):
+        cache = _update_cache(cache, log_path, stat)
+        _store_cache(cache_path, cache)
+
+    # edges with multiple outputs are logged once per output
+    edges: Dict[Tuple[int, int, str], NinjaEdge] = {}
+    for (start, end_time, command_hash, output) in cache["run"]:
+        key = (start, end_time, command_hash)
+        if key in edges:
+            edges[key].outputs.append(output)
+        else:
+            edges[key] = NinjaEdge(start, end_time, [output])
+    return list(edges.values())
+
+
+def wall_time(edges: Sequence[NinjaEdge]) -> int:
+    if not edges:
+        return 0
+    return max(edge.end for edge in edges) - min(edge.start for edge in edges)
+
+
+def idle_fraction(edges: Sequence[NinjaEdge], jobs: int) -> float:
+    """The fraction of `jobs` cores × wall time during which no edge was running on a core."""
+    wall = wall_time(edges)
+    if wall == 0:
+        return 0.0
+    busy = sum(edge.duration for edge in edges)
+    return max(0.0, 1.0 - busy / (jobs * wall))
+
+
+def recipe_duration(workspace: Workspace, recipe: Recipe, edges: Optional[Sequence[NinjaEdge]]) -> Optional[float]:
+    """
+    The wall time (in seconds) of the last recorded build of `recipe`, including configuring and anything not run by
+    ninja. Falls back to the ninja wall time if no build log was recorded.
+    """
+    for entry in reversed(build_logs.load_index(build_logs.log_dir(workspace, recipe))["logs"]):
+        if entry["phase"] == "build":
+            return float(entry["finished"] - entry["started"])
+    if edges:
+        return wall_time(edges) / 1000
+    return None
+
+
+def critical_path(workspace: Workspace, durations: Dict[str, float]) -> Tuple[float, List[IRecipe]]:
+    """
+    Returns the longest chain of builds through the dependency graph of `workspace`, weighted by `durations` (keyed by
+    build name), together with its length. Dependencies always precede their dependents in a configuration.
+    """
+    empty: Tuple[float, List[IRecipe]] = (0.0, [])
+    longest: Dict[str, Tuple[float, List[IRecipe]]] = {}
+    for build in workspace.builds:
+        (length, path) = max((longest[dependency.name] for dependency in workspace.graph.dependencies(build)),
+                             key=lambda item: item[0],
+                             default=empty)
+        longest[build.name] = (length + durations.get(build.name, 0.0), path + [build])
+    return max(longest.values(), key=lambda item: item[0], default=empty)
@@ -6,6 +6,7 @@ import shlex
 from pathlib import Path
 from typing import TYPE_CHECKING, Dict, Mapping, Optional, Sequence, Set, Union
 
+import workspace.tracing as tracing
 from workspace.util import run_with_prefix
 
 from .linker import Linker
@@ -137,7 +138,8 @@ class CMakeConfig(BuildSystemConfig):
 
         config_call += cmake_flags.generate()
 
-        run_with_prefix(config_call, self.output_prefix, env=env, check=True)
+        with tracing.span("cmake configure", "cmake"):
+            run_with_prefix(config_call, self.output_prefix, env=env, check=True)
 
     def build(  # pylint: disable=too-many-arguments
             self,
@@ -158,7 +160,8 @@ class CMakeConfig(BuildSystemConfig):
                 build_call += ['--target', target]
             assert has_target, "The target list must be non-empty if it is provided (i.e., not None)"
 
-        run_with_prefix(build_call, self.output_prefix, env=env if env is not None else os.environ, check=True)
+        with tracing.span("cmake build", "cmake", targets=" ".join(targets) if targets else "all"):
+            run_with_prefix(build_call, self.output_prefix, env=env if env is not None else os.environ, check=True)
 
     def set_flag(self, name: str, value: Union[bool, int, str, Path]) -> None:
         if isinstance(value, Path):
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List
+
+from workspace.vcs.git import get_file_ids
+
+# files that the build only ever reads may share their inode with the source tree
+_HARDLINK_SUFFIXES = {".c", ".h", ".S", ".s"}
+
+
+def _hash_file_ids(path: Path) -> Dict[str, str]:
+    """
+    Fallback for `get_file_ids` when `path` is not a git work tree: identifies every file by a hash of its content.
+    """
+    file_ids: Dict[str, str] = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [directory for directory in dirs if directory != ".git"]
+        for name in files:
+            file_path = Path(root) / name
+            relative = str(file_path.relative_to(path))
+            stat = os.lstat(file_path)
+            if os.path.islink(file_path):
+                file_ids[relative] = f'{stat.st_mode:o}:{os.readlink(file_path)}'
+                continue
+            digest = hashlib.blake2s()
+            with open(file_path, "rb") as file:
+                block = file.read(1 << 20)
+                while block:
+                    digest.update(block)
+                    block = file.read(1 << 20)
+            file_ids[relative] = f'{stat.st_mode:o}:{digest.hexdigest()}'
+    return file_ids
+
+
+def tree_file_ids(path: Path) -> Dict[str, str]:
+    """
+    Returns a mapping from every file below `path` to an identifier of its content. Uses the git index if possible and
+    content hashes otherwise.
+    """
+    file_ids = get_file_ids(path)
+    if file_ids is None:
+        file_ids = _hash_file_ids(path)
+    return file_ids
+
+
+def tree_digest(path: Path) -> str:
+    """Returns a single digest that changes whenever any file below `path` changes."""
+    digest = hashlib.blake2s()
+    for name, file_id in sorted(tree_file_ids(path).items()):
+        digest.update(f'{name}\0{file_id}\0'.encode())
+    return digest.hexdigest()
+
+
+def _place_file(source: Path, target: Path) -> None:
+    if os.path.lexists(target):
+        if target.is_dir() and not target.is_symlink():
+            shutil.rmtree(target)
+        else:
+            os.unlink(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if source.is_symlink():
+        os.symlink(os.readlink(source), target)
+        return
+
+    if source.suffix in _HARDLINK_SUFFIXES:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass  # e.g., different file systems - fall back to copying
+    shutil.copy2(source, target)
+
+
+def stage_tree(source_dir: Path, target_dir: Path, manifest_path: Path) -> bool:
+    """
+    Makes `target_dir` mirror `source_dir` (similar to `rsync -a`), but only touches the files whose content changed
+    since the last call, as recorded in `manifest_path`. Returns `True` iff anything in `target_dir` was changed.
+    """
+    current = {
+        name: file_id
+        for name, file_id in tree_file_ids(source_dir).items() if not file_id.startswith("160000:")  # submodules
+    }
+
+    previous: Dict[str, str] = {}
+    if target_dir.is_dir() and manifest_path.is_file():
+        with open(manifest_path, "rt") as file:
+            previous = json.load(file)
+
+    removed: List[str] = [name for name in previous if name not in current]
+    changed: List[str] = [name for name, file_id in current.items() if previous.get(name) != file_id]
+
+    for name in removed:
+        target = target_dir / name
+        if os.path.lexists(target) and not target.is_dir():
+            os.unlink(target)
+
+    for name in changed:
+        _place_file(source_dir / name, target_dir / name)
+
+    if removed or changed or not manifest_path.is_file():
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = manifest_path.with_name(f'{manifest_path.name}.tmp')
+        with open(temporary_path, "wt") as file:
+            json.dump(current, file)
+        os.replace(temporary_path, manifest_path)
+
+    return bool(removed or changed)
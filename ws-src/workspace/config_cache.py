@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import workspace.fingerprints as fingerprints
+
+if TYPE_CHECKING:
+    from workspace.recipes.recipe import Recipe
+
+# (name of the recipe class, arguments including all defaults) of every recipe in a configuration
+CachedRecipes = List[Tuple[str, Dict[str, Any]]]
+
+
+def cache_path(config_name: str) -> Path:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return settings.ws_path / ".build" / "configs" / f'{config_name}.json'
+
+
+def _key(config: bytes) -> Dict[str, str]:
+    return {"sha256": hashlib.sha256(config).hexdigest(), "source": fingerprints.source_stamp()}
+
+
+def load(config_name: str, config: bytes) -> Optional[CachedRecipes]:
+    """Returns the validated recipes of the configuration with the contents `config`, if they were cached before"""
+    try:
+        with open(cache_path(config_name), "rt") as file:
+            cached = json.load(file)
+        if cached["key"] != _key(config):
+            return None
+        return [(str(recipe), dict(arguments)) for (recipe, arguments) in cached["recipes"]]  # JSON has no tuples
+    except (FileNotFoundError, KeyError, TypeError, ValueError):
+        return None  # missing or damaged
+
+
+def store(config_name: str, config: bytes, recipes: Sequence[Recipe]) -> None:
+    """Caches the recipes of a configuration, which must all have been validated"""
+    assert all(recipe.validated for recipe in recipes)
+    entries = [[type(recipe).__name__, dict(recipe.arguments)] for recipe in recipes]
+    try:
+        text = json.dumps({"key": _key(config), "recipes": entries})
+    except (TypeError, ValueError):
+        return  # e.g., dates in the configuration
+    if json.loads(text)["recipes"] != entries:
+        return  # some argument would not survive a round trip (e.g., a tuple would become a list)
+
+    path = cache_path(config_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')  # other processes may write it concurrently
+    with open(temporary_path, "wt") as file:
+        file.write(text)
+    os.replace(temporary_path, path)
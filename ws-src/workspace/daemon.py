@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import codecs
+import contextlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Mapping, NoReturn, Optional, Tuple
+
+import workspace.fingerprints as fingerprints
+import workspace.locking as locking
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+
+# An optional per-workspace daemon, which keeps configurations initialized and deduplicates concurrent builds.
+#
+# The daemon listens on `.build/ws-daemon.sock`. Every connection carries one request (a single line of JSON) and any
+# number of responses (one line of JSON each), the last of which contains either a `returncode` or an `error`.
+#
+# The daemon keeps every configuration that it was asked to build initialized (i.e., its builds with their digests and
+# paths, and its build graph) until the configuration changes. Every build of a recipe runs in a worker process that is
+# forked from the daemon, so it starts with the initialized configuration and only switches to the environment of the
+# client that requested the build. If the environment of the client contains settings that may change how the
+# configuration is initialized, the worker is started from scratch and initializes the configuration again instead.
+# Concurrent requests that need the same build (as identified by its build directory, which contains the digest) wait
+# for the worker that was started first instead of starting another one.
+
+_READ_SIZE = 65536
+
+# environment variables that do not change how a configuration is initialized, but only how it is built (which the
+# client sets, see `build`) or which configuration is active
+_BUILD_VARIABLES = {"WS_COLOR", "WS_JOBS", "WS_REFERENCE_REPOSITORIES", "WS_CONFIG", "WS_CONFIGS", "WS_HOME"}
+
+Send = Callable[[Dict[str, Any]], None]
+
+
+def _settings_variables(env: Mapping[str, str]) -> Dict[str, str]:
+    return {name: value for (name, value) in env.items() if name.startswith("WS_") and name not in _BUILD_VARIABLES}
+
+
+def socket_path() -> Path:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return settings.ws_path / ".build" / "ws-daemon.sock"
+
+
+class _Job:
+    """A build of one recipe that is in progress"""
+    def __init__(self, requester: str) -> None:
+        self.requester = requester
+        self.returncode = 1
+        self._done = threading.Event()
+
+    def finish(self, returncode: int) -> None:
+        self.returncode = returncode
+        self._done.set()
+
+    def wait(self) -> int:
+        self._done.wait()
+        return self.returncode
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(str(path), _Handler)
+        self.source_stamp = fingerprints.source_stamp()
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, _Job] = {}  # build directory -> build in progress
+        self.settings_variables = _settings_variables(os.environ)  # the configurations are initialized with these
+        self._workspaces: Dict[str, Tuple[Workspace, List[fingerprints.Fingerprint]]] = {}
+
+    def workspace(self, config_name: str) -> Workspace:
+        """Returns the initialized workspace of a configuration, which is kept until the configuration changes"""
+        with self.lock:
+            if config_name in self._workspaces:
+                (workspace, inputs) = self._workspaces[config_name]
+                if fingerprints.check(config_name, self.source_stamp, inputs) is not None:
+                    return workspace
+
+            from workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+            inputs = fingerprints.current(config_name)
+            workspace = Workspace(config_name)
+            workspace.initialize_builds()
+            self._workspaces[config_name] = (workspace, inputs)
+            return workspace
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "configs": sorted(self._workspaces),
+                "builds": {key: job.requester
+                           for (key, job) in self.jobs.items()},
+            }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        connected = True
+
+        def send(message: Dict[str, Any]) -> None:
+            nonlocal connected
+            if not connected:
+                return  # the client went away, but the request is still processed for the other clients
+            try:
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+            except OSError:
+                connected = False
+
+        try:
+            request = json.loads(self.rfile.readline())
+            command = request["command"]
+        except (KeyError, TypeError, ValueError):
+            send({"error": "malformed request"})
+            return
+
+        if fingerprints.source_stamp() != self.server.source_stamp:
+            send({"error": "the daemon is outdated, as the workspace sources changed since it was started"})
+            return
+
+        try:
+            if command == "status":
+                send(dict(self.server.status(), returncode=0))
+            elif command == "stop":
+                send({"returncode": 0})
+                threading.Thread(target=self.server.shutdown).start()
+            elif command == "build":
+                send({"returncode": self._build(request, send)})
+            else:
+                send({"error": f'unknown command {command!r}'})
+        except Exception as error:  # pylint: disable=broad-except
+            send({"error": f'{type(error).__name__}: {error}'})
+
+    def _build(self, request: Dict[str, Any], send: Send) -> int:
+        (config_name, only, env, requester) = (request["config"], request.get("only"), request.get("env", {}),
+                                               request["requester"])
+        workspace = self.server.workspace(config_name)
+        warm = _settings_variables(env) == self.server.settings_variables
+        for recipe in workspace.builds:
+            if only is not None and recipe.name not in only:
+                continue
+            key = str(recipe.paths["build_dir"])
+            with self.server.lock:
+                job = self.server.jobs.get(key)
+                started = job is None
+                if job is None:
+                    job = self.server.jobs[key] = _Job(requester)
+
+            if started:
+                returncode = 1
+                try:
+                    if warm:
+                        returncode = _fork_worker(workspace, recipe.name, env, send)
+                    else:
+                        returncode = _spawn_worker(config_name, recipe.name, env, send)
+                finally:
+                    with self.server.lock:
+                        del self.server.jobs[key]
+                    job.finish(returncode)
+            else:
+                send({"output": f'{recipe.output_prefix}Waiting for the same build requested by {job.requester}\n'})
+                returncode = job.wait()
+                if returncode == 0:
+                    send({"output": f'{recipe.output_prefix}Built by {job.requester}\n'})
+
+            if returncode != 0:
+                send({"output": f'{recipe.output_prefix}Build failed with exit code {returncode}\n'})
+                return returncode
+        return 0
+
+
+def _forward_output(fd: int, send: Send) -> None:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = os.read(fd, _READ_SIZE)
+        text = decoder.decode(data, final=not data)
+        if text:
+            send({"output": text})
+        if not data:
+            break
+
+
+def _spawn_worker(config_name: str, build_name: str, env: Mapping[str, str], send: Send) -> int:
+    """Builds a recipe in a new process, which initializes the configuration in the environment `env` first"""
+    with subprocess.Popen([sys.executable, "-m", "workspace.daemon", "--worker", config_name, build_name],
+                          env=dict(env, PYTHONUNBUFFERED="1"),
+                          stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT) as process:
+        assert process.stdout is not None
+        _forward_output(process.stdout.fileno(), send)
+    return process.returncode
+
+
+def _fork_worker(workspace: Workspace, build_name: str, env: Mapping[str, str], send: Send) -> int:
+    """Builds a recipe of the initialized `workspace` in a process forked from the daemon, in the environment `env`"""
+    (read_fd, write_fd) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _forked_worker(workspace, build_name, env, write_fd)
+    os.close(write_fd)
+    try:
+        _forward_output(read_fd, send)
+    finally:
+        os.close(read_fd)
+        (_, wait_status) = os.waitpid(pid, 0)
+    # as reported by `subprocess`
+    return os.WEXITSTATUS(wait_status) if os.WIFEXITED(wait_status) else -os.WTERMSIG(wait_status)
+
+
+def _forked_worker(workspace: Workspace, build_name: str, env: Mapping[str, str], output_fd: int) -> NoReturn:
+    """The forked worker process, which must never return into the (multi-threaded) daemon"""
+    returncode = 1
+    try:
+        # only the standard streams are kept, so the pipes of other workers (and their locks) are not held open
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+        for (fd, target) in [(null_fd, 0), (output_fd, 1), (output_fd, 2)]:
+            os.dup2(fd, target)
+        for fd in [int(name) for name in os.listdir("/dev/fd") if int(name) > 2]:
+            with contextlib.suppress(OSError):
+                os.close(fd)
+        locking.forget_inherited()
+        # the buffers (and locks) of the inherited streams may be in any state, as other threads may have used them
+        sys.stdout = open(1, "wt", buffering=1, closefd=False)
+        sys.stderr = open(2, "wt", buffering=1, closefd=False)
+
+        os.environ.clear()
+        os.environ.update(env)
+        from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+        settings.reload()
+
+        workspace.build(only=[build_name])
+        returncode = 0
+    except SystemExit as error:
+        returncode = error.code if isinstance(error.code, int) else int(error.code is not None)
+    except BaseException:  # pylint: disable=broad-except
+        traceback.print_exc()
+    finally:
+        with contextlib.suppress(Exception):
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(returncode)  # pylint: disable=protected-access
+
+
+def serve() -> None:
+    """Runs the daemon of this workspace in the foreground until it is stopped"""
+    path = socket_path()
+    connection = _connect()
+    if connection is not None:
+        connection.close()
+        raise Exception(f'A daemon is already listening on {path}')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()  # left behind by a daemon that was killed
+
+    server = _Server(path)
+    try:
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        print(f'Listening on {path}', flush=True)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink()
+
+
+def _connect() -> Optional[socket.socket]:
+    path = socket_path()
+    if not path.exists():
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def _request(message: Mapping[str, Any]) -> Optional[Iterator[Dict[str, Any]]]:
+    connection = _connect()
+    if connection is None:
+        return None
+    try:
+        connection.sendall(json.dumps(message).encode() + b"\n")
+    except OSError:
+        connection.close()
+        return None
+
+    return _responses(connection)
+
+
+def _responses(connection: socket.socket) -> Iterator[Dict[str, Any]]:
+    with connection, connection.makefile("rb") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def _final_response(responses: Iterator[Dict[str, Any]], output: Any = None) -> Optional[Dict[str, Any]]:
+    for response in responses:
+        if "output" in response:
+            if output is not None:
+                output.write(response["output"])
+                output.flush()
+        elif "error" in response:
+            print(f'The daemon could not handle the request: {response["error"]}', file=sys.stderr)
+            return None
+        else:
+            return response
+    print("The daemon closed the connection unexpectedly", file=sys.stderr)
+    return None
+
+
+def status() -> Optional[Dict[str, Any]]:
+    """Returns the status of the daemon of this workspace, or `None` if none is running (or usable)"""
+    responses = _request({"command": "status"})
+    if responses is None:
+        return None
+    return _final_response(responses)
+
+
+def stop() -> bool:
+    responses = _request({"command": "stop"})
+    return responses is not None and _final_response(responses) is not None
+
+
+def usable() -> bool:
+    """Whether builds can be done by the daemon, which neither traces, records metrics nor cuts configurations short"""
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    if settings.trace.value is not None or settings.metrics_dir.value is not None or settings.until.value:
+        return False
+    return status() is not None
+
+
+def build(config_name: str, only: Optional[List[str]] = None) -> Optional[int]:
+    """
+    Builds a configuration (or only the builds named in `only`) with the daemon, in the current environment and with the
+    current settings that matter for building. Returns `None` if no daemon is running, in which case the caller should
+    build the configuration itself.
+    """
+    # pylint: disable=import-outside-toplevel
+    from workspace.settings import settings
+    from workspace.vcs.git import check_create_ref_dir
+
+    check_create_ref_dir()  # may ask the user, which the daemon cannot do
+    env = dict(os.environ,
+               WS_COLOR="always" if settings.color.value else "never",
+               WS_JOBS=str(settings.jobs.value),
+               WS_REFERENCE_REPOSITORIES=str(settings.reference_repositories.value))
+    requester = f'{os.environ.get("USER", "?")} (pid {os.getpid()})'
+    responses = _request({"command": "build", "config": config_name, "only": only, "env": env, "requester": requester})
+    if responses is None:
+        return None
+    response = _final_response(responses, sys.stdout)
+    return 1 if response is None else response["returncode"]
+
+
+def _worker(config_name: str, build_name: str) -> None:
+    from workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+    Workspace(config_name).build(only=[build_name])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "--worker":
+        print(f'Usage: {sys.argv[0]} --worker CONFIG BUILD', file=sys.stderr)
+        sys.exit(2)
+    _worker(sys.argv[2], sys.argv[3])
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+# Everything that is derived from a configuration without building it (the builds, their digests and their paths) only
+# depends on the configuration file, the settings file and the sources of the workspace itself.
+
+Fingerprint = Tuple[str, int, int, str]  # (input, mtime in ns, size, sha256)
+
+
+def cacheable() -> bool:
+    """Whether results derived from a configuration may be cached, which they may not if it is cut short by `until`"""
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return not settings.until.value
+
+
+def inputs(config_name: str) -> List[Path]:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return [settings.ws_path / "ws-config" / f'{config_name}.toml', settings.ws_path / "ws-settings.toml"]
+
+
+def _hash_file(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def fingerprint(path: Path) -> Fingerprint:
+    stat = os.stat(path)
+    return (str(path), stat.st_mtime_ns, stat.st_size, _hash_file(path))
+
+
+def current(config_name: str) -> List[Fingerprint]:
+    return [fingerprint(path) for path in inputs(config_name)]
+
+
+def source_stamp() -> str:
+    """Changes whenever a source file of the workspace changes, as the recipes determine digests and paths"""
+    digest = hashlib.sha256()
+    root = Path(__file__).parent
+    for (directory, directories, files) in os.walk(root):
+        directories[:] = sorted(name for name in directories if name != "__pycache__")
+        for name in sorted(files):
+            if name.endswith(".py"):
+                stat = os.stat(os.path.join(directory, name))
+                digest.update(f'{os.path.relpath(os.path.join(directory, name), root)}:'
+                              f'{stat.st_mtime_ns}:{stat.st_size}\n'.encode())
+    return digest.hexdigest()
+
+
+def newest_source_change() -> int:
+    """
+    The latest modification time (in ns) of the files and directories of the workspace sources (a directory changes
+    when a source file is added, removed or renamed), as compared against the path index by the shell functions
+    """
+    newest = 0
+    for (directory, directories, files) in os.walk(Path(__file__).parent):
+        directories[:] = [name for name in directories if name != "__pycache__"]
+        newest = max([newest, os.stat(directory).st_mtime_ns] +
+                     [os.stat(os.path.join(directory, name)).st_mtime_ns for name in files])
+    return newest
+
+
+def check(config_name: str, stamp: str, recorded: Sequence[Sequence]) -> Optional[List[Fingerprint]]:
+    """
+    Checks fingerprints recorded earlier (together with the source stamp) against the inputs of the given configuration.
+    Returns `None` if anything changed, and the current fingerprints otherwise.
+
+    An input whose modification time changed without its contents changing is considered unchanged. The caller should
+    record the returned fingerprints again in this case (i.e., if they differ from `recorded`).
+    """
+    if stamp != source_stamp():
+        return None
+    if [str(path) for path in inputs(config_name)] != [str(entry[0]) for entry in recorded]:
+        return None
+
+    result: List[Fingerprint] = []
+    for (path, mtime, size, sha256) in recorded:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (int(mtime), int(size)):
+            if stat.st_size != int(size) or _hash_file(Path(path)) != sha256:
+                return None
+        result.append((str(path), stat.st_mtime_ns, stat.st_size, str(sha256)))
+    return result
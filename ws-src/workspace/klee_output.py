@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import ast
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Reads the results that KLEE (and thereby PORSE) leaves in its output directory.
+
+_DONE = re.compile(r"^KLEE: done: (.+?) = (\d+)$")
+
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+def read_info(output_dir: Path) -> Dict[str, int]:
+    """The statistics that KLEE prints when it is done (e.g., "total instructions"), as recorded in the `info` file"""
+    statistics: Dict[str, int] = {}
+    try:
+        with open(output_dir / "info", "rt", errors="replace") as file:
+            for line in file:
+                match = _DONE.match(line.rstrip("\n"))
+                if match:
+                    statistics[match.group(1)] = int(match.group(2))
+    except FileNotFoundError:
+        pass
+    return statistics
+
+
+def instructions(done: Dict[str, int]) -> Optional[int]:
+    return done.get("total instructions")
+
+
+def explored_paths(done: Dict[str, int]) -> Optional[int]:
+    """The number of explored paths, which older versions of KLEE report as completed and partially completed paths"""
+    if "explored paths" in done:
+        return done["explored paths"]
+    if "completed paths" in done:
+        return done["completed paths"] + done.get("partially completed paths", 0)
+    return None
+
+
+def _read_sqlite_stats(path: Path) -> Tuple[Dict[str, Any], Optional[float]]:
+    connection = sqlite3.connect(f'{path.resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        cursor = connection.execute("SELECT * FROM stats ORDER BY rowid DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return ({}, None)
+        last = dict(zip([column[0] for column in cursor.description], row))
+        peak = None
+        if "MallocUsage" in last:
+            (peak, ) = connection.execute("SELECT MAX(MallocUsage) FROM stats").fetchone()
+    finally:
+        connection.close()
+    # times are stored in microseconds since KLEE 2.0, which introduced the SQLite format
+    return ({name: value / 1e6 if "Time" in name else value for (name, value) in last.items()}, peak)
+
+
+def _read_text_stats(path: Path) -> Tuple[Dict[str, Any], Optional[float]]:
+    with open(path, "rt", errors="replace") as file:
+        header = file.readline()
+        try:
+            names = list(ast.literal_eval(header))
+        except (SyntaxError, ValueError):
+            return ({}, None)
+        memory = names.index("MallocUsage") if "MallocUsage" in names else None
+        last = None
+        peak = None
+        for line in file:
+            if not line.endswith("\n"):
+                break  # still being written
+            last = line
+            if memory is not None:
+                try:
+                    usage = float(line.strip("()\n").split(",")[memory])
+                except (IndexError, ValueError):
+                    continue
+                peak = usage if peak is None else max(peak, usage)
+    if last is None:
+        return ({}, None)
+    try:
+        values = list(ast.literal_eval(last))
+    except (SyntaxError, ValueError):
+        return ({}, None)
+    return (dict(zip(names, values)), peak)
+
+
+def read_run_stats(output_dir: Path) -> Tuple[Dict[str, Any], Optional[float]]:
+    """
+    The last row of the `run.stats` file (i.e., the statistics of the whole run, with times in seconds) and the peak
+    of the memory usage over all rows. Both the SQLite format of KLEE 2.0 and later and the text format of earlier
+    versions are read row by row, so that the file is never loaded into memory as a whole.
+    """
+    path = output_dir / "run.stats"
+    try:
+        with open(path, "rb") as file:
+            is_sqlite = file.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+        return _read_sqlite_stats(path) if is_sqlite else _read_text_stats(path)
+    except (FileNotFoundError, sqlite3.DatabaseError):
+        return ({}, None)
+
+
+def _first(statistics: Dict[str, Any], names: List[str]) -> Optional[float]:
+    for name in names:
+        if statistics.get(name) is not None:
+            return float(statistics[name])
+    return None
+
+
+def summarize(output_dir: Path) -> Dict[str, Any]:
+    """The time, instructions, queries, solver time and peak memory of the run that left `output_dir`"""
+    done = read_info(output_dir)
+    (statistics, peak) = read_run_stats(output_dir)
+    total_instructions = instructions(done)
+    return {
+        "wall_seconds": _first(statistics, ["WallTime"]),
+        "user_seconds": _first(statistics, ["UserTime"]),
+        "instructions": _first(statistics, ["Instructions"]) if total_instructions is None else total_instructions,
+        "paths": explored_paths(done),
+        "queries": _first(statistics, ["NumQueries", "Queries"]),
+        "solver_seconds": _first(statistics, ["SolverTime", "QueryTime"]),
+        "max_memory_mib": peak / 2**20 if peak is not None else None,
+    }
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import workspace.tracing as tracing
+
+# Locks are advisory `flock` locks on separate lock files, so they are released automatically when a process dies. They
+# exclude other processes, but a process may acquire a lock that it already holds again (e.g., when a recipe calls a
+# helper that locks the same resource).
+
+_HELD: Dict[Path, int] = {}  # lock files held by this process -> nesting depth
+
+
+def forget_inherited() -> None:
+    """
+    To be called by a process forked from another one (see `daemon`), which does not hold the locks of its parent. It
+    must also close the lock files it inherited, as a `flock` lock is only released once all copies of its file
+    descriptor are closed.
+    """
+    _HELD.clear()
+
+
+@contextlib.contextmanager
+def file_lock(lock_file: Path, description: str) -> Iterator[None]:
+    """Holds an exclusive lock on `lock_file` (which is created if necessary) during the `with` block"""
+    lock_file = lock_file.resolve()
+    if lock_file in _HELD:
+        _HELD[lock_file] += 1
+        try:
+            yield
+        finally:
+            _HELD[lock_file] -= 1
+        return
+
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "ab") as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f'Waiting for {description}, which is in use by another process...', flush=True)
+            with tracing.span("wait for lock", "lock", lock=description):
+                fcntl.flock(file, fcntl.LOCK_EX)
+        _HELD[lock_file] = 1
+        try:
+            yield
+        finally:
+            del _HELD[lock_file]  # closing the file releases the lock
+
+
+def lock_file_for(path: Path) -> Path:
+    """
+    The lock file that guards `path`. For paths inside the workspace, it is kept in `.build/locks`. Other paths (e.g.,
+    reference repositories, which may be shared between workspaces) are guarded by a lock file next to them.
+    """
+    # not the settings, which use locks themselves
+    from workspace.settings.ws_path import ws_path  # pylint: disable=import-outside-toplevel
+
+    path = Path(os.path.abspath(path))
+    try:
+        relative = path.relative_to(ws_path)
+    except ValueError:
+        return path.with_name(f'.{path.name}.lock')
+    # the name stays readable, while the hash keeps paths apart that only differ in special characters
+    readable = re.sub(r"[^A-Za-z0-9_.-]", "_", str(relative))
+    unique = hashlib.sha256(str(relative).encode()).hexdigest()[:8]
+    return ws_path / ".build" / "locks" / f'{readable}-{unique}.lock'
+
+
+@contextlib.contextmanager
+def locked(path: Path, description: Optional[str] = None) -> Iterator[None]:
+    """Holds the lock that guards `path` during the `with` block"""
+    with file_lock(lock_file_for(path), description if description is not None else str(path)):
+        yield
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import contextlib
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, List, Mapping, Optional, Sequence, Tuple, Union
+
+# Runs a command as a child process and measures the resources it used, as reported by wait4.
+
+Output = Union[int, IO, None]  # as accepted by subprocess.Popen
+
+
+class Measurement:  # pylint: disable=too-few-public-methods
+    def __init__(  # pylint: disable=too-many-arguments
+            self, returncode: int, wall_seconds: float, cpu_seconds: float, max_rss_bytes: int,
+            timed_out: bool) -> None:
+        self.returncode = returncode  # negative if the command was killed by a signal
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.max_rss_bytes = max_rss_bytes
+        self.timed_out = timed_out
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+def _wait(process: subprocess.Popen, timeout: Optional[float]) -> Tuple[int, Any, bool]:
+    """Waits for `process`, whose session is killed after `timeout` seconds. Returns its status, usage and timeout"""
+    timed_out = threading.Event()
+
+    def kill() -> None:
+        timed_out.set()
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+    try:
+        (_, status, usage) = os.wait4(process.pid, 0)
+    except BaseException:
+        # e.g., a KeyboardInterrupt in bench or bisect-perf, which must not leave the command (and its children) running
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        os.waitpid(process.pid, 0)
+        process.returncode = -signal.SIGKILL
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    return (status, usage, timed_out.is_set())
+
+
+def run(command: Sequence[Union[str, Path]],  # pylint: disable=too-many-arguments
+        env: Mapping[str, str],
+        cwd: Optional[Path] = None,
+        timeout: Optional[float] = None,
+        stdout: Output = subprocess.DEVNULL,
+        stderr: Output = subprocess.DEVNULL,
+        started: Optional[Callable[[int], None]] = None) -> Measurement:
+    """
+    Runs `command` in a new session, which is killed as a whole once `timeout` seconds have passed. May be called from
+    several threads at once. `started` is called with the process id (and thereby session id) once the command runs.
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(command,
+                               env=env,
+                               cwd=cwd,
+                               stdin=subprocess.DEVNULL,
+                               stdout=stdout,
+                               stderr=stderr,
+                               start_new_session=True)
+    if started is not None:
+        started(process.pid)
+
+    (status, usage, timed_out) = _wait(process, timeout)
+    wall_seconds = time.monotonic() - start
+
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return Measurement(process.returncode, wall_seconds, usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024,
+                       timed_out)
+
+
+def limited(command: Sequence[Union[str, Path]],
+            cpu_seconds: Optional[float] = None,
+            memory_bytes: Optional[int] = None) -> List[str]:
+    """
+    Wraps `command` so that it runs with the given CPU time and address space limits. The limits are set by a Python
+    trampoline that then replaces itself with the command (so the measured process is still the command), as setting
+    them in a `preexec_fn` is not safe while other threads are starting processes as well.
+    """
+    limits = []
+    if cpu_seconds is not None:
+        # the command receives SIGXCPU at the soft limit, and SIGKILL one second later
+        soft = math.ceil(cpu_seconds)
+        limits.append(f'resource.setrlimit(resource.RLIMIT_CPU, ({soft}, {soft + 1}))')
+    if memory_bytes is not None:
+        limits.append(f'resource.setrlimit(resource.RLIMIT_AS, ({memory_bytes}, {memory_bytes}))')
+    if not limits:
+        return [str(part) for part in command]
+    script = "; ".join(["import os, resource, sys"] + limits + ["os.execvp(sys.argv[1], sys.argv[1:])"])
+    return [sys.executable, "-c", script] + [str(part) for part in command]
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+
+# The outcomes of KLEE (and PORSE) runs are memoized in `.build/results`, keyed by the binary that was run, the
+# normalized command line and any further inputs that influence the outcome (e.g., resource limits). The binary is
+# identified by the digest of the build it belongs to together with the contents of the executable and of the runtime
+# libraries (as the digest of a build does not change with its sources). Files named on the command line (like the
+# input bitcode) are identified by their contents, so that moving them around does not invalidate the results.
+#
+# Every entry is a directory that contains the outcome (`result.json`), the most important files of the output
+# directory (`info` and `run.stats`), an archive of the whole output directory and, if there was one, the log.
+
+_STATS_FILES = ["info", "run.stats"]
+_BITCODE_SUFFIXES = [".bc", ".ll"]
+_BITCODE_MAGIC = [b"BC\xc0\xde", b"\xde\xc0\x17\x0b"]  # raw bitcode and bitcode in a wrapper
+
+_FILE_DIGESTS: Dict[Tuple[str, int, int], str] = {}  # (path, mtime, size) -> digest
+_FILE_DIGESTS_LOCK = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """The content digest of the file at `path`, which is only computed once per process (unless it changes)"""
+    stat = path.stat()
+    identity = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _FILE_DIGESTS_LOCK:
+        if identity in _FILE_DIGESTS:
+            return _FILE_DIGESTS[identity]
+    digest = hashlib.blake2s()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    with _FILE_DIGESTS_LOCK:
+        _FILE_DIGESTS[identity] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def binary_digest(workspace: Workspace, executable: Path) -> str:
+    """Identifies `executable`, which has to be part of one of the builds of `workspace`"""
+    executable = executable.resolve()
+    builds = [build for build in workspace.builds if build.paths["build_dir"].resolve() in executable.parents]
+    if not builds:
+        raise Exception(f'"{executable}" is not part of any build of the configuration "{workspace.config_name}"')
+    build = builds[0]
+    build_dir = build.paths["build_dir"].resolve()
+
+    digest = hashlib.blake2s()
+    digest.update(build.digest)
+    digest.update(file_digest(executable).encode())
+    runtime_dir = build_dir / "runtime"
+    if runtime_dir.is_dir():
+        for library in sorted(runtime_dir.rglob("*.bca")):
+            digest.update(str(library.relative_to(runtime_dir)).encode())
+            digest.update(file_digest(library).encode())
+    return digest.hexdigest()
+
+
+def _output_dir_option(argument: str) -> Optional[str]:
+    """The name of the option that sets the output directory if `argument` is one (with or without its value)"""
+    for option in ("-output-dir", "--output-dir"):
+        if argument == option or argument.startswith(f'{option}='):
+            return option
+    return None
+
+
+def _is_bitcode(path: Path) -> bool:
+    """Whether the file at `path` contains LLVM bitcode (or IR), i.e., can be the input of KLEE"""
+    if path.suffix in _BITCODE_SUFFIXES:
+        return True
+    with open(path, "rb") as file:
+        return file.read(4) in _BITCODE_MAGIC
+
+
+def normalize(arguments: Sequence[str], cwd: Optional[Path] = None) -> Tuple[List[str], Optional[Path]]:
+    """
+    Returns the arguments of a KLEE command line without its output directory, which is returned separately. Options
+    (up to the input file, which is the first bitcode file) are spelled with a single dash, and arguments that name
+    files (like the input, or the values of options such as `-seed-file`) are replaced by their content digests.
+    """
+    cwd = cwd if cwd is not None else Path.cwd()
+    normalized = []
+    output_dir = None
+    in_options = True
+    i = 0
+    while i < len(arguments):
+        argument = arguments[i]
+        option = _output_dir_option(argument) if in_options else None
+        if option is not None:
+            if argument == option:
+                i += 1
+                value = arguments[i] if i < len(arguments) else ""
+            else:
+                value = argument[len(option) + 1:]
+            output_dir = cwd / value
+        elif (cwd / argument).is_file():
+            normalized.append(f'file:{file_digest(cwd / argument)}')
+            if in_options and _is_bitcode(cwd / argument):
+                in_options = False  # the input, after which the arguments belong to the program
+        elif in_options and argument.startswith("--"):
+            normalized.append(argument[1:])
+        else:
+            normalized.append(argument)
+        i += 1
+    return (normalized, output_dir)
+
+
+def run_key(binary: str, arguments: Sequence[str], inputs: Optional[Mapping[str, Any]] = None) -> str:
+    """The key of a run of the binary identified by `binary` with the normalized `arguments` and further `inputs`"""
+    data = json.dumps({"binary": binary, "arguments": list(arguments), "inputs": inputs or {}}, sort_keys=True)
+    return hashlib.blake2s(data.encode()).hexdigest()
+
+
+class ResultCache:
+    """May be used from several threads and processes at once"""
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the memoized result, or `None` if there is none"""
+        try:
+            with open(self._entry(key) / "result.json", "rt") as file:
+                result = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        assert isinstance(result, dict)
+        return result
+
+    def restore(self, key: str, output_dir: Path, log: Optional[Path] = None) -> None:
+        """Recreates the output directory (which must not exist yet) and the log of the memoized result"""
+        entry = self._entry(key)
+        output_dir.mkdir(parents=True)
+        with tarfile.open(entry / "output.tar.gz", "r:gz") as archive:
+            archive.extractall(output_dir)
+        if log is not None and (entry / "log").exists():
+            shutil.copyfile(entry / "log", log)
+
+    def store(self, key: str, result: Mapping[str, Any], output_dir: Path, log: Optional[Path] = None) -> None:
+        entry = self._entry(key)
+        if entry.exists():
+            return
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # the entry is assembled next to its final location, so that it appears all at once
+        temporary = Path(tempfile.mkdtemp(prefix=f'{key}.', suffix=".tmp", dir=entry.parent))
+        try:
+            with tarfile.open(temporary / "output.tar.gz", "w:gz") as archive:
+                if output_dir.is_dir():
+                    for path in sorted(output_dir.iterdir()):
+                        archive.add(str(path), arcname=path.name)
+            for name in _STATS_FILES:
+                if (output_dir / name).is_file():
+                    shutil.copyfile(output_dir / name, temporary / name)
+            if log is not None and log.exists():
+                shutil.copyfile(log, temporary / "log")
+            with open(temporary / "result.json", "wt") as file:
+                json.dump(dict(result), file, indent=2)
+            try:
+                os.rename(temporary, entry)
+            except OSError:
+                pass  # stored by another process in the meantime
+        finally:
+            if temporary.exists():
+                shutil.rmtree(temporary)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import workspace.build_report as build_report
+import workspace.telemetry as telemetry
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.recipe import Recipe
+
+_CCACHE_HITS = ["direct_cache_hit", "preprocessed_cache_hit"]
+_CCACHE_MISSES = ["cache_miss"]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsFile:
+    """A set of metrics in the Prometheus text exposition format, as read by the node_exporter textfile collector"""
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Tuple[str, List[Tuple[Dict[str, str], float]]]] = {}
+
+    def add(self, name: str, description: str, value: float, **labels: str) -> None:
+        """Adds a sample of the gauge `name`. All samples of a gauge must have the same set of labels."""
+        if name not in self._metrics:
+            self._metrics[name] = (description, [])
+        self._metrics[name][1].append((labels, value))
+
+    def write(self, path: Path) -> None:
+        lines: List[str] = []
+        for (name, (description, samples)) in self._metrics.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            for (labels, value) in samples:
+                label_str = ",".join(f'{key}="{_escape(label)}"' for (key, label) in labels.items())
+                lines.append(f'{name}{{{label_str}}} {value}')
+
+        # the collector only reads files ending in .prom, so the temporary file is never picked up half-written
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f'{path.name}.tmp')
+        with open(temporary_path, "wt") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+
+
+def metrics_path(kind: str, *names: str) -> Path:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    directory = settings.metrics_dir.value
+    assert directory is not None
+    return directory / ("_".join(["ws", kind] + [re.sub(r"[^A-Za-z0-9_.-]", "_", name) for name in names]) + ".prom")
+
+
+def _ccache_stats() -> Optional[Dict[str, int]]:
+    if shutil.which("ccache") is None:
+        return None
+    result = subprocess.run(["ccache", "--print-stats"], capture_output=True, check=False)
+    if result.returncode != 0:
+        return None  # ccache < 4.0
+    stats: Dict[str, int] = {}
+    for line in result.stdout.decode(errors="replace").splitlines():
+        fields = line.split("\t")
+        if len(fields) == 2 and fields[1].isdigit():
+            stats[fields[0]] = int(fields[1])
+    return stats
+
+
+def _ninja_log_state(recipe: Recipe) -> Optional[Tuple[int, int, Dict[str, List[Any]]]]:
+    """The inode, size and latest entries (see `build_report.read_ninja_log`) of the `.ninja_log` of `recipe`"""
+    log_path = recipe.paths["build_dir"] / ".ninja_log"
+    try:
+        stat = os.stat(log_path)
+        return (stat.st_ino, stat.st_size, build_report.read_ninja_log(log_path))
+    except FileNotFoundError:
+        return None
+
+
+def _count_ninja_edges(recipe: Recipe, before: Optional[Tuple[int, int, Dict[str, List[Any]]]]) -> int:
+    """The number of edges that ninja logged since the log was in the state `before`"""
+    log_path = recipe.paths["build_dir"] / ".ninja_log"
+    with open(log_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        if before is None or (stat.st_ino == before[0] and stat.st_size >= before[1]):
+            file.seek(before[1] if before is not None else 0)
+            return sum(1 for line in file if not line.startswith(b"#"))
+
+    # ninja rewrote the log with the latest entry of every output, in no particular order, before appending the edges
+    # of this build, so the edges of this build are the entries that changed
+    return len(build_report.changed_entries(before[2], build_report.read_ninja_log(log_path)))
+
+
+def _directory_size(path: Path) -> int:
+    size = 0
+    with contextlib.suppress(FileNotFoundError):
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                size += _directory_size(Path(entry.path))
+            else:
+                size += entry.stat(follow_symlinks=False).st_blocks * 512
+    return size
+
+
+class BuildMetrics:
+    """Collects per-recipe metrics during `Workspace.build`. Does nothing unless the `metrics-dir` setting is set."""
+    def __init__(self, config_name: str) -> None:
+        from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+        self.config_name = config_name
+        self.enabled = settings.metrics_dir.value is not None
+        self.file = MetricsFile()
+
+    @contextlib.contextmanager
+    def recipe(self, workspace: Workspace, recipe: Recipe) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        labels = {"config": self.config_name, "recipe": recipe.name, "profile": recipe.profile_name}
+        # the ccache statistics are global, so they include the compilations of builds that run at the same time
+        ccache_before = _ccache_stats()
+        ninja_log = _ninja_log_state(recipe)
+        started = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            add = self.file.add
+            add("ws_build_duration_seconds", "Wall time of the last build", time.monotonic() - started, **labels)
+            add("ws_build_failed", "Whether the last build failed", int(failed), **labels)
+
+            if (recipe.paths["build_dir"] / ".ninja_log").is_file():
+                edges = _count_ninja_edges(recipe, ninja_log)
+                add("ws_build_ninja_edges", "Number of ninja edges run by the last build", edges, **labels)
+                add("ws_build_up_to_date", "Whether the last build found everything up to date", int(edges == 0),
+                    **labels)
+
+            ccache_after = _ccache_stats() if ccache_before is not None else None
+            if ccache_before is not None and ccache_after is not None:
+                hits = sum(ccache_after.get(key, 0) - ccache_before.get(key, 0) for key in _CCACHE_HITS)
+                misses = sum(ccache_after.get(key, 0) - ccache_before.get(key, 0) for key in _CCACHE_MISSES)
+                add("ws_build_ccache_hits", "ccache hits during the last build", hits, **labels)
+                add("ws_build_ccache_misses", "ccache misses during the last build", misses, **labels)
+                if hits + misses > 0:
+                    add("ws_build_ccache_hit_ratio", "ccache hit ratio during the last build", hits / (hits + misses),
+                        **labels)
+
+            add("ws_build_artifact_size_bytes", "Disk usage of the build directory",
+                _directory_size(recipe.paths["build_dir"]), **labels)
+
+            result = telemetry.load(workspace, recipe)
+            if result is not None:
+                add("ws_build_peak_rss_bytes", "Peak resident set size of all processes of the last build",
+                    result["peak_rss"], **labels)
+
+    def write(self, failed: bool) -> None:
+        if not self.enabled:
+            return
+        labels = {"config": self.config_name}
+        self.file.add("ws_build_success", "Whether the last build of the configuration succeeded", int(not failed),
+                      **labels)
+        self.file.add("ws_build_last_run_timestamp_seconds", "Time at which the last build of the configuration "
+                      "finished", time.time(), **labels)
+        self.file.write(metrics_path("build", self.config_name))
+
+
+@contextlib.contextmanager
+def recording_build(config_name: str) -> Iterator[BuildMetrics]:
+    """Collects the metrics of one configuration's build and writes them out afterwards (even if the build fails)."""
+    build_metrics = BuildMetrics(config_name)
+    failed = True
+    try:
+        yield build_metrics
+        failed = False
+    finally:
+        build_metrics.write(failed)
+
+
+def write_run_metrics(config_name: str, command: str, duration: float, returncode: int,
+                      usage: Any) -> None:
+    """Writes the metrics of a single command run via `run`. `usage` must cover just that command (see `os.wait4`)."""
+    labels = {"config": config_name, "command": command}
+    metrics = MetricsFile()
+    metrics.add("ws_run_duration_seconds", "Wall time of the last run", duration, **labels)
+    metrics.add("ws_run_cpu_seconds", "CPU time of the last run", usage.ru_utime, mode="user", **labels)
+    metrics.add("ws_run_cpu_seconds", "CPU time of the last run", usage.ru_stime, mode="system", **labels)
+    # ru_maxrss is given in KiB on Linux
+    metrics.add("ws_run_max_rss_bytes", "Peak resident set size of the last run", usage.ru_maxrss * 1024, **labels)
+    metrics.add("ws_run_exit_code", "Exit code of the last run (negative for signals)", returncode, **labels)
+    metrics.add("ws_run_last_run_timestamp_seconds", "Time at which the last run finished", time.time(), **labels)
+    metrics.write(metrics_path("run", config_name, command))
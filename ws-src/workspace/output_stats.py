@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import workspace.klee_output as klee_output
+
+# Summarizes the output directories of many KLEE (and PORSE) runs. The summary of every output directory is kept in an
+# index together with the size and modification time of its `info` and `run.stats` files, so that summarizing a
+# campaign again only reads the output directories that are new or have changed since.
+
+_INDEX_VERSION = 1  # to be increased whenever the summaries change
+
+_STATS_FILES = ["info", "run.stats"]
+
+# the aggregated columns: key, header and format
+COLUMNS = [
+    ("runs", "runs", "d"),
+    ("without_stats", "without run.stats", "d"),
+    ("wall_seconds", "wall time [s]", ".1f"),
+    ("mean_wall_seconds", "mean wall time [s]", ".1f"),
+    ("user_seconds", "user time [s]", ".1f"),
+    ("instructions", "instructions", ".0f"),
+    ("mean_instructions", "mean instructions", ".0f"),
+    ("paths", "paths", ".0f"),
+    ("queries", "queries", ".0f"),
+    ("solver_seconds", "solver time [s]", ".1f"),
+    ("solver_share", "solver share of wall time", ".1%"),
+    ("max_memory_mib", "peak memory [MiB]", ".1f"),
+    ("mean_memory_mib", "mean peak memory [MiB]", ".1f"),
+]
+
+
+def find_output_dirs(root: Path) -> List[Path]:
+    """The output directories below (or at) `root`, i.e., directories that contain an `info` or `run.stats` file"""
+    output_dirs = []
+    # symbolic links like `klee-last` are not followed, so that no output directory is counted twice
+    for (directory, directories, files) in os.walk(root):
+        if any(name in files for name in _STATS_FILES):
+            output_dirs.append(Path(directory))
+            directories.clear()
+        else:
+            directories.sort()
+    return sorted(output_dirs)
+
+
+def _fingerprint(output_dir: Path) -> List[Optional[List[int]]]:
+    fingerprint: List[Optional[List[int]]] = []
+    for name in _STATS_FILES:
+        try:
+            stat = (output_dir / name).stat()
+            fingerprint.append([stat.st_mtime_ns, stat.st_size])
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return fingerprint
+
+
+class Index:
+    """The summaries of output directories, which may be looked up from several threads at once"""
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, "rt") as file:
+                data = json.load(file)
+            if data.get("version") == _INDEX_VERSION:
+                self._entries = data["entries"]
+        except (FileNotFoundError, ValueError, KeyError, AttributeError):
+            pass  # summarize everything again
+
+    def summary(self, output_dir: Path) -> Tuple[Dict[str, Any], bool]:
+        """The summary of `output_dir` and whether it had to be read (instead of being taken from the index)"""
+        key = str(output_dir.resolve())
+        fingerprint = _fingerprint(output_dir)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            return (entry["summary"], False)
+        summary = klee_output.summarize(output_dir)
+        if fingerprint != _fingerprint(output_dir):
+            return (summary, True)  # still being written, so the summary is not kept
+        with self._lock:
+            self._entries[key] = {"fingerprint": fingerprint, "summary": summary}
+        return (summary, True)
+
+    def save(self) -> None:
+        """Writes the index, leaving out output directories that no longer exist"""
+        with self._lock:
+            entries = {key: entry for (key, entry) in self._entries.items() if Path(key).is_dir()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # concurrent runs may lose each other's additions, which are then only read once more
+        temporary_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(temporary_path, "wt") as file:
+            json.dump({"version": _INDEX_VERSION, "entries": entries}, file)
+        os.replace(temporary_path, self.path)
+
+
+def _total(values: Sequence[Optional[float]]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return sum(present) if present else None
+
+
+def _mean(values: Sequence[Optional[float]]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return sum(present) / len(present) if present else None
+
+
+def aggregate(summaries: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregates the summaries of several output directories, leaving out values that are missing from some"""
+    def values(key: str) -> List[Optional[float]]:
+        return [summary[key] for summary in summaries]
+
+    wall_seconds = _total(values("wall_seconds"))
+    solver_seconds = _total(values("solver_seconds"))
+    memory = [value for value in values("max_memory_mib") if value is not None]
+    return {
+        "runs": len(summaries),
+        "without_stats": sum(1 for summary in summaries if summary["wall_seconds"] is None),
+        "wall_seconds": wall_seconds,
+        "mean_wall_seconds": _mean(values("wall_seconds")),
+        "user_seconds": _total(values("user_seconds")),
+        "instructions": _total(values("instructions")),
+        "mean_instructions": _mean(values("instructions")),
+        "paths": _total(values("paths")),
+        "queries": _total(values("queries")),
+        "solver_seconds": solver_seconds,
+        "solver_share": solver_seconds / wall_seconds if solver_seconds is not None and wall_seconds else None,
+        "max_memory_mib": max(memory) if memory else None,
+        "mean_memory_mib": _mean(memory),
+    }
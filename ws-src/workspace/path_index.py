@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import workspace.fingerprints as fingerprints
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.fingerprints import Fingerprint
+
+# Index format (tab separated):
+#   # ws path index 1
+#   #   source  <stamp of the workspace sources>
+#   #   <input> <mtime in ns>   <size>  <sha256>     (one line per input, i.e., the config and the settings file)
+#   <build name>    <path name> <path>              (one line per path of every build)
+#
+# The shell functions only check that the index is newer than its inputs and than the workspace sources (see
+# `fingerprints.newest_source_change`) before using it, so the index is only ever written if it is complete and correct
+# for the current inputs and sources.
+
+_HEADER = "# ws path index 1"
+
+
+def index_path(config_name: str) -> Path:
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    return settings.ws_path / ".build" / "index" / f'{config_name}.tsv'
+
+
+def _render(inputs: List[Fingerprint], entries: Dict[str, Dict[str, Path]]) -> str:
+    lines = [_HEADER, f'#\tsource\t{fingerprints.source_stamp()}']
+    lines += [f'#\t{path}\t{mtime}\t{size}\t{sha256}' for (path, mtime, size, sha256) in inputs]
+    for (build_name, paths) in entries.items():
+        lines += [f'{build_name}\t{key}\t{path}' for (key, path) in paths.items()]
+    return "\n".join(lines) + "\n"
+
+
+def _write(config_name: str, text: str) -> None:
+    path = index_path(config_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')  # other processes may write it concurrently
+    with open(temporary_path, "wt") as file:
+        file.write(text)
+    os.replace(temporary_path, path)
+
+
+def write(workspace: Workspace) -> None:
+    """Writes the index of the (initialized) builds of `workspace`, unless it is unchanged"""
+    if not fingerprints.cacheable():
+        return  # the workspace does not contain all builds
+
+    entries = {build.name: dict(build.paths) for build in workspace.builds}
+    for (build_name, paths) in entries.items():
+        if any(char in f'{build_name}{key}{path}' for (key, path) in paths.items() for char in "\t\n"):
+            return  # not representable in the index, `build-dir` will always take the slow path
+
+    text = _render(fingerprints.current(workspace.config_name), entries)
+    try:
+        with open(index_path(workspace.config_name), "rt") as file:
+            if file.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+    _write(workspace.config_name, text)
+
+
+def _parse(lines: List[str]) -> Optional[Tuple[str, List[List[str]], Dict[str, Dict[str, Path]]]]:
+    """Returns the source stamp, the recorded input fingerprints and the entries of an index, `None` if it is invalid"""
+    if not lines or lines[0] != _HEADER:
+        return None
+
+    stamp = ""
+    recorded: List[List[str]] = []
+    entries: Dict[str, Dict[str, Path]] = {}
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if fields[0] != "#":
+            if len(fields) != 3:
+                return None
+            entries.setdefault(fields[0], {})[fields[1]] = Path(fields[2])
+        elif len(fields) == 3 and fields[1] == "source":
+            stamp = fields[2]
+        elif len(fields) == 5:
+            recorded.append(fields[1:])
+        else:
+            return None
+    return (stamp, recorded, entries)
+
+
+def load(config_name: str) -> Optional[Dict[str, Dict[str, Path]]]:
+    """
+    Returns the paths of all builds of the given configuration if an up to date index exists, `None` otherwise.
+
+    An input whose modification time changed without its contents changing does not invalidate the index, but the index
+    is rewritten so the shell functions can use it again. The same goes for source directories that changed without
+    the source stamp changing (e.g., because a `__pycache__` was created in them).
+    """
+    if not fingerprints.cacheable():
+        return None
+    try:
+        with open(index_path(config_name), "rt") as file:
+            modified = os.fstat(file.fileno()).st_mtime_ns
+            index = _parse(file.read().splitlines())
+    except FileNotFoundError:
+        return None
+
+    if index is None:
+        return None
+    (stamp, recorded, entries) = index
+    inputs = fingerprints.check(config_name, stamp, recorded)
+    if inputs is None:
+        return None
+    if ([[str(field) for field in fingerprint] for fingerprint in inputs] != recorded
+            or fingerprints.newest_source_change() > modified):
+        _write(config_name, _render(inputs, entries))
+    return entries
+
+
+def lookup(config_name: str, build_name: str, path_name: str = "build_dir") -> Optional[Path]:
+    """Returns the path `path_name` of the build `build_name` from the index, if the index is up to date"""
+    entries = load(config_name)
+    if entries is None:
+        return None
+    return entries.get(build_name, {}).get(path_name)
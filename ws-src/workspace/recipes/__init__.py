@@ -1,15 +1,29 @@
+from typing import TYPE_CHECKING, Any
+
 from .all_recipes import ALL
-from .klee import KLEE
-from .klee_libcxx import KLEE_LIBCXX
-from .klee_libcxxabi import KLEE_LIBCXXABI
-from .klee_uclibc import KLEE_UCLIBC
-from .llvm import LLVM
-from .minisat import MINISAT
-from .porse import PORSE
-from .recipe import Recipe
-from .stp import STP
-from .z3 import Z3
+
+if TYPE_CHECKING:
+    from .klee import KLEE
+    from .klee_libcxx import KLEE_LIBCXX
+    from .klee_libcxxabi import KLEE_LIBCXXABI
+    from .klee_uclibc import KLEE_UCLIBC
+    from .llvm import LLVM
+    from .minisat import MINISAT
+    from .porse import PORSE
+    from .recipe import Recipe
+    from .stp import STP
+    from .z3 import Z3
 
 __all__ = [
     "ALL", "KLEE", "KLEE_LIBCXX", "KLEE_LIBCXXABI", "KLEE_UCLIBC", "LLVM", "MINISAT", "Recipe", "STP", "Z3", "PORSE"
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # the recipes (and their dependencies) are only imported on first use
+    if name == "Recipe":
+        from .recipe import Recipe  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return Recipe
+    if name in ALL:
+        return ALL[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
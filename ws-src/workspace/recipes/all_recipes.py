@@ -1,12 +1,45 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, Type
+import importlib
+from typing import TYPE_CHECKING, Dict, Iterator, Mapping, Type
 
 if TYPE_CHECKING:
     from .recipe import Recipe
 
-ALL: Dict[str, Type[Recipe]] = dict()
+# the modules defining the recipes, which are only imported once a recipe is actually used
+_MODULES: Dict[str, str] = {
+    "KLEE": "workspace.recipes.klee",
+    "KLEE_LIBCXX": "workspace.recipes.klee_libcxx",
+    "KLEE_LIBCXXABI": "workspace.recipes.klee_libcxxabi",
+    "KLEE_UCLIBC": "workspace.recipes.klee_uclibc",
+    "LLVM": "workspace.recipes.llvm",
+    "MINISAT": "workspace.recipes.minisat",
+    "PORSE": "workspace.recipes.porse",
+    "STP": "workspace.recipes.stp",
+    "Z3": "workspace.recipes.z3",
+}
+_LOADED: Dict[str, Type[Recipe]] = {}
+
+
+class _Registry(Mapping[str, "Type[Recipe]"]):
+    """Maps recipe names to recipe classes, importing the module of a recipe on first access"""
+    def __getitem__(self, name: str) -> Type[Recipe]:
+        if name not in _LOADED:
+            if name not in _MODULES:
+                raise KeyError(name)
+            importlib.import_module(_MODULES[name])
+        return _LOADED[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_MODULES)
+
+    def __len__(self) -> int:
+        return len(_MODULES)
+
+
+ALL: Mapping[str, Type[Recipe]] = _Registry()
 
 
 def register_recipe(recipe: Type[Recipe]) -> None:
-    ALL[recipe.__name__] = recipe
+    _MODULES.setdefault(recipe.__name__, recipe.__module__)
+    _LOADED[recipe.__name__] = recipe
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import abc
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Mapping, MutableMapping
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, MutableMapping
 
 if TYPE_CHECKING:
     from workspace import Workspace
@@ -58,6 +58,11 @@ class IRecipe(abc.ABC):
     def paths(self) -> MutableMapping[str, Path]:
         raise NotImplementedError()
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:  # pylint: disable=no-self-use
+        """Override `find_dependencies` in your recipe, to list the builds whose artifacts your build uses"""
+        del workspace  # unused parameter
+        return []
+
     @abc.abstractmethod
     def setup(self, workspace: Workspace):
         """Override `setup` in your recipe, to check out repositories, prepare code, etc."""
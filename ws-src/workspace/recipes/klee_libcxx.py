@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Dict, List, Union
 
+import workspace.tracing as tracing
 from workspace.build_systems.cmake_recipe_mixin import CMakeRecipeMixin
 from workspace.util import newer_than, run_with_prefix
 
@@ -14,6 +15,7 @@ from .recipe import Recipe
 if TYPE_CHECKING:
     import hashlib
     from workspace import Workspace
+    from .irecipe import IRecipe
 
 
 class KLEE_LIBCXX(Recipe, CMakeRecipeMixin):  # pylint: disable=invalid-name
@@ -51,8 +53,8 @@ class KLEE_LIBCXX(Recipe, CMakeRecipeMixin):  # pylint: disable=invalid-name
     }
 
     default_arguments: Dict[str, Any] = {
-        "llvm": LLVM().default_name,
-        "klee-libcxxabi": KLEE_LIBCXXABI().default_name,
+        "llvm": LLVM.class_default_name(),
+        "klee-libcxxabi": KLEE_LIBCXXABI.class_default_name(),
     }
 
     argument_schema: Dict[str, Any] = {
@@ -66,6 +68,9 @@ class KLEE_LIBCXX(Recipe, CMakeRecipeMixin):  # pylint: disable=invalid-name
     def find_klee_libcxxabi(self, workspace: Workspace) -> KLEE_LIBCXXABI:
         return self._find_previous_build(workspace, "klee-libcxxabi", KLEE_LIBCXXABI)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        return [self.find_llvm(workspace), self.find_klee_libcxxabi(workspace)]
+
     def _get_wllvm_env(self, workspace: Workspace) -> Dict[str, str]:
         env = workspace.get_env()
 
@@ -139,7 +144,8 @@ class KLEE_LIBCXX(Recipe, CMakeRecipeMixin):  # pylint: disable=invalid-name
                 "extract-bc", "--linker", llvm.paths["llvm-link"], "--archiver", llvm.paths["llvm-ar"], "-o",
                 self.paths["libcxx.bc"], self.paths["libcxx.so"]
             ]
-            run_with_prefix(extract_bc_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
+            with tracing.span("extract-bc"):
+                run_with_prefix(extract_bc_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
 
         if not newer_than(target=self.paths["klee_libcxx.bc"],
                           others=[self.paths["libcxx.bc"], klee_libcxxabi.paths["libcxxabi.bc"]]):
@@ -147,7 +153,8 @@ class KLEE_LIBCXX(Recipe, CMakeRecipeMixin):  # pylint: disable=invalid-name
                 llvm.paths["llvm-link"], "-o", self.paths["klee_libcxx.bc"], self.paths["libcxx.bc"],
                 klee_libcxxabi.paths["libcxxabi.bc"]
             ]
-            run_with_prefix(link_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
+            with tracing.span("llvm-link"):
+                run_with_prefix(link_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
 
     def add_to_env(self, env, workspace: Workspace):
         pass
@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Dict, List, Union
 
+import workspace.tracing as tracing
 from workspace.build_systems.cmake_recipe_mixin import CMakeRecipeMixin
 from workspace.util import newer_than, run_with_prefix
 from workspace.vcs.git import GitRecipeMixin
@@ -14,6 +15,7 @@ from .recipe import Recipe
 if TYPE_CHECKING:
     import hashlib
     from workspace import Workspace
+    from .irecipe import IRecipe
 
 
 class KLEE_LIBCXXABI(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid-name
@@ -51,7 +53,7 @@ class KLEE_LIBCXXABI(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disab
     }
 
     default_arguments: Dict[str, Any] = {
-        "llvm": LLVM().default_name,
+        "llvm": LLVM.class_default_name(),
     }
 
     argument_schema: Dict[str, Any] = {
@@ -61,6 +63,9 @@ class KLEE_LIBCXXABI(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disab
     def find_llvm(self, workspace: Workspace) -> LLVM:
         return self._find_previous_build(workspace, "llvm", LLVM)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        return [self.find_llvm(workspace)]
+
     def __init__(self, **kwargs):
         GitRecipeMixin.__init__(self, "github://llvm/llvm-project.git", sparse=["/libcxx", "/libcxxabi"])
         CMakeRecipeMixin.__init__(self)
@@ -123,7 +128,8 @@ class KLEE_LIBCXXABI(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disab
                 "extract-bc", "--linker", llvm.paths["llvm-link"], "--archiver", llvm.paths["llvm-ar"], "-o",
                 self.paths["libcxxabi.bc"], self.paths["libcxxabi.so"]
             ]
-            run_with_prefix(extract_bc_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
+            with tracing.span("extract-bc"):
+                run_with_prefix(extract_bc_cmd, self.output_prefix, check=True, cwd=self.paths["build_dir"])
 
     def add_to_env(self, env, workspace: Workspace):
         pass
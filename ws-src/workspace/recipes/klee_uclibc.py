@@ -3,9 +3,11 @@ from __future__ import annotations
 import os
 import shutil
 import subprocess
-import urllib.request
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List
 
+import workspace.locking as locking
+import workspace.tracing as tracing
+from workspace.build_systems.staging import stage_tree, tree_digest
 from workspace.settings import settings
 from workspace.util import env_prepend_path, run_with_prefix
 from workspace.vcs.git import GitRecipeMixin
@@ -18,11 +20,12 @@ if TYPE_CHECKING:
     import hashlib
     from .porse import PORSE
     from workspace import Workspace
+    from .irecipe import IRecipe
 
 
 class KLEE_UCLIBC(Recipe, GitRecipeMixin):  # pylint: disable=invalid-name
     default_arguments: Dict[str, Any] = {
-        "llvm": LLVM().default_name,
+        "llvm": LLVM.class_default_name(),
         "porse": "porse",  # hard-coded to avoid a circular dependency
     }
 
@@ -37,6 +40,10 @@ class KLEE_UCLIBC(Recipe, GitRecipeMixin):  # pylint: disable=invalid-name
     def find_porse(self, workspace: Workspace) -> PORSE:
         return workspace.find_build(self.porse, before=None)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        # the porse build only provides headers (which are read from its source directory) and is built later
+        return [self.find_llvm(workspace)]
+
     @property
     def porse(self):
         return self.arguments["porse"]
@@ -49,6 +56,8 @@ class KLEE_UCLIBC(Recipe, GitRecipeMixin):  # pylint: disable=invalid-name
         Recipe.initialize(self, workspace)
 
         self.paths["locale_file"] = workspace.build_dir / "uclibc-locale" / "uClibc-locale-030818.tgz"
+        self.paths["staging_manifest"] = self.paths["build_dir"] / ".ws-staging-manifest.json"
+        self.paths["make_stamp"] = self.paths["build_dir"] / ".ws-make-stamp"
 
         porse = self.find_porse(workspace)
         if self.name != porse.klee_uclibc:
@@ -66,31 +75,36 @@ class KLEE_UCLIBC(Recipe, GitRecipeMixin):  # pylint: disable=invalid-name
         digest.update(self.find_llvm(workspace).digest)
 
     def setup(self, workspace: Workspace):
+        import urllib.request  # pylint: disable=import-outside-toplevel
+
         self.setup_git(self.paths["src_dir"], workspace.patch_dir / self.default_name)
 
-        if not self.paths["locale_file"].is_file():
-            attempt, attempts = 0, 5
-            while attempt < attempts:
-                with urllib.request.urlopen("https://www.uclibc.org/downloads/uClibc-locale-030818.tgz") as response:
-                    os.makedirs(self.paths["locale_file"].parent, exist_ok=True)
-                    with open(self.paths["locale_file"], "wb") as locale_file:
-                        shutil.copyfileobj(response, locale_file)
-                result = subprocess.run(["tar", "-xOf", self.paths["locale_file"]],
-                                        stdout=subprocess.DEVNULL,
-                                        check=False)
-                if result.returncode != 0:
-                    os.remove(self.paths["locale_file"])
-                    attempt += 1
-                    print(f'Failed downloading uclibc locale data in attempt {attempt}/{attempts}')
-                else:
-                    break
-            if attempt >= attempts:
-                raise Exception("Failure downloading locale data")
+        # the locale data is shared between all configurations
+        locale_file = self.paths["locale_file"]
+        with locking.locked(locale_file, "the uclibc locale data"):
+            if not locale_file.is_file():
+                url = "https://www.uclibc.org/downloads/uClibc-locale-030818.tgz"
+                temporary_path = locale_file.with_name(f'{locale_file.name}.tmp')
+                attempt, attempts = 0, 5
+                while attempt < attempts:
+                    with urllib.request.urlopen(url) as response:
+                        os.makedirs(locale_file.parent, exist_ok=True)
+                        with open(temporary_path, "wb") as file:
+                            shutil.copyfileobj(response, file)
+                    result = subprocess.run(["tar", "-xOf", temporary_path], stdout=subprocess.DEVNULL, check=False)
+                    if result.returncode != 0:
+                        os.remove(temporary_path)
+                        attempt += 1
+                        print(f'Failed downloading uclibc locale data in attempt {attempt}/{attempts}')
+                    else:
+                        os.replace(temporary_path, locale_file)
+                        break
+                if attempt >= attempts:
+                    raise Exception("Failure downloading locale data")
 
     def build(self, workspace: Workspace):
-        run_with_prefix(["rsync", "-a", f'{self.paths["src_dir"]}/', self.paths["build_dir"]],
-                        self.output_prefix,
-                        check=True)
+        with tracing.span("stage sources"):
+            changed = stage_tree(self.paths["src_dir"], self.paths["build_dir"], self.paths["staging_manifest"])
         locale_build_path = self.paths["build_dir"] / "extra" / "locale" / self.paths["locale_file"].name
         if not locale_build_path.is_file():
             os.symlink(self.paths["locale_file"].resolve(), locale_build_path.resolve())
@@ -103,17 +117,31 @@ class KLEE_UCLIBC(Recipe, GitRecipeMixin):  # pylint: disable=invalid-name
         if not (self.paths["build_dir"] / '.config').exists():
             llvm = self.find_llvm(workspace)
 
-            run_with_prefix(["./configure", "--make-llvm-lib", f'--with-llvm-config={llvm.paths["llvm-config"]}'],
+            with tracing.span("configure"):
+                run_with_prefix(
+                    ["./configure", "--make-llvm-lib", f'--with-llvm-config={llvm.paths["llvm-config"]}'],
+                    self.output_prefix,
+                    cwd=self.paths["build_dir"],
+                    env=env,
+                    check=True)
+            changed = True
+
+        # the porse headers are passed via C_INCLUDE_PATH and therefore count as inputs as well
+        inputs = tree_digest(porse.paths["include_dir"]) if porse.paths["include_dir"].is_dir() else ""
+        make_stamp = self.paths["make_stamp"]
+        if not changed and make_stamp.is_file() and make_stamp.read_text() == inputs:
+            print(f'{self.output_prefix}Sources unchanged since the last successful build, skipping make')
+            return
+
+        if make_stamp.exists():
+            os.unlink(make_stamp)
+        with tracing.span("make"):
+            run_with_prefix(["make", "-j", str(settings.jobs.value)],
                             self.output_prefix,
                             cwd=self.paths["build_dir"],
                             env=env,
                             check=True)
-
-        run_with_prefix(["make", "-j", str(settings.jobs.value)],
-                        self.output_prefix,
-                        cwd=self.paths["build_dir"],
-                        env=env,
-                        check=True)
+        make_stamp.write_text(inputs)
 
 
 register_recipe(KLEE_UCLIBC)
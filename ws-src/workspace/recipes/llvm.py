@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import psutil
 import schema
 
 from workspace.build_systems.cmake_recipe_mixin import CMakeRecipeMixin
@@ -16,6 +15,7 @@ from .recipe import Recipe
 if TYPE_CHECKING:
     import hashlib
     from workspace import Workspace
+    from .irecipe import IRecipe
     from .z3 import Z3
 
 
@@ -100,6 +100,10 @@ class LLVM(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid
             return None
         return self._find_previous_build(workspace, "z3", Z3)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        z3 = self.find_z3(workspace)
+        return [z3] if z3 else []
+
     def __init__(self, **kwargs):
         GitRecipeMixin.__init__(self, "github://llvm/llvm-project.git", sparse=["/llvm", "/clang"])
         CMakeRecipeMixin.__init__(self)
@@ -181,6 +185,8 @@ class LLVM(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid
             assert self._release_build is not None
             self.cmake.set_flag("LLVM_TABLEGEN", self._release_build.paths["tablegen"])
 
+        import psutil  # pylint: disable=import-outside-toplevel
+
         avail_mem = psutil.virtual_memory().available
         if self.profile["has_debug_info"] and avail_mem < settings.jobs.value * 12000000000 and avail_mem < 35000000000:
             print(f'[{self.__class__.__name__}] less than 12G memory per thread (or 35G total) available '
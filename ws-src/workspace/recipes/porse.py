@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 import schema
 
@@ -20,6 +20,7 @@ from .z3 import Z3
 if TYPE_CHECKING:
     import hashlib
     from workspace import Workspace
+    from .irecipe import IRecipe
 
 
 class PORSE(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid-name
@@ -69,10 +70,10 @@ class PORSE(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invali
     }
 
     default_arguments: Dict[str, Any] = {
-        "klee-uclibc": KLEE_UCLIBC().default_name,
-        "llvm": LLVM().default_name,
-        "z3": Z3().default_name,
-        "stp": STP().default_name,
+        "klee-uclibc": KLEE_UCLIBC.class_default_name(),
+        "llvm": LLVM.class_default_name(),
+        "z3": Z3.class_default_name(),
+        "stp": STP.class_default_name(),
         "klee-libcxx": None,
         "verified-fingerprints": False,
         "vptr-sanitizer": False,
@@ -105,6 +106,18 @@ class PORSE(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invali
             return None
         return self._find_previous_build(workspace, "klee-libcxx", KLEE_LIBCXX)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        dependencies: List[IRecipe] = [
+            self.find_klee_uclibc(workspace),
+            self.find_llvm(workspace),
+            self.find_z3(workspace),
+            self.find_stp(workspace)
+        ]
+        klee_libcxx = self.find_klee_libcxx(workspace)
+        if klee_libcxx:
+            dependencies.append(klee_libcxx)
+        return dependencies
+
     @property
     def klee_uclibc(self) -> str:
         return self.arguments["klee-uclibc"]
@@ -52,6 +52,11 @@ class Recipe(IRecipe, abc.ABC):  # pylint: disable=abstract-method
         assert isinstance(result, str)
         return result
 
+    @classmethod
+    def class_default_name(cls) -> str:
+        """The default name of builds of this recipe, which is available without instantiating the recipe"""
+        return cls.__name__.lower().replace("_", "-")
+
     @property
     def profile_name(self) -> str:
         result = self.arguments["profile"]
@@ -89,19 +94,23 @@ class Recipe(IRecipe, abc.ABC):  # pylint: disable=abstract-method
 
         self.__paths: Dict[str, Path] = {}
         self.__digest: Optional[bytes] = None
+        self.validated = False  # set once the arguments are known to be valid, e.g., as they were cached when valid
 
-        default_arguments = {"name": type(self).__name__.lower().replace("_", "-")}
+        default_arguments = {"name": self.class_default_name()}
         if "default" in self.profiles:
             default_arguments["profile"] = "default"
         self.default_arguments = dict(default_arguments, **self.default_arguments)
         self.__arguments = dict(self.default_arguments, **kwargs)
         self.argument_schema = dict({"name": str, "profile": schema.Or(*self.profiles.keys())}, **self.argument_schema)
 
-    def __validate(self):
+    def validate(self) -> None:
+        if self.validated:
+            return
         try:
             schema.Schema(self.argument_schema).validate(self.arguments)
         except schema.SchemaError as error:
             raise Exception(f'[{self.name}] Could not validate configuration: {error}')
+        self.validated = True
 
     def _find_previous_build(self, workspace: Workspace, name: str, typ: Type[R]) -> R:
         build = workspace.find_build(build_name=self.arguments[name], before=self)
@@ -116,7 +125,7 @@ class Recipe(IRecipe, abc.ABC):  # pylint: disable=abstract-method
 
     def initialize(self, workspace: Workspace) -> None:
         """Override `initialize` in your recipe, but call the base version in the beginning"""
-        self.__validate()
+        self.validate()
 
         digest = hashlib.blake2s()
         self.compute_digest(workspace, digest)
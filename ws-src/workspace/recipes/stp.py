@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import sys
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List
 
 from workspace.build_systems import Linker
 from workspace.build_systems.cmake_recipe_mixin import CMakeRecipeMixin
@@ -15,6 +15,7 @@ from .recipe import Recipe
 if TYPE_CHECKING:
     import hashlib
     from workspace import Workspace
+    from .irecipe import IRecipe
 
 
 class STP(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid-name
@@ -51,7 +52,7 @@ class STP(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid-
     }
 
     default_arguments: Dict[str, Any] = {
-        "minisat": MINISAT().default_name,
+        "minisat": MINISAT.class_default_name(),
     }
 
     argument_schema: Dict[str, Any] = {
@@ -61,6 +62,9 @@ class STP(Recipe, GitRecipeMixin, CMakeRecipeMixin):  # pylint: disable=invalid-
     def find_minisat(self, workspace: Workspace) -> MINISAT:
         return self._find_previous_build(workspace, "minisat", MINISAT)
 
+    def find_dependencies(self, workspace: Workspace) -> List[IRecipe]:
+        return [self.find_minisat(workspace)]
+
     def __init__(self, **kwargs):
         GitRecipeMixin.__init__(self, "github://stp/stp.git")
         CMakeRecipeMixin.__init__(self)
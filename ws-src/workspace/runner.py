@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import Callable, List, Mapping, Optional, Sequence, Union
+
+from workspace.util import READ_SIZE, PrefixTranslator
+
+Sink = Callable[[bytes], None]
+
+
+def stdout_sink(data: bytes) -> None:
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+class Job:  # pylint: disable=too-few-public-methods
+    """
+    A single child process to be driven by an `AsyncRunner`.
+
+    Parameters
+    ----------
+    command: sequence of str or Path
+        The command to execute.
+    prefix: str
+        The prefix to put in front of every line of output (e.g., a recipe's `output_prefix`).
+    cwd: Path, optional
+        The working directory of the child.
+    env: mapping of str to str, optional
+        The environment of the child. Defaults to the environment of the current process.
+    sink: callable, optional
+        Receives the prefixed output of the child. Defaults to writing to stdout.
+    """
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            command: Sequence[Union[str, Path]],
+            prefix: str = "",
+            cwd: Optional[Path] = None,
+            env: Optional[Mapping[str, str]] = None,
+            sink: Optional[Sink] = None) -> None:
+        self.command: List[str] = [str(arg) for arg in command]
+        self.prefix = prefix
+        self.cwd = cwd
+        self.env = env
+        self.sink: Sink = sink if sink is not None else stdout_sink
+        self.returncode: Optional[int] = None
+
+
+class AsyncRunner:
+    """
+    Drives many child processes concurrently from a single asyncio event loop.
+
+    Every child gets its own process group, so that cancelling a job (or interrupting `run_all`) terminates the child
+    together with everything it spawned (e.g., the compilers started by ninja or make).
+    """
+    def __init__(self, max_parallel: Optional[int] = None, kill_timeout: float = 5.0) -> None:
+        self.max_parallel = max_parallel
+        self.kill_timeout = kill_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _terminate(self, process: asyncio.subprocess.Process) -> None:  # pylint: disable=no-member
+        for sig in [signal.SIGTERM, signal.SIGKILL]:
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(process.wait(), self.kill_timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+    async def _pump(self, job: Job, process: asyncio.subprocess.Process) -> None:  # pylint: disable=no-member
+        assert process.stdout is not None
+        translator = PrefixTranslator(job.prefix.encode())
+        while True:
+            data = await process.stdout.read(READ_SIZE)
+            output = translator.translate(data)
+            if output:
+                job.sink(output)
+            if not data:
+                break
+
+    async def run(self, job: Job, check: bool = False) -> int:
+        """Runs a single job, returning its exit status (negative if it was killed by a signal)."""
+        if self._semaphore is None and self.max_parallel is not None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+
+        if self._semaphore is not None:
+            async with self._semaphore:
+                returncode = await self._run(job)
+        else:
+            returncode = await self._run(job)
+
+        if check and returncode:
+            raise Exception(f'Command {job.command[0]} failed with non-zero exit status {returncode}')
+        return returncode
+
+    async def _run(self, job: Job) -> int:
+        process = await asyncio.create_subprocess_exec(*job.command,
+                                                       stdin=asyncio.subprocess.DEVNULL,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.STDOUT,
+                                                       cwd=job.cwd,
+                                                       env=job.env,
+                                                       start_new_session=True)
+        try:
+            await self._pump(job, process)
+            job.returncode = await process.wait()
+        except asyncio.CancelledError:
+            await self._terminate(process)
+            raise
+        return job.returncode
+
+    async def gather(self, jobs: Sequence[Job], check: bool = False) -> List[int]:
+        """
+        Runs all jobs concurrently (bounded by `max_parallel`). If one job fails and `check` is set, all other jobs are
+        cancelled and the failure is propagated.
+        """
+        tasks = [asyncio.ensure_future(self.run(job, check=check)) for job in jobs]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def run_all(self, jobs: Sequence[Job], check: bool = False) -> List[int]:
+        """Synchronous entry point: runs all jobs in a fresh event loop and returns their exit statuses."""
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self._semaphore = None  # semaphores are bound to the loop they are first used in
+        return asyncio.run(self.gather(jobs, check=check))
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
 from argparse import ArgumentParser
+from functools import cached_property
 from typing import TYPE_CHECKING
 
-from cached_property import cached_property
 from vyper import v
 
 from .build_name import BuildName
+from .color import Color
 from .config import Config, Configs
 from .default_linker import DefaultLinker
 from .jobs import Jobs
+from .metrics_dir import MetricsDir
+from .only import Only
 from .preserve_settings import PreserveSettings
+from .rebuild_dependents import RebuildDependents
 from .recipe import Recipes
 from .reference_repositories import ReferenceRepositories
 from .shell import Shell
+from .trace import Trace
 from .until import Until
 from .uri_schemes import UriSchemes
 from .vyper import get, write_default_settings_file
@@ -39,6 +44,11 @@ class _Settings:
     def bind_args(argparse: ArgumentParser) -> None:
         v.bind_args(argparse)
 
+    def reload(self) -> None:
+        """Forgets all setting values read so far, so they are read again (e.g., after the environment changed)"""
+        for name in [name for name in vars(self) if name != "ws_path"]:
+            delattr(self, name)
+
     # cached_property requires self, but pylint does not notice it
     # pylint: disable=no-self-use
 
@@ -46,6 +56,10 @@ class _Settings:
     def build_name(self) -> BuildName:
         return BuildName()
 
+    @cached_property
+    def color(self) -> Color:
+        return Color()
+
     @cached_property
     def config(self) -> Config:
         return Config()
@@ -62,10 +76,22 @@ class _Settings:
     def jobs(self) -> Jobs:
         return Jobs()
 
+    @cached_property
+    def metrics_dir(self) -> MetricsDir:
+        return MetricsDir()
+
+    @cached_property
+    def only(self) -> Only:
+        return Only()
+
     @cached_property
     def preserve_settings(self) -> PreserveSettings:
         return PreserveSettings()
 
+    @cached_property
+    def rebuild_dependents(self) -> RebuildDependents:
+        return RebuildDependents()
+
     @cached_property
     def recipes(self) -> Recipes:
         return Recipes()
@@ -78,6 +104,10 @@ class _Settings:
     def shell(self) -> Shell:
         return Shell()
 
+    @cached_property
+    def trace(self) -> Trace:
+        return Trace()
+
     @cached_property
     def until(self) -> Until:
         return Until()
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING, Optional
 
-from cached_property import cached_property
-
 from .vyper import get
 
 if TYPE_CHECKING:
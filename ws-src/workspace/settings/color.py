@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import sys
+from functools import cached_property
+from typing import TYPE_CHECKING
+
+from .vyper import get
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class Color:
+    """Whether to preserve colored output of child processes (boolean with "auto" resolved)"""
+
+    name = "color"
+    choices = ["auto", "always", "never"]
+
+    def add_kwargument(self,
+                       argparser: ArgumentParser,
+                       help_message: str = "Whether to preserve colored output of child processes") -> None:
+        uppercase_name = self.name.upper().replace("-", "_")
+        argparser.add_argument('--color',
+                               choices=self.choices,
+                               metavar=uppercase_name,
+                               help=f'{help_message} (choices: {", ".join(self.choices)}) (env: WS_{uppercase_name})')
+
+    @cached_property
+    def value(self) -> bool:
+        value = get(self.name)
+        if value is None or value == "auto":
+            return sys.stdout.isatty()
+        if value == "always":
+            return True
+        if value == "never":
+            return False
+        raise Exception(f'value {value} is not valid for setting {self.name}')
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING, List, Optional
 
-from cached_property import cached_property
-
 from .vyper import get
 from .ws_path import ws_path
 
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import multiprocessing
+from functools import cached_property
 from typing import TYPE_CHECKING
 
-from cached_property import cached_property
-
 from .vyper import get
 
 if TYPE_CHECKING:
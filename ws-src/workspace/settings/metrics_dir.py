@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .vyper import get
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class MetricsDir:
+    """Write metrics in the Prometheus textfile format to the given directory (path as string)"""
+
+    name = "metrics-dir"
+
+    def add_kwargument(self,
+                       argparser: ArgumentParser,
+                       help_message: str = "Write metrics for the textfile collector to the given directory") -> None:
+        uppercase_name = self.name.upper().replace("-", "_")
+        argparser.add_argument('--metrics-dir', metavar="DIRECTORY", help=f'{help_message} (env: WS_{uppercase_name})')
+
+    @cached_property
+    def value(self) -> Optional[Path]:
+        value = get(self.name)
+        if value is None or value == "":
+            return None
+        if isinstance(value, str):
+            return Path(value)
+        raise Exception(f'value {value} is not valid for setting {self.name}')
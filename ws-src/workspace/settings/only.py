@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import TYPE_CHECKING, List, Optional
+
+from .vyper import get
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class Only:
+    """Process only the given builds, and the builds they use that were never built successfully (list of strings)"""
+
+    name = "only"
+
+    def add_kwargument(self,
+                       argparser: ArgumentParser,
+                       help_message: str = "Process only the given builds (and unbuilt builds they use)") -> None:
+        uppercase_name = self.name.upper().replace("-", "_")
+        argparser.add_argument('--only',
+                               metavar="BUILD_NAME",
+                               action="append",
+                               help=f'{help_message} (env: WS_{uppercase_name}, comma separated)')
+
+    @cached_property
+    def value(self) -> Optional[List[str]]:
+        value = get(self.name)
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(element, str) for element in value):
+            raise Exception(f'value {value} is not valid for setting {self.name}')
+        return [name for element in value for name in element.split(",") if name]
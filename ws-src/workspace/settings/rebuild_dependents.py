@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import TYPE_CHECKING, List
+
+from .vyper import get
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class RebuildDependents:
+    """Process the given builds together with all builds that use them, directly or indirectly (list of strings)"""
+
+    name = "rebuild-dependents"
+
+    def add_kwargument(self,
+                       argparser: ArgumentParser,
+                       help_message: str = "Process the given builds together with all builds that use them") -> None:
+        uppercase_name = self.name.upper().replace("-", "_")
+        argparser.add_argument('--rebuild-dependents',
+                               metavar="BUILD_NAME",
+                               action="append",
+                               help=f'{help_message} (env: WS_{uppercase_name}, comma separated)')
+
+    @cached_property
+    def value(self) -> List[str]:
+        value = get(self.name)
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(element, str) for element in value):
+            raise Exception(f'value {value} is not valid for setting {self.name}')
+        return [name for element in value for name in element.split(",") if name]
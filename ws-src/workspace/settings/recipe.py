@@ -1,9 +1,8 @@
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING, List
 
-from cached_property import cached_property
-
 import workspace.recipes.all_recipes
 
 from .vyper import get
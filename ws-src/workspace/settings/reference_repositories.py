@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import os
+from functools import cached_property
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional, Union
 
 import toml
-from cached_property import cached_property
 from vyper import v
 
+import workspace.locking as locking
+
 from .vyper import get
 from .ws_path import ws_path
 
@@ -38,12 +41,17 @@ class ReferenceRepositories:
     def update(self, path: Union[str, Path]) -> None:
         if isinstance(path, Path):
             path = str(path.resolve())
-        with open(ws_path / "ws-settings.toml", "r") as file:
-            settings_dict = toml.load(file)
-        if self.name not in settings_dict or settings_dict[self.name] != path:
+        settings_path = ws_path / "ws-settings.toml"
+        with locking.locked(settings_path, "the settings file"):
+            with open(settings_path, "r") as file:
+                settings_dict = toml.load(file)
+            if self.name in settings_dict and settings_dict[self.name] == path:
+                return
             settings_dict[self.name] = path
-            with open(ws_path / "ws-settings.toml", "w") as file:
+            temporary_path = settings_path.with_name(f'{settings_path.name}.tmp')
+            with open(temporary_path, "w") as file:
                 toml.dump(settings_dict, file)
-            v.read_in_config()
-            if "value" in self.__dict__:
-                del self.value
+            os.replace(temporary_path, settings_path)
+        v.read_in_config()
+        if "value" in self.__dict__:
+            del self.value
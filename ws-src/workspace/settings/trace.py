@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from .vyper import get
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class Trace:
+    """Write a trace of the processed recipe phases to the given file (path as string)"""
+
+    name = "trace"
+
+    def add_kwargument(self,
+                       argparser: ArgumentParser,
+                       help_message: str = "Write a timeline of all recipe phases to the given file") -> None:
+        uppercase_name = self.name.upper().replace("-", "_")
+        argparser.add_argument('--trace', metavar="FILE", help=f'{help_message} (env: WS_{uppercase_name})')
+
+    @cached_property
+    def value(self) -> Optional[Path]:
+        value = get(self.name)
+        if value is None or value == "":
+            return None
+        if isinstance(value, str):
+            return Path(value)
+        raise Exception(f'value {value} is not valid for setting {self.name}')
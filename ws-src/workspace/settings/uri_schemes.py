@@ -1,7 +1,6 @@
+from functools import cached_property
 from typing import Dict
 
-from cached_property import cached_property
-
 from .vyper import get
 
 
@@ -1,3 +1,5 @@
+import os
+
 from vyper import v
 
 from .ws_path import ws_path
@@ -12,8 +14,12 @@ preserve-settings = false
 
 
 def write_default_settings_file():
-    with open(ws_path / "ws-settings.toml", "w") as file:
+    # concurrent processes may all find the file missing, so none of them may see it half-written
+    path = ws_path / "ws-settings.toml"
+    temporary_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(temporary_path, "w") as file:
         print(DEFAULT_SETTINGS_FILE, file=file)
+    os.replace(temporary_path, path)
 
 
 v.add_config_path(ws_path)
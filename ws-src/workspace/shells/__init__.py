@@ -1,6 +1,28 @@
+import sys
+
 from .bash import Bash
 from .fish import Fish
 from .shell import Shell
 from .zsh import Zsh
 
-__all__ = ["Bash", "Fish", "Shell", "Zsh"]
+__all__ = ["Bash", "Fish", "Shell", "Zsh", "create_shell"]
+
+
+def create_shell(shell: str) -> Shell:
+    """Creates the shell with the given name (as chosen by the `shell` setting), detecting it for "auto\""""
+    if shell == "auto":
+        import shellingham  # pylint: disable=import-outside-toplevel
+
+        try:
+            shell = shellingham.detect_shell()[0]
+        except shellingham.ShellDetectionFailure:
+            print("Error: Could not auto-detect shell. Please choose the shell explicitly.")
+            sys.exit(1)
+
+    if shell == "bash":
+        return Bash()
+    if shell == "fish":
+        return Fish()
+    if shell == "zsh":
+        return Zsh()
+    raise Exception(f'Unknown shell: "{shell}"')
@@ -1,4 +1,5 @@
 import os
+import shlex
 import tempfile
 
 from .shell import Shell
@@ -9,6 +10,22 @@ class Bash(Shell):
         cd_build_dir = """
 # cd-build-dir
 function cd-build-dir {
+    # fast path: look the build up in the path index, if it is newer than the configuration, the settings and the
+    # workspace sources (otherwise, the slow path checks the source stamp and rewrites the index)
+    if [[ $# -eq 1 && "$1" != -* && -n "${WS_CONFIG:-}" && -z "${WS_UNTIL:-}" ]]; then
+        local index="$WS_HOME/.build/index/$WS_CONFIG.tsv" sources="$WS_HOME/ws-src/workspace"
+        if [[ "$index" -nt "$WS_HOME/ws-config/$WS_CONFIG.toml" && "$index" -nt "$WS_HOME/ws-settings.toml" ]] &&
+           [[ -d "$sources" && -z "$(find "$sources" -name __pycache__ -prune -o -newer "$index" -print -quit)" ]]; then
+            local name key dir
+            while IFS=$'\\t' read -r name key dir; do
+                if [[ "$name" == "$1" && "$key" == build_dir ]]; then
+                    cd "$dir"
+                    return
+                fi
+            done < "$index"
+        fi
+    fi
+
     output=$(build-dir --cd-build-dir "$@")
     exitcode=$?
     if [[ $exitcode -ne 0 ]]; then
@@ -42,3 +59,15 @@ PS1="{self.prompt_prefix}$PS1"
             file.flush()
 
             os.execvpe("bash", ["bash", "--init-file", file.name, "-i"], env)
+
+    def format_set(self, key, value):
+        return f'export {key}={shlex.quote(value)}'
+
+    def format_unset(self, key):
+        return f'unset {key}'
+
+    def format_prepend_path(self, key, value):
+        return f'export {key}={shlex.quote(value)}"${{{key}:+:${key}}}"'
+
+    def format_backup(self, key, backup_key):
+        return f'[[ -n "${{{key}+x}}" ]] && export {backup_key}="${key}"'
@@ -8,6 +8,23 @@ class Fish(Shell):
         cd_build_dir = """
 # cd-build-dir
 function cd-build-dir
+    # fast path: look the build up in the path index, if it is newer than the configuration, the settings and the
+    # workspace sources (otherwise, the slow path checks the source stamp and rewrites the index)
+    if test (count $argv) -eq 1; and not string match -q -- '-*' $argv[1]; and set -q WS_CONFIG; and not set -q WS_UNTIL
+        set -l index "$WS_HOME/.build/index/$WS_CONFIG.tsv"
+        set -l sources "$WS_HOME/ws-src/workspace"
+        if command test "$index" -nt "$WS_HOME/ws-config/$WS_CONFIG.toml" -a "$index" -nt "$WS_HOME/ws-settings.toml"
+            and test -d $sources
+            and test (count (find $sources -name __pycache__ -prune -o -newer $index -print -quit)) -eq 0
+            while read -l --delimiter \\t name key dir
+                if test "$name" = $argv[1] -a "$key" = build_dir
+                    cd $dir
+                    return
+                end
+            end < $index
+        end
+    end
+
     set -l output (build-dir --cd-build-dir $argv)
     set -l exitcode $status
     if test $exitcode -ne 0
@@ -36,3 +53,27 @@ end
 {self.additional_commands}
             """
         ], env)
+
+    @staticmethod
+    def _quote(value):
+        escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+        return f"'{escaped}'"
+
+    def format_set(self, key, value):
+        if key.endswith("PATH"):
+            # fish splits variables ending in PATH into lists
+            return f'set -gx {key} (string split -- : {self._quote(value)})'
+        return f'set -gx {key} {self._quote(value)}'
+
+    def format_unset(self, key):
+        return f'set -e {key}'
+
+    def format_prepend_path(self, key, value):
+        if key.endswith("PATH"):
+            return f'set -gx {key} (string split -- : {self._quote(value)}) ${key}'
+        return (f'if test -n "${key}"; set -gx {key} {self._quote(value + ":")}"${key}"; '
+                f'else; set -gx {key} {self._quote(value)}; end')
+
+    def format_backup(self, key, backup_key):
+        # quoting joins path lists with colons
+        return f'set -q {key}; and set -gx {backup_key} "${key}"'
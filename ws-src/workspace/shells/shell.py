@@ -19,3 +19,22 @@ class Shell(abc.ABC):
     @abc.abstractmethod
     def spawn(self, env):
         raise NotImplementedError
+
+    @abc.abstractmethod
+    def format_set(self, key, value):
+        """Returns a command that exports the environment variable `key` with the given value"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def format_unset(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def format_prepend_path(self, key, value):
+        """Returns a command that prepends `value` to the colon separated path list in `key`, like `env_prepend_path`"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def format_backup(self, key, backup_key):
+        """Returns a command that copies the environment variable `key` to `backup_key`, but only if `key` is set"""
+        raise NotImplementedError
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import re
+import resource
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.recipe import Recipe
+
+SAMPLE_INTERVAL = 0.5  # seconds between two samples
+MAX_SAMPLES = 2000  # when exceeded, every other sample is dropped and the interval is doubled
+
+_COMPILER = re.compile(r"^(cc1|cc1plus|cc1obj|clang|clang\+\+|clang-\d+(\.\d+)*|g?cc|[cg]\+\+|(gcc|g\+\+)-\d+)$")
+
+
+def telemetry_path(workspace: Workspace, recipe: Recipe) -> Path:
+    return workspace.build_dir / "telemetry" / f'{recipe.paths["build_dir"].name}.json'
+
+
+Usage = Tuple[float, int, int]  # (cpu seconds, read bytes, write bytes)
+
+
+def _reaped_usage() -> Usage:
+    """The usage of all children that the current process has waited for, including what they waited for in turn"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (usage.ru_utime + usage.ru_stime, usage.ru_inblock * 512, usage.ru_oublock * 512)
+
+
+def _process_usage(process: Any) -> Tuple[Usage, int, bool]:
+    """The usage of a running process (including the children it has waited for), its RSS and if it is a compiler"""
+    import psutil  # pylint: disable=import-outside-toplevel
+
+    with process.oneshot():
+        cpu_times = process.cpu_times()
+        cpu_seconds = cpu_times.user + cpu_times.system + cpu_times.children_user + cpu_times.children_system
+        try:
+            io_counters = process.io_counters()
+            io_bytes = (io_counters.read_bytes, io_counters.write_bytes)
+        except (psutil.AccessDenied, AttributeError):
+            io_bytes = (0, 0)
+        return ((cpu_seconds, *io_bytes), process.memory_info().rss, bool(_COMPILER.match(process.name())))
+
+
+class _ProcessTree:  # pylint: disable=too-few-public-methods
+    """The descendants of the current process, and the resources they used since the tree was created"""
+    def __init__(self) -> None:
+        import psutil  # pylint: disable=import-outside-toplevel
+
+        self.started = time.monotonic()
+        self._root = psutil.Process()
+        self._baseline = _reaped_usage()
+
+    def sample(self) -> Tuple[Usage, int, int]:
+        """Returns the usage since the tree was created, the current total RSS and the number of running compilers"""
+        import psutil  # pylint: disable=import-outside-toplevel
+
+        # Children that are waited for between the two steps are missed until the next sample. Processes are visited
+        # before their descendants, so the same holds for processes that are waited for by another descendant.
+        totals = [value - baseline for (value, baseline) in zip(_reaped_usage(), self._baseline)]
+        rss = 0
+        compilers = 0
+        for process in self._root.children(recursive=True):
+            try:
+                (process_usage, process_rss, compiler) = _process_usage(process)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            totals = [total + value for (total, value) in zip(totals, process_usage)]
+            rss += process_rss
+            compilers += compiler
+        return ((totals[0], int(totals[1]), int(totals[2])), rss, compilers)
+
+
+class Sampler(threading.Thread):
+    """
+    Periodically samples the resource usage of all descendants of the current process.
+
+    CPU time and I/O bytes are those of the running descendants plus those of all descendants that were waited for, by
+    the current process or by another descendant, so processes that start and exit between two samples (e.g.,
+    compilers) are fully counted. Only descendants that are reparented away (i.e., daemons) are lost once they exit.
+    """
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        super().__init__(name="telemetry", daemon=True)
+        self.interval = interval
+        self.samples: List[List[float]] = []  # [seconds since start, cpu utilisation (in cores), rss, compilers]
+        self.usage: Usage = (0.0, 0, 0)
+        self.peak_rss = 0
+        self.peak_compilers = 0
+
+        self._stop_event = threading.Event()
+        self._tree = _ProcessTree()
+
+    def _sample(self) -> None:
+        (usage, rss, compilers) = self._tree.sample()
+        previous_cpu_seconds = self.usage[0]
+        # a process that is missed (see `_ProcessTree.sample`) must not make the totals go back
+        self.usage = (max(usage[0], self.usage[0]), max(usage[1], self.usage[1]), max(usage[2], self.usage[2]))
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_compilers = max(self.peak_compilers, compilers)
+
+        elapsed = time.monotonic() - self._tree.started
+        interval = elapsed - self.samples[-1][0] if self.samples else elapsed
+        utilisation = (self.usage[0] - previous_cpu_seconds) / interval if interval > 0 else 0.0
+        if len(self.samples) >= MAX_SAMPLES:
+            # drop every other sample, but keep the latest one
+            self.samples = self.samples[1 - len(self.samples) % 2::2]
+            self.interval *= 2
+        self.samples.append([round(elapsed, 3), round(utilisation, 2), rss, compilers])
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        self._sample()
+
+    def result(self) -> Dict[str, Any]:
+        duration = time.monotonic() - self._tree.started
+        rss = [sample[2] for sample in self.samples]
+        (cpu_seconds, read_bytes, write_bytes) = self.usage
+        return {
+            "duration": duration,
+            "cpu_seconds": cpu_seconds,
+            "mean_cpu_utilisation": cpu_seconds / duration if duration > 0 else 0.0,
+            "peak_rss": self.peak_rss,
+            "mean_rss": sum(rss) / len(rss) if rss else 0,
+            "read_bytes": read_bytes,
+            "write_bytes": write_bytes,
+            "peak_compilers": self.peak_compilers,
+            "samples": self.samples,
+        }
+
+
+@contextlib.contextmanager
+def sampling(workspace: Workspace, recipe: Recipe) -> Iterator[Sampler]:
+    """
+    Samples the resource usage of all child processes during the `with` block and stores the result next to the build
+    state of `recipe`.
+    """
+    sampler = Sampler()
+    started = time.time()
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        result = dict(
+            {
+                "recipe": recipe.name,
+                "profile": recipe.profile_name,
+                "digest": recipe.digest_str,
+                "started": started,
+            }, **sampler.result())
+
+        path = telemetry_path(workspace, recipe)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f'{path.name}.tmp')
+        with open(temporary_path, "wt") as file:
+            json.dump(result, file)
+        os.replace(temporary_path, path)
+
+
+def load(workspace: Workspace, recipe: Recipe) -> Optional[Dict[str, Any]]:
+    try:
+        with open(telemetry_path(workspace, recipe), "rt") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if value < 1024:
+            return f'{value:.1f} {unit}'
+        value /= 1024
+    return f'{value:.1f} TiB'
+
+
+def print_summary(workspace: Workspace, recipes: Sequence[Recipe]) -> None:
+    print("Resource usage:")
+    for recipe in recipes:
+        result = load(workspace, recipe)
+        if result is None:
+            continue
+        print(f'{recipe.output_prefix}{result["duration"]:.1f}s, '
+              f'{result["mean_cpu_utilisation"]:.1f} cores on average, '
+              f'peak RSS {_format_bytes(result["peak_rss"])} (mean {_format_bytes(result["mean_rss"])}), '
+              f'read {_format_bytes(result["read_bytes"])}, written {_format_bytes(result["write_bytes"])}, '
+              f'up to {result["peak_compilers"]} compilers')
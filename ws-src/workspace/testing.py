@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Sequence, Tuple, Union
+
+import workspace.locking as locking
+
+if TYPE_CHECKING:
+    from workspace import Workspace
+    from workspace.recipes.recipe import Recipe
+
+# Runs the lit test suites that CMake generates in the build directories (e.g., the system tests in `test` and the unit
+# tests in `unittests` of KLEE and PORSE). The tests of all suites are scheduled together, in an order that is based on
+# the results recorded for earlier runs. They are run in batches of tests of the same suite, each by a single lit
+# process, which reports the result of every test in a JSON file.
+
+_SUITE_DIRS = {"test": "system", "unittests": "unit"}  # directory inside the build directory -> kind of suite
+_SITE_CONFIGS = ["lit.site.cfg", "lit.site.cfg.py"]
+_STAMPED_DIRS = ["bin", "lib", "runtime", "unittests"]  # the build outputs that tests may run
+PASSED = {"PASS", "XFAIL", "UNSUPPORTED"}
+
+_AVAILABLE_TEST = re.compile(r"^  (.+) :: (.+)$")
+
+
+def _hash_file(digest: "hashlib._Hash", path: Path) -> None:
+    try:
+        with open(path, "rb") as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    except (FileNotFoundError, IsADirectoryError):
+        digest.update(b"-")
+
+
+def _stat_tree(digest: "hashlib._Hash", root: Path) -> None:
+    for (directory, directories, files) in os.walk(root):
+        directories[:] = sorted(name for name in directories if name not in ("CMakeFiles", "Output"))
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            digest.update(f'{os.path.relpath(path, root)}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode())
+
+
+class Suite:
+    """A lit test suite in the build directory of `build`, whose tests come from `source_dir`"""
+    def __init__(  # pylint: disable=too-many-arguments
+            self, build: Recipe, kind: str, exec_dir: Path, source_dir: Path, lit: Path) -> None:
+        self.build = build
+        self.kind = kind
+        self.exec_dir = exec_dir
+        self.source_dir = source_dir
+        self.lit = lit
+
+    @property
+    def name(self) -> str:
+        return f'{self.build.name} {self.kind}'
+
+    def stamp(self) -> str:
+        """Changes whenever the build (and with it, anything the tests may run) or the lit configuration changes"""
+        digest = hashlib.sha256(self.build.digest_str.encode())
+        for name in _STAMPED_DIRS:
+            digest.update(f'{name}\n'.encode())
+            _stat_tree(digest, self.build.paths["build_dir"] / name)
+        for path in [self.exec_dir / name for name in _SITE_CONFIGS] + [self.source_dir / "lit.cfg"]:
+            _hash_file(digest, path)
+        return digest.hexdigest()
+
+    def tests(self, env: Mapping[str, str]) -> List[Test]:
+        result = subprocess.run([self.lit, "--show-tests", self.exec_dir],
+                                env=env,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                check=False)
+        output = result.stdout.decode(errors="replace")
+        if result.returncode != 0:
+            raise Exception(f'[{self.name}] Cannot list the tests:\n{output}')
+        (_, _, available) = output.partition("-- Available Tests --\n")
+        return [Test(self, match.group(2)) for match in map(_AVAILABLE_TEST.match, available.splitlines()) if match]
+
+    def build_unit_tests(self, env: Mapping[str, str], jobs: int) -> None:
+        """Builds the unit test executables, which CMake excludes from the default target"""
+        build_dir = self.build.paths["build_dir"]
+        result = subprocess.run(["ninja", "-C", build_dir, "-t", "targets", "all"],
+                                env=env,
+                                stdout=subprocess.PIPE,
+                                check=True)
+        prefix = f'{self.exec_dir.relative_to(build_dir)}/'
+        targets = []
+        for line in result.stdout.decode(errors="replace").splitlines():
+            (target, _, rule) = line.partition(": ")
+            if target.startswith(prefix) and "EXECUTABLE_LINKER" in rule:
+                targets.append(target)
+        if targets:
+            command: List[Union[str, Path]] = ["ninja", "-C", build_dir, f'-j{jobs}', *targets]
+            subprocess.run(command, env=env, check=True)
+
+
+class Test:
+    def __init__(self, suite: Suite, name: str) -> None:
+        self.suite = suite
+        self.name = name
+
+    @property
+    def id(self) -> str:  # pylint: disable=invalid-name
+        return f'{self.suite.name} :: {self.name}'
+
+    @property
+    def key(self) -> str:
+        return f'{self.suite.kind} :: {self.name}'
+
+    def inputs_digest(self, suite_stamp: str) -> str:
+        """Changes whenever the suite stamp, the test file or the local lit configuration next to it change"""
+        digest = hashlib.sha256(suite_stamp.encode())
+        if self.suite.kind != "unit":  # unit tests are part of the executables, which are covered by the stamp
+            source = self.suite.source_dir / self.name
+            _hash_file(digest, source)
+            _hash_file(digest, source.parent / "lit.local.cfg")
+            if (source.parent / "Inputs").is_dir():
+                _stat_tree(digest, source.parent / "Inputs")
+        return digest.hexdigest()
+
+
+class Result:  # pylint: disable=too-few-public-methods
+    def __init__(self, status: str, seconds: float, output: str) -> None:
+        self.status = status
+        self.seconds = seconds
+        self.output = output
+
+    @property
+    def passed(self) -> bool:
+        return self.status in PASSED
+
+
+class Batch:  # pylint: disable=too-few-public-methods
+    """Tests of the same suite that are run by a single lit process, one after the other"""
+    def __init__(self, suite: Suite) -> None:
+        self.suite = suite
+        self.tests: List[Test] = []
+
+    def run(self, env: Mapping[str, str]) -> List[Tuple[Test, Result]]:
+        started = time.monotonic()
+        (reported, output) = self._run_lit(env)
+        seconds = time.monotonic() - started
+
+        results: List[Tuple[Test, Result]] = []
+        for test in self.tests:
+            entry = reported.get(test.name)
+            if entry is None:  # the output of lit as a whole is all there is to tell why
+                results.append((test, Result("UNRESOLVED", seconds / len(self.tests), output)))
+                continue
+            status = entry.get("code") or "UNRESOLVED"
+            results.append((test, Result(status, float(entry.get("elapsed") or 0.0), entry.get("output") or "")))
+        return results
+
+    def _run_lit(self, env: Mapping[str, str]) -> Tuple[Dict[str, Dict[str, Any]], str]:
+        """Returns the entries of the lit report by test name, and the output of lit"""
+        with tempfile.TemporaryDirectory(prefix="ws-lit-") as directory:
+            report_path = Path(directory) / "report.json"
+            command: List[Union[str, Path]] = [self.suite.lit, "-v", "-j1", "-o", report_path]
+            command += [self.suite.exec_dir / test.name for test in self.tests]
+            result = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+            reported: Dict[str, Dict[str, Any]] = {}
+            try:
+                with open(report_path, "rt") as file:
+                    for entry in json.load(file)["tests"]:
+                        (_, _, name) = entry["name"].partition(" :: ")
+                        reported[name] = entry
+            except (FileNotFoundError, KeyError, TypeError, ValueError):
+                pass  # lit failed before writing the report, so every test is unresolved
+        return (reported, result.stdout.decode(errors="replace"))
+
+
+def discover(workspace: Workspace, builds: Iterable[Recipe]) -> List[Suite]:
+    """Returns the lit test suites of the given builds, which must have been built"""
+    suites: List[Suite] = []
+    for build in builds:
+        build_dir = build.paths["build_dir"]
+        source_dir = build.paths["cmake_src_dir"] if "cmake_src_dir" in build.paths else build.paths["src_dir"]
+        for (directory, kind) in _SUITE_DIRS.items():
+            if not any((build_dir / directory / name).is_file() for name in _SITE_CONFIGS):
+                continue
+            lit = [upstream.paths["llvm-lit"] for upstream in workspace.graph.upstream([build.name])
+                   if "llvm-lit" in upstream.paths]
+            if not lit:
+                raise Exception(f'[{build.name}] Cannot run the tests, as the build does not use an LLVM build')
+            suites.append(Suite(build, kind, build_dir / directory, source_dir / directory, lit[-1]))
+    return suites
+
+
+def shard(tests: Sequence[Test], num_shards: int, run_shard: int) -> List[Test]:
+    """Returns the tests of the shard `run_shard` (counting from 1), which is the same on every machine"""
+    return [test for (i, test) in enumerate(sorted(tests, key=lambda test: test.id)) if i % num_shards == run_shard - 1]
+
+
+class History:
+    """The results of the tests of one build directory, as recorded by earlier runs"""
+    def __init__(self, workspace: Workspace, build: Recipe) -> None:
+        self.path = workspace.build_dir / "tests" / f'{build.paths["build_dir"].name}.json'
+        self.records: Dict[str, Dict] = {}
+        try:
+            with open(self.path, "rt") as file:
+                self.records = json.load(file)["tests"]
+        except (FileNotFoundError, KeyError, TypeError, ValueError):
+            pass  # missing or damaged
+        self._updates: Dict[str, Dict] = {}
+
+    def unchanged(self, test: Test, inputs: str) -> bool:
+        """Whether the test passed when it was last run, with the same inputs"""
+        record = self.records.get(test.key)
+        return record is not None and record.get("inputs") == inputs and record.get("status") in PASSED
+
+    def priority(self, test: Test) -> Tuple[int, float, str]:
+        """Sorts failed tests first, followed by the slowest ones (tests that were never run count as the slowest)"""
+        record = self.records.get(test.key)
+        if record is None:
+            return (0, float("-inf"), test.id)
+        return (0 if record.get("status") not in PASSED else 1, -float(record.get("seconds", 0.0)), test.id)
+
+    def record(self, test: Test, inputs: str, result: Result) -> None:
+        self._updates[test.key] = {"inputs": inputs, "status": result.status, "seconds": round(result.seconds, 3)}
+
+    def save(self) -> None:
+        if not self._updates:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with locking.locked(self.path, f'the test results of {self.path.stem}'):
+            records: Dict[str, Dict] = {}
+            try:
+                with open(self.path, "rt") as file:
+                    records = json.load(file)["tests"]
+            except (FileNotFoundError, KeyError, TypeError, ValueError):
+                pass
+            records.update(self._updates)
+            temporary_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+            with open(temporary_path, "wt") as file:
+                json.dump({"tests": records}, file)
+            os.replace(temporary_path, self.path)
+        self.records.update(self._updates)
+        self._updates = {}
+
+
+def order(tests: Sequence[Test], histories: Mapping[str, History]) -> List[Test]:
+    def priority(test: Test) -> Tuple[int, float, str]:
+        return histories[test.suite.build.name].priority(test)
+
+    return sorted(tests, key=priority)
+
+
+def batch(tests: Sequence[Test], jobs: int) -> List[Batch]:
+    """
+    Deals the (ordered) tests of every suite out to `jobs` batches, so that the slow tests are spread across the
+    batches. The batches are ordered by their first test, and run their tests in the given order.
+    """
+    batches: Dict[Tuple[str, int], Batch] = {}
+    dealt: Dict[str, int] = {}
+    for test in tests:
+        count = dealt.get(test.suite.name, 0)
+        dealt[test.suite.name] = count + 1
+        key = (test.suite.name, count % jobs)
+        if key not in batches:
+            batches[key] = Batch(test.suite)
+        batches[key].tests.append(test)
+    return list(batches.values())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from workspace.recipes.irecipe import IRecipe
+
+
+class _Trace:  # pylint: disable=too-few-public-methods
+    """The events collected so far, in the Chrome trace event format (as understood by Perfetto and chrome://tracing)"""
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.thread_names: Dict[int, str] = {}
+
+
+_TRACE: Optional[_Trace] = None
+_STATE = threading.local()  # the stack of open spans is tracked per thread
+
+
+def _now() -> float:
+    return time.monotonic_ns() / 1000  # trace events use microseconds
+
+
+def enabled() -> bool:
+    return _TRACE is not None
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "workspace", **args: Any) -> Iterator[None]:
+    """
+    Records the duration of the `with` block as a complete ("X") event. Spans nest by time on the same thread. The
+    arguments of the enclosing span (e.g., the digest and profile of the recipe being processed) are inherited.
+    """
+    trace = _TRACE
+    if trace is None:
+        yield
+        return
+
+    stack: List[Dict[str, Any]] = getattr(_STATE, "stack", [])
+    _STATE.stack = stack
+    args = dict(stack[-1] if stack else {}, **{key: str(value) for (key, value) in args.items()})
+    stack.append(args)
+    start = _now()
+    try:
+        yield
+    finally:
+        duration = _now() - start
+        stack.pop()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start,
+            "dur": duration,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with trace.lock:
+            trace.events.append(event)
+            trace.thread_names.setdefault(threading.get_ident(), threading.current_thread().name)
+
+
+def recipe_span(recipe: IRecipe, phase: str) -> ContextManager[None]:
+    """A span for one phase (e.g., setup or build) of a recipe, annotated with the recipe's digest and profile"""
+    args = {"recipe": recipe.name, "profile": recipe.profile_name}
+    if hasattr(recipe, "digest_str"):
+        args["digest"] = getattr(recipe, "digest_str")
+    return span(f'{recipe.name} {phase}', category="recipe", **args)
+
+
+def _write(trace: _Trace, path: Path) -> None:
+    events = list(trace.events)
+    events += [{
+        "name": "process_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "args": {
+            "name": "ws"
+        },
+    }]
+    events += [{
+        "name": "thread_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": {
+            "name": name
+        },
+    } for (tid, name) in trace.thread_names.items()]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f'{path.name}.tmp')
+    with open(temporary_path, "wt") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    os.replace(temporary_path, path)
+
+
+@contextlib.contextmanager
+def tracing(path: Optional[Path]) -> Iterator[None]:
+    """
+    Collects spans during the `with` block and writes them to `path` afterwards (even if the block fails). Does nothing
+    if `path` is `None`.
+    """
+    global _TRACE  # pylint: disable=global-statement
+
+    if path is None or _TRACE is not None:
+        yield
+        return
+
+    _TRACE = _Trace()
+    try:
+        yield
+    finally:
+        trace, _TRACE = _TRACE, None
+        _write(trace, path)
@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import concurrent.futures
+import fcntl
 import os
 import pty
+import re
+import subprocess
 import sys
 import tty
 from pathlib import Path
-from typing import Mapping, MutableMapping, Optional, Sequence, Union
+from typing import TYPE_CHECKING, Callable, Iterable, List, Mapping, MutableMapping, Optional, Sequence, TypeVar, Union
+
+if TYPE_CHECKING:
+    from workspace.build_logs import BuildLog
+
+READ_SIZE = 1 << 16
+PIPE_SIZE = 1 << 20
+_F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)  # only exposed by python >= 3.10
+_ANSI_ESCAPE_SEQUENCE = re.compile(rb"\x1b\[[0-9;?]*[A-Za-z]")
+_INCOMPLETE_ANSI_ESCAPE_SEQUENCE = re.compile(rb"\x1b(\[[0-9;?]*)?$")
+
+_Item = TypeVar("_Item")
+_Result = TypeVar("_Result")
 
 
 def newer_than(target: Path, others: Sequence[Path]) -> bool:
@@ -25,6 +41,29 @@ def env_prepend_path(env: MutableMapping[str, str], key: str, path: Union[Path,
     return env
 
 
+def run_parallel(function: Callable[[_Item], _Result],
+                 items: Iterable[_Item],
+                 jobs: int,
+                 done: Callable[[_Item, _Result], None],
+                 cancel: Optional[Callable[[], None]] = None) -> None:
+    """
+    Calls `function` on all items in `jobs` threads, and `done` (in the calling thread) with every item and its result
+    as soon as it is done. If a call or `done` raises (e.g., on a KeyboardInterrupt), the calls that did not start yet
+    are cancelled, as is any work that the running calls started (by calling `cancel`), before the exception is raised.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(function, item): item for item in items}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                done(futures[future], future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()  # only waits for the calls that are already running
+            if cancel is not None:
+                cancel()
+            raise
+
+
 def _terminal_set_raw_input() -> Optional[int]:
     """
     Sets the terminal to raw input mode. Returns the old mode.
@@ -58,90 +97,106 @@ def _terminal_restore_input(old_mode: Optional[int]) -> None:
         tty.tcsetattr(stdin, tty.TCSAFLUSH, old_mode)  # type: ignore
 
 
-def run_with_prefix(  # pylint: disable=too-many-locals,too-many-statements
-        command: Union[Sequence[Union[str, Path]], Union[str, Path]],
-        prefix: str,
-        cwd: Optional[Path] = None,
-        env: Optional[Mapping[str, str]] = None,
-        check: bool = False) -> None:
+class PrefixTranslator:  # pylint: disable=too-few-public-methods
     """
-    Runs a command (similar to `subprocess.run`) attached to a new pty, prefixing every line in the output with
-    `prefix`.
+    Translates raw terminal output into output where every line is prefixed with a given prefix.
+
+    In addition to copying over the user content, we perform a very basic kind of terminal emulation:
+    - Any occurence of the "terminal newline" `b"\r\n"` is reduced (back) to `b"\n"`.
+    - At the beginning of a new line and after returning the cursor to the beginning of a line with `b"\r"`, the
+      prefix is printed
+
+    The data is processed block-wise with `bytes.replace`/`bytes.split`/`bytes.join`, so that no Python code has to
+    run per byte of output.
     """
+    def __init__(self, prefix: bytes):
+        self._prefix = prefix
+        self._newline_prefix = b"\n" + prefix
+        self._carriage_return_prefix = b"\r" + prefix
+        self._start_of_line: bool = True  # denotes whether we start at the beginning of a line
+        self._owed_carriage_return: bool = False  # `True` iff the previous block omitted printing a final b"\r"
+
+    def translate(self, data: bytes) -> bytes:
+        """Translates the next block of output. An empty block denotes the end of the output."""
+        if not data:  # EoF
+            if self._owed_carriage_return:
+                self._owed_carriage_return = False
+                return b"\r"
+            return b""
+
+        head = b""
+        if self._owed_carriage_return:
+            self._owed_carriage_return = False
+            if data[0] != 0x0A:
+                head = self._carriage_return_prefix
+            # else (b"\r\n") drop the carriage return
+        elif self._start_of_line:
+            self._start_of_line = False
+            head = self._prefix
+
+        # a final b"\r" may be the first half of a b"\r\n" that is split across blocks
+        if data[-1] == 0x0D:
+            self._owed_carriage_return = True
+            data = data[:-1]
+        data = data.replace(b"\r\n", b"\n")
+
+        # every line break gets followed by the prefix, unless it is the very last byte of the output seen so far
+        tail = b""
+        if not self._owed_carriage_return and data[-1:] == b"\n":
+            self._start_of_line = True
+            data = data[:-1]
+            tail = b"\n"
+
+        if b"\r" in data:
+            lines = [self._carriage_return_prefix.join(line.split(b"\r")) for line in data.split(b"\n")]
+        else:
+            lines = data.split(b"\n")
+        return b"".join((head, self._newline_prefix.join(lines), tail))
+
+
+class EscapeSequenceStripper:  # pylint: disable=too-few-public-methods
+    """
+    Strips ANSI escape sequences from output that arrives block-wise. An escape sequence that is split across blocks is
+    held back until its remainder arrives.
+    """
+    def __init__(self) -> None:
+        self._pending = b""
+
+    def strip(self, data: bytes, final: bool = False) -> bytes:
+        """Strips the next block. With `final`, anything held back is returned as well."""
+        data = self._pending + data
+        self._pending = b""
+        if not final:
+            match = _INCOMPLETE_ANSI_ESCAPE_SEQUENCE.search(data)
+            if match is not None:
+                (data, self._pending) = (data[:match.start()], data[match.start():])
+        return _ANSI_ESCAPE_SEQUENCE.sub(b"", data)
+
+
+def _exit_code(status: int) -> int:
+    """Like `os.waitstatus_to_exitcode` (only available with python >= 3.9), negative if killed by a signal"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
 
+def _normalize_command(command: Union[Sequence[Union[str, Path]], Union[str, Path]]) -> List[str]:
     if isinstance(command, Path):
-        command = [str(command)]
-    elif isinstance(command, str):
-        command = [command]
-    else:
-        assert isinstance(command, list)
-        command = [str(arg) for arg in command]
+        return [str(command)]
+    if isinstance(command, str):
+        return [command]
     assert isinstance(command, list)
+    return [str(arg) for arg in command]
 
-    start_of_line: bool = True  # denotes whether we start at the beginning of a line
-    owed_carriage_return: bool = False  # `True` iff the previously read block omitted printing a final b'\r'
-    prefix_bytes: bytes = prefix.encode()
-
-    def read(fd):  # pylint: disable=too-many-branches
-        """
-        This function is called repeatedly whenever the pty fd becomes ready to be read from.
-
-        In addition to copying over the user content, we perform a very basic kind of terminal emulation:
-        - Any occurence of the "terminal newline" `b"\r\n"` is reduced (back) to `b"\n"`.
-        - At the beginning of a new line and after returning the cursor to the beginning of a line with `b"\r"`, the
-          prefix is printed
-        """
-        nonlocal start_of_line, owed_carriage_return, prefix_bytes
-
-        data = os.read(fd, 1024)
-
-        output = bytes()
-        if data:
-            if owed_carriage_return:
-                owed_carriage_return = False
-                if data[0] != 0x0A:
-                    output += b"\r"
-                    output += prefix_bytes
-                # else (b"\r\n") drop the carriage return
-            elif start_of_line:
-                start_of_line = False
-                output += prefix_bytes
-        else:  # EoF
-            if owed_carriage_return:
-                owed_carriage_return = False
-                output += b"\r"
-
-        j = 0
-        for (i, byte) in enumerate(data):
-            byte = data[i]
-            if byte == 0x0A:  # \n
-                output += data[j:i + 1]
-                j = i + 1
-                if i + 1 < len(data):
-                    output += prefix_bytes
-                else:
-                    start_of_line = True
-            elif byte == 0x0D:  # \r
-                if i + 1 < len(data):
-                    if data[i + 1] == 0x0A:  # \r\n
-                        output += data[j:i]
-                        j = i + 1
-                    else:
-                        output += data[j:i + 1]
-                        output += prefix_bytes
-                        j = i + 1
-                else:
-                    owed_carriage_return = True
-                    output += data[j:i]
-                    j = i + 1
-
-        output += data[j:]
-
-        return output
-
-    # flush, as we will use raw IO during the call
-    sys.stdout.flush()
-    sys.stderr.flush()
+
+def _run_with_prefix_pty(command: List[str], translator: PrefixTranslator, cwd: Optional[Path],
+                         env: Optional[Mapping[str, str]], log: Optional[BuildLog]) -> int:
+    def read(fd):
+        """This function is called repeatedly whenever the pty fd becomes ready to be read from."""
+        data = os.read(fd, READ_SIZE)
+        if log is not None:
+            log.write(data)
+        return translator.translate(data)
 
     pid, fd = pty.fork()
     if pid == pty.CHILD:
@@ -151,13 +206,86 @@ def run_with_prefix(  # pylint: disable=too-many-locals,too-many-statements
 
     mode = _terminal_set_raw_input()
     try:
-        pty._copy(fd, read, lambda fd: os.read(fd, 1024))  # type: ignore  # pylint: disable=protected-access
+        pty._copy(fd, read, lambda fd: os.read(fd, READ_SIZE))  # type: ignore  # pylint: disable=protected-access
     except OSError:
         pass
 
     _terminal_restore_input(mode)
     os.close(fd)
 
-    status = os.waitpid(pid, 0)[1]
+    return _exit_code(os.waitpid(pid, 0)[1])
+
+
+def _run_with_prefix_pipe(  # pylint: disable=too-many-arguments
+        command: List[str], translator: PrefixTranslator, cwd: Optional[Path], env: Optional[Mapping[str, str]],
+        color: bool, log: Optional[BuildLog]) -> int:
+    if color:
+        # children that write to a pipe only keep their colors if forced to (compilers get -fdiagnostics-color anyway)
+        env = dict(env if env is not None else os.environ, CLICOLOR_FORCE="1")
+    with subprocess.Popen(command,
+                          bufsize=0,
+                          stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT,
+                          cwd=cwd,
+                          env=env) as process:
+        assert process.stdout is not None
+        fd = process.stdout.fileno()
+        try:
+            fcntl.fcntl(fd, _F_SETPIPE_SZ, PIPE_SIZE)
+        except OSError:
+            pass  # e.g., above /proc/sys/fs/pipe-max-size - the default size works as well
+
+        sink = sys.stdout.buffer
+        stripper = EscapeSequenceStripper()
+        while True:
+            data = os.read(fd, READ_SIZE)
+            if log is not None:
+                log.write(data)
+            output = translator.translate(data)
+            if not color:
+                output = stripper.strip(output, final=not data)
+            sink.write(output)
+            if not data:
+                break
+        sink.flush()
+
+        return process.wait()
+
+
+def run_with_prefix(
+        command: Union[Sequence[Union[str, Path]], Union[str, Path]],
+        prefix: str,
+        cwd: Optional[Path] = None,
+        env: Optional[Mapping[str, str]] = None,
+        check: bool = False) -> None:
+    """
+    Runs a command (similar to `subprocess.run`), prefixing every line in the output with `prefix`.
+
+    If stdout is a terminal, the command is attached to a new pty. Otherwise (e.g., in CI or when the output is
+    redirected to a file), plain pipes are used and escape sequences are stripped unless the `color` setting asks for
+    them to be preserved.
+    """
+    from workspace.build_logs import active  # pylint: disable=import-outside-toplevel
+    from workspace.settings import settings  # pylint: disable=import-outside-toplevel
+
+    command = _normalize_command(command)
+    translator = PrefixTranslator(prefix.encode())
+
+    log = active()
+    if log is not None:
+        log.step(command)
+
+    # flush, as we will write to the underlying file descriptors directly during the call
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    if sys.stdout.isatty():
+        status = _run_with_prefix_pty(command, translator, cwd, env, log)
+    else:
+        status = _run_with_prefix_pipe(command, translator, cwd, env, settings.color.value, log)
+
+    if log is not None and status:
+        log.command_failed(command, status)
     if check and status:
         raise Exception(f'Command {command[0]} failed with non-zero exit status {status}')
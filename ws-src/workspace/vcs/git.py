@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 import abc
+import contextlib
 import os
 import re
 import shutil
 import subprocess
 import sys
 from pathlib import Path, PurePosixPath
-from typing import TYPE_CHECKING, List, Optional, Sequence, Union
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Set, Union
 
 import schema
 
+import workspace.locking as locking
+import workspace.tracing as tracing
 from workspace.recipes.irecipe import IRecipe
 from workspace.settings import settings
 
@@ -38,19 +41,20 @@ def add_exclude_path(path: Union[Path, PurePosixPath, str]) -> None:
 
     git_exclude_path = git_info_dir / "exclude"
 
-    has_line_end = True  # empty file
-    if git_exclude_path.is_file():
-        with open(git_exclude_path, "rt") as file:
-            lines = file.read()
-            has_line_end = (not lines or lines[-1] == "\n")
-            for line in lines.splitlines():
-                if line == f'/{path}':
-                    return  # path already excluded
+    with locking.locked(git_exclude_path, "the git exclude file"):
+        has_line_end = True  # empty file
+        if git_exclude_path.is_file():
+            with open(git_exclude_path, "rt") as file:
+                lines = file.read()
+                has_line_end = (not lines or lines[-1] == "\n")
+                for line in lines.splitlines():
+                    if line == f'/{path}':
+                        return  # path already excluded
 
-    with open(git_info_dir / "exclude", "at") as file:
-        if not has_line_end:
-            file.write("\n")
-        file.write(f'/{path}\n')
+        with open(git_exclude_path, "at") as file:
+            if not has_line_end:
+                file.write("\n")
+            file.write(f'/{path}\n')
 
 
 def remove_exclude_path(path: Union[Path, PurePosixPath, str]) -> None:
@@ -62,16 +66,72 @@ def remove_exclude_path(path: Union[Path, PurePosixPath, str]) -> None:
     if not git_exclude_path.is_file():
         return  # nothing to un-exclude
 
-    lines = ""
-    with open(git_exclude_path, "rt") as file:
-        for line in file.read().splitlines():
-            if line != f'/{path}':
-                lines += f'{line}\n'
-    with open(git_exclude_path, "wt") as file:
-        file.write(lines)
+    with locking.locked(git_exclude_path, "the git exclude file"):
+        lines = ""
+        with open(git_exclude_path, "rt") as file:
+            for line in file.read().splitlines():
+                if line != f'/{path}':
+                    lines += f'{line}\n'
+        with open(git_exclude_path, "wt") as file:
+            file.write(lines)
+
+
+def _indexed_file_ids(path: Path) -> Dict[str, str]:
+    """The identifiers of the files below `path` as recorded in the git index"""
+    file_ids: Dict[str, str] = {}
+    index = subprocess.run(["git", "ls-files", "-s", "-z"], cwd=path, capture_output=True, check=True)
+    for entry in index.stdout.split(b"\0"):
+        if not entry:
+            continue
+        info, name = entry.split(b"\t", 1)
+        mode, blob, _ = info.split(b" ")
+        file_ids[os.fsdecode(name)] = f'{mode.decode()}:{blob.decode()}'
+    return file_ids
+
+
+def _dirty_file_ids(path: Path, file_ids: Dict[str, str]) -> None:
+    """Updates `file_ids` with the files below `path` that are modified, untracked or deleted in the work tree"""
+    dirty = subprocess.run(["git", "ls-files", "-m", "-o", "--exclude-standard", "-z"],
+                           cwd=path,
+                           capture_output=True,
+                           check=True)
+    dirty_files: List[str] = []
+    for name in dirty.stdout.split(b"\0"):
+        if not name:
+            continue
+        decoded = os.fsdecode(name)
+        if os.path.lexists(path / decoded):
+            dirty_files.append(decoded)
+        else:
+            file_ids.pop(decoded, None)  # deleted in the work tree
+
+    if dirty_files:
+        hashes = subprocess.run(["git", "hash-object", "--no-filters", "--stdin-paths"],
+                                cwd=path,
+                                input="\n".join(dirty_files).encode(),
+                                capture_output=True,
+                                check=True)
+        for dirty_file, object_id in zip(dirty_files, hashes.stdout.decode().split()):
+            file_mode = os.lstat(path / dirty_file).st_mode
+            file_ids[dirty_file] = f'{file_mode:o}:{object_id}'
 
 
-def _check_create_ref_dir() -> None:
+def get_file_ids(path: Path) -> Optional[Dict[str, str]]:
+    """
+    Returns a mapping from every file below `path` (relative to `path`) to an identifier of its content, or `None` if
+    `path` is not part of a git work tree. Unmodified files are identified by their blob id from the git index, so only
+    files that git considers modified or untracked are actually read.
+    """
+    result = subprocess.run(["git", "rev-parse", "--is-inside-work-tree"], cwd=path, capture_output=True, check=False)
+    if result.returncode != 0 or result.stdout.strip() != b"true":
+        return None
+
+    file_ids = _indexed_file_ids(path)
+    _dirty_file_ids(path, file_ids)
+    return file_ids
+
+
+def check_create_ref_dir() -> None:
     reference_repositories = settings.reference_repositories.value
     if reference_repositories is None:
         default_path = Path.home() / '.cache' / 'reference-repos'
@@ -90,6 +150,63 @@ def _check_create_ref_dir() -> None:
         os.makedirs(reference_repositories.resolve(), exist_ok=True)
 
 
+_REFRESHED: Set[Path] = set()  # the reference repositories that were brought up to date by `refresh_references`
+
+
+def make_ref_path(git_path: str) -> Path:
+    name = re.sub("^https://|^ssh://([^/]+@)?|^[^/]+@", "", git_path)
+    name = re.sub("\\.git$", "", name)
+    name = re.sub(":", "/", name)
+    reference_repositories = settings.reference_repositories.value
+    assert reference_repositories is not None  # set by `check_create_ref_dir`
+    return reference_repositories / "v1" / name
+
+
+def refresh_references(repositories: Mapping[str, str]) -> None:
+    """
+    Brings the reference repositories of the given repositories (mapped to the prefix of their output) up to date, or
+    creates them. The git commands for all repositories run at the same time, and `reference_clone` does not fetch the
+    reference repositories again.
+    """
+    if not repositories:
+        return
+    from workspace.runner import AsyncRunner, Job  # pylint: disable=import-outside-toplevel
+
+    check_create_ref_dir()
+    ref_paths = {make_ref_path(repo_uri): repo_uri for repo_uri in repositories}
+    runner = AsyncRunner(max_parallel=settings.jobs.value)
+    git = ["git", "-c", f'pack.threads={settings.jobs.value}']
+
+    def job(ref_path: Path, command: Sequence[Union[str, Path]], cwd: Optional[Path] = None) -> Job:
+        return Job(command, prefix=repositories[ref_paths[ref_path]], cwd=cwd)
+
+    with contextlib.ExitStack() as stack:
+        # always locked in the same order, so that processes that refresh several of them cannot deadlock
+        for ref_path in sorted(ref_paths):
+            stack.enter_context(locking.locked(ref_path, f'the reference repository of {ref_paths[ref_path]}'))
+
+        with tracing.span("git refresh references", "git", repositories=len(ref_paths)):
+            existing = [ref_path for ref_path in ref_paths if ref_path.is_dir()]
+            checks = runner.run_all([job(ref_path, ["git", "fsck", "--root", "--no-full"], ref_path)
+                                     for ref_path in existing])
+            valid = [ref_path for (ref_path, returncode) in zip(existing, checks) if returncode == 0]
+            missing = [ref_path for ref_path in ref_paths if ref_path not in valid]
+            for ref_path in missing:
+                if ref_path.is_dir():
+                    print(f"Directory is not a valid git repository ('{ref_path}'), deleting and performing a fresh "
+                          "clone..",
+                          file=sys.stderr)
+                    shutil.rmtree(ref_path)
+                os.makedirs(ref_path, exist_ok=True)
+
+            runner.run_all([job(ref_path, git + ["remote", "update", "--prune"], ref_path) for ref_path in valid] +
+                           [job(ref_path, git + ["clone", "--mirror", ref_paths[ref_path], str(ref_path)])
+                            for ref_path in missing],
+                           check=True)
+            runner.run_all([job(ref_path, git + ["gc", "--aggressive"], ref_path) for ref_path in missing], check=True)
+    _REFRESHED.update(ref_paths)
+
+
 def reference_clone(  # pylint: disable=too-many-arguments
         repo_uri: str,
         target_path: Path,
@@ -98,13 +215,7 @@ def reference_clone(  # pylint: disable=too-many-arguments
         sparse: Optional[Sequence[str]] = None,
         clone_args: Optional[Sequence[str]] = None) -> None:
 
-    _check_create_ref_dir()
-
-    def make_ref_path(git_path: str) -> Path:
-        name = re.sub("^https://|^ssh://([^/]+@)?|^[^/]+@", "", git_path)
-        name = re.sub("\\.git$", "", name)
-        name = re.sub(":", "/", name)
-        return settings.reference_repositories.value / "v1" / name
+    check_create_ref_dir()
 
     def check_ref_dir(ref_dir: Path) -> bool:
         if not ref_dir.is_dir():
@@ -114,33 +225,42 @@ def reference_clone(  # pylint: disable=too-many-arguments
 
     ref_path = make_ref_path(repo_uri)
 
-    if check_ref_dir(ref_path):
-        subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "remote", "update", "--prune"],
-                       cwd=ref_path,
-                       check=True)
-    else:
-        if ref_path.is_dir():
-            print(f"Directory is not a valid git repository ('{ref_path}'), deleting and performing a fresh clone..",
-                  file=sys.stderr)
-            shutil.rmtree(ref_path)
-        os.makedirs(ref_path, exist_ok=True)
-        subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "clone", "--mirror", repo_uri, ref_path],
-                       check=True)
-        subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "gc", "--aggressive"],
-                       cwd=ref_path,
-                       check=True)
-
-    clone_command: List[Union[str, Path]] = [
-        "git", "-c", f'pack.threads={settings.jobs.value}', "clone", "--reference", ref_path, repo_uri, target_path
-    ]
-    if branch:
-        clone_command += ["--branch", branch]
-    if not checkout or sparse is not None:
-        clone_command += ["--no-checkout"]
-    clone_command += settings.x_git_clone.value
-    if clone_args:
-        clone_command += clone_args
-    subprocess.run(clone_command, check=True)
+    # the reference repository may be shared with other workspaces, and must not change while it is cloned from
+    with locking.locked(ref_path, f'the reference repository of {repo_uri}'):
+        if ref_path in _REFRESHED:
+            pass  # fetched by `refresh_references` already
+        elif check_ref_dir(ref_path):
+            with tracing.span("git fetch reference", "git", repository=repo_uri):
+                subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "remote", "update", "--prune"],
+                               cwd=ref_path,
+                               check=True)
+        else:
+            if ref_path.is_dir():
+                print(
+                    f"Directory is not a valid git repository ('{ref_path}'), deleting and performing a fresh clone..",
+                    file=sys.stderr)
+                shutil.rmtree(ref_path)
+            os.makedirs(ref_path, exist_ok=True)
+            with tracing.span("git clone reference", "git", repository=repo_uri):
+                subprocess.run(
+                    ["git", "-c", f'pack.threads={settings.jobs.value}', "clone", "--mirror", repo_uri, ref_path],
+                    check=True)
+                subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "gc", "--aggressive"],
+                               cwd=ref_path,
+                               check=True)
+
+        clone_command: List[Union[str, Path]] = [
+            "git", "-c", f'pack.threads={settings.jobs.value}', "clone", "--reference", ref_path, repo_uri, target_path
+        ]
+        if branch:
+            clone_command += ["--branch", branch]
+        if not checkout or sparse is not None:
+            clone_command += ["--no-checkout"]
+        clone_command += settings.x_git_clone.value
+        if clone_args:
+            clone_command += clone_args
+        with tracing.span("git clone", "git", repository=repo_uri):
+            subprocess.run(clone_command, check=True)
 
     if sparse is not None:
         subprocess.run(["git", "-C", target_path, "config", "core.sparsecheckout", "true"], check=True)
@@ -151,7 +271,8 @@ def reference_clone(  # pylint: disable=too-many-arguments
         checkout_command: List[Union[str, Path]] = ["git", "-C", target_path, "checkout"]
         if branch:
             checkout_command.append(branch)
-        subprocess.run(checkout_command, check=True)
+        with tracing.span("git checkout", "git"):
+            subprocess.run(checkout_command, check=True)
 
 
 def add_remote(path: Path, remote_name: str, remote_uri: str, fetch: bool = True) -> None:
@@ -160,13 +281,15 @@ def add_remote(path: Path, remote_name: str, remote_uri: str, fetch: bool = True
         check=True)
 
     if fetch:
-        subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "-C", path, "fetch", remote_name],
-                       check=True)
+        with tracing.span("git fetch", "git", remote=remote_uri):
+            subprocess.run(["git", "-c", f'pack.threads={settings.jobs.value}', "-C", path, "fetch", remote_name],
+                           check=True)
 
 
 def apply_patches(patch_dir: Path, target_path: Path) -> None:
-    for patch in (patch_dir).glob("*.patch"):
-        subprocess.run(f"git apply < {patch}", shell=True, cwd=target_path, check=True)
+    with tracing.span("apply patches", "git", patch_dir=patch_dir):
+        for patch in (patch_dir).glob("*.patch"):
+            subprocess.run(f"git apply < {patch}", shell=True, cwd=target_path, check=True)
 
 
 class GitRecipeMixin(IRecipe, abc.ABC):  # pylint: disable=abstract-method
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import abc
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Watches directory trees for changes, using inotify (through ctypes, as the standard library does not expose it) where
+# possible, and polling the modification times of all files otherwise.
+
+Ignored = Callable[[Path], bool]  # whether a directory (and everything below it) is not watched
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")  # watch descriptor, mask, cookie, len
+
+
+def _walk_directories(root: Path, ignored: Ignored) -> Iterator[Path]:
+    for (directory, directories, _) in os.walk(root):
+        directories[:] = [name for name in directories if not ignored(Path(directory) / name)]
+        yield Path(directory)
+
+
+class Watcher(abc.ABC):
+    """Reports the paths below a set of root directories that changed"""
+    @abc.abstractmethod
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        """Waits up to `timeout` seconds (indefinitely if it is `None`) for changes, and returns the changed paths"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def changes(self, debounce: float) -> Set[Path]:
+        """Waits for a change and then for a pause of `debounce` seconds, and returns all paths changed meanwhile"""
+        changed = self.poll(None)
+        while True:
+            more = self.poll(debounce)
+            if not more:
+                return changed
+            changed |= more
+
+
+class InotifyWatcher(Watcher):
+    """Uses one inotify watch per directory, which is added as soon as the directory shows up"""
+    def __init__(self, roots: Sequence[Path], ignored: Ignored) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+        self._roots = list(roots)
+        self._ignored = ignored
+        self._directories: Dict[int, Path] = {}
+        self._fd = libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f'inotify_init1 failed: {os.strerror(error)}')
+        try:
+            for root in self._roots:
+                self._watch_tree(root)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @property
+    def count(self) -> int:
+        return len(self._directories)
+
+    def _watch_tree(self, root: Path) -> None:
+        for directory in _walk_directories(root, self._ignored):
+            watch = self._add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if watch < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    continue  # removed in the meantime
+                if error == errno.ENOSPC:
+                    raise OSError(error, "the inotify watch limit was reached (see fs.inotify.max_user_watches)")
+                raise OSError(error, f'Cannot watch {directory}: {os.strerror(error)}')
+            self._directories[watch] = directory
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        (readable, _, _) = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self._fd, 1 << 16)
+        changed: Set[Path] = set()
+        offset = 0
+        while offset < len(data):
+            (watch, mask, _, length) = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+
+            if mask & _IN_Q_OVERFLOW:
+                changed.update(self._roots)  # events were lost, so anything may have changed
+                continue
+            if mask & _IN_IGNORED:
+                self._directories.pop(watch, None)  # the directory was removed
+                continue
+            directory = self._directories.get(watch)
+            if directory is None:
+                continue
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                if self._ignored(path):
+                    continue
+                self._watch_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher(Watcher):
+    """Compares the modification times of all files every `interval` seconds, which works everywhere but scales badly"""
+    def __init__(self, roots: Sequence[Path], ignored: Ignored, interval: float) -> None:
+        self._roots = list(roots)
+        self._ignored = ignored
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot: Dict[Path, Tuple[int, int]] = {}
+        for root in self._roots:
+            for directory in _walk_directories(root, self._ignored):
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            entry_stat = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+                        if not stat.S_ISDIR(entry_stat.st_mode):
+                            snapshot[Path(entry.path)] = (entry_stat.st_mtime_ns, entry_stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys() if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(roots: Sequence[Path], ignored: Ignored, polling_interval: Optional[float] = None) -> Watcher:
+    """Watches the given roots with inotify, unless a polling interval is given or inotify is not available"""
+    if polling_interval is None:
+        try:
+            return InotifyWatcher(roots, ignored)
+        except (OSError, AttributeError) as error:  # AttributeError: the C library does not provide inotify
+            print(f'Cannot use inotify ({error}), polling for changes every second instead')
+            polling_interval = 1.0
+    return PollingWatcher(roots, ignored, polling_interval)
+
+
+def owners(changed: Set[Path], roots: Dict[str, Path]) -> List[str]:
+    """Returns the names (i.e., keys of `roots`) of the roots that contain any of the changed paths"""
+    return [name for (name, root) in roots.items() if any(path == root or root in path.parents for path in changed)]
@@ -2,15 +2,27 @@ from __future__ import annotations
 
 import os
 import shutil
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Collection, Dict, List, Optional, Set
 
 import schema
 import toml
 
+import workspace.build_logs as build_logs
+import workspace.config_cache as config_cache
+import workspace.fingerprints as fingerprints
+import workspace.locking as locking
+import workspace.metrics as metrics
+import workspace.path_index as path_index
+import workspace.telemetry as telemetry
+import workspace.tracing as tracing
 import workspace.util as util
+import workspace.vcs.git as git
+from workspace.build_graph import BuildGraph, built_stamp_path
 from workspace.build_systems.linker import Linker
 from workspace.recipes.all_recipes import ALL as all_recipes
+from workspace.recipes.irecipe import IRecipe
 from workspace.recipes.recipe import Recipe
 from workspace.settings import settings
 
@@ -21,35 +33,45 @@ class Workspace:
     _bin_dir: Path = settings.ws_path / '.bin'
 
     def __init__(self, config_name: str):
+        self.config_name = config_name
         self._linker_dirs: Dict[Linker, Path] = {}
         self.builds: List[Recipe] = []
+        self._positions: Dict[str, int] = {}  # build name -> index in `builds`
+        self._initialized = False
 
         config_path = settings.ws_path / "ws-config" / f'{config_name}.toml'
         assert config_path.exists(), f'given config "{config_name}" does not exist at location "{config_path}"'
 
-        with open(config_path) as file:
-            config = toml.load(file)
-        schema.Schema({
-            "Recipe": [{
-                "recipe": schema.Or(*all_recipes.keys()),
-                schema.Optional(str): object
-            }]
-        }).validate(config)
-        items = config["Recipe"]
-        if not items:
-            raise Exception(f'The configuration at location "{config_path}" is empty.')
+        with open(config_path, "rb") as file:
+            config_bytes = file.read()
+
+        # the configuration (as validated by a previous command) is cached until its contents or the sources change
+        items = config_cache.load(config_name, config_bytes)
+        self._uncached_config: Optional[bytes] = config_bytes if items is None else None
+        if items is None:
+            config = toml.loads(config_bytes.decode())
+            schema.Schema({
+                "Recipe": [{
+                    "recipe": schema.Or(*all_recipes),
+                    schema.Optional(str): object
+                }]
+            }).validate(config)
+            if not config["Recipe"]:
+                raise Exception(f'The configuration at location "{config_path}" is empty.')
+            items = [(item["recipe"], {key: value for (key, value) in item.items() if key != "recipe"})
+                     for item in config["Recipe"]]
 
         seen_names: Set[str] = set()
-        for item in items:
-            options = dict(item)  # shallow copy
-            del options["recipe"]
-            rep = all_recipes[item["recipe"]](**options)
+        for (recipe, options) in items:
+            rep = all_recipes[recipe](**options)
+            rep.validated = self._uncached_config is None
 
             if rep.name in seen_names:
                 raise RuntimeError(f'two recipe variations with same name "{rep.name}" '
                                    f'found in configuration at location "{config_path}"')
             seen_names.add(rep.name)
 
+            self._positions[rep.name] = len(self.builds)
             self.builds.append(rep)
 
             if rep.name == settings.until.value:
@@ -65,24 +87,51 @@ class Workspace:
         return settings.default_linker.value
 
     def find_build(self, build_name, before=None):
-        for build in self.builds:
-            if before and before == build:
-                return None
-
-            if build.name == build_name:
-                return build
+        position = self._positions.get(build_name)
+        if position is None:
+            return None
+        if before and self._positions.get(before.name, position + 1) <= position:
+            return None  # only builds preceding `before` are found
+        return self.builds[position]
 
-        return None
+    @cached_property
+    def graph(self) -> BuildGraph:
+        return BuildGraph(self)
 
     def initialize_builds(self):
+        if self._initialized:
+            return  # initializing only depends on the configuration, which does not change (see `config_cache`)
         for build in self.builds:
             build.initialize(self)
-
-    def setup(self):
+        path_index.write(self)
+
+        # all builds are validated now, but a configuration cut short by `until` is incomplete
+        if self._uncached_config is not None and fingerprints.cacheable():
+            config_cache.store(self.config_name, self._uncached_config, self.builds)
+            self._uncached_config = None
+        self._initialized = True
+
+    def _selected_builds(self, only: Optional[Collection[str]]) -> List[Recipe]:
+        if only is None:
+            return self.builds
+        unknown = set(only) - {build.name for build in self.builds}
+        if unknown:
+            raise Exception(f'The configuration "{self.config_name}" does not contain the builds {sorted(unknown)}')
+        return [build for build in self.builds if build.name in only]
+
+    def setup(self, only: Optional[Collection[str]] = None):
         self.initialize_builds()
 
-        for build in self.builds:
-            build.setup(self)
+        # the missing sources are cloned one after the other, from reference repositories that are all fetched at once
+        missing: List[IRecipe] = [build for build in self._selected_builds(only) if not build.paths["src_dir"].is_dir()]
+        git.refresh_references(
+            {build.repository: build.output_prefix
+             for build in missing if isinstance(build, git.GitRecipeMixin)})
+        for build in self._selected_builds(only):
+            # the source directory is shared between all configurations that contain a build of the same name
+            with locking.locked(build.paths["src_dir"], f'the sources of {build.name}'):
+                with tracing.recipe_span(build, "setup"):
+                    build.setup(self)
 
     def add_to_env(self, env):
         self.initialize_builds()
@@ -90,12 +139,26 @@ class Workspace:
         for build in self.builds:
             build.add_to_env(env, self)
 
-    def build(self):
-        self.initialize_builds()
-        self.setup()
-
-        for build in self.builds:
-            build.build(self)
+    def build(self, only: Optional[Collection[str]] = None):
+        """Builds all builds, or only the ones named in `only` (assuming that the builds they depend on are built)"""
+        with metrics.recording_build(self.config_name) as build_metrics:
+            self.initialize_builds()
+            self.setup(only)
+
+            for build in self._selected_builds(only):
+                # configurations that contain the same build (i.e., with the same digest) share its build directory
+                with locking.locked(build.paths["build_dir"], f'the build directory of {build.name}'):
+                    built_stamp = built_stamp_path(self, build)
+                    if built_stamp.exists():
+                        built_stamp.unlink()
+                    with build_logs.recording(self, build, "build"), tracing.recipe_span(build, "build"):
+                        with build_metrics.recipe(self, build), telemetry.sampling(self, build):
+                            build.build(self)
+                    built_stamp.parent.mkdir(parents=True, exist_ok=True)
+                    built_stamp.touch()
+
+        print()
+        telemetry.print_summary(self, self._selected_builds(only))
 
     def clean(self):
         self.initialize_builds()
@@ -112,10 +175,14 @@ class Workspace:
         if mypycache_dir.exists():
             shutil.rmtree(mypycache_dir)
 
+    @staticmethod
+    def add_base_to_env(env):
+        env["CCACHE_BASEDIR"] = str(settings.ws_path.resolve())
+
     @staticmethod
     def get_env():
         env = os.environ.copy()
-        env["CCACHE_BASEDIR"] = str(settings.ws_path.resolve())
+        Workspace.add_base_to_env(env)
         return env
 
     def add_linker_to_env(self, linker: Linker, env):
@@ -127,14 +194,15 @@ class Workspace:
             linker_name = linker.value
             main_linker_dir = self._bin_dir / "linkers"
             linker_dir = main_linker_dir / linker_name
-            if not linker_dir.exists():
-                linker_dir.mkdir(parents=True)
-                if linker == Linker.LD:
-                    ld_frontend = "ld"
-                else:
-                    ld_frontend = f"ld.{linker_name}"
-                linker_path = shutil.which(ld_frontend)
-                assert linker_path is not None, f"Didn't find linker {linker_name}"
-                os.symlink(linker_path, linker_dir / "ld")
+            with locking.locked(linker_dir, f'the {linker_name} linker directory'):
+                if not linker_dir.exists():
+                    linker_dir.mkdir(parents=True)
+                    if linker == Linker.LD:
+                        ld_frontend = "ld"
+                    else:
+                        ld_frontend = f"ld.{linker_name}"
+                    linker_path = shutil.which(ld_frontend)
+                    assert linker_path is not None, f"Didn't find linker {linker_name}"
+                    os.symlink(linker_path, linker_dir / "ld")
             self._linker_dirs[linker] = linker_dir
         return self._linker_dirs[linker]